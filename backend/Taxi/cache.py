@@ -0,0 +1,141 @@
+"""Helpers on top of the shared Django cache (Redis, see CACHES in settings).
+
+Keys are grouped into namespaces ("vehicle_catalog", or a per-user namespace
+from user_namespace). Each namespace has a version number that is part of
+every key built in it, so invalidate(namespace) drops all of its entries at
+once by bumping the version; the old entries simply expire.
+
+get_or_set computes a missing value in one process only: the first caller
+takes a short lock and recomputes while the others poll for the result
+(up to LOCK_WAIT_SECONDS) instead of all hitting the database together.
+Hits and misses are counted per namespace kind (the part before the first
+":"), see stats().
+"""
+import logging
+import time
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = "default"
+DEFAULT_TIMEOUT = 300
+LOCK_TIMEOUT = 30  # a crashed recompute releases its lock after this
+LOCK_WAIT_SECONDS = 2
+LOCK_POLL_SECONDS = 0.05
+# how long a namespace version outlives its last invalidation, so short-lived
+# (e.g. per-date) namespaces do not leave keys behind forever. Entries must use
+# shorter timeouts: a version that expired and restarts then never meets
+# entries left over from its earlier run.
+VERSION_TIMEOUT = 7 * 24 * 3600
+
+_MISSING = object()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _incr(key, delta=1):
+    cache = get_cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # not set yet; add() loses to a concurrent first increment, so retry once
+        if cache.add(key, delta, None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def user_namespace(namespace, user_id):
+    """Namespace of one user's entries, invalidated on its own."""
+    return f"{namespace}:user:{user_id}"
+
+
+def _version_key(namespace):
+    return f"ns:{namespace}:version"
+
+
+def namespace_version(namespace):
+    return get_cache().get_or_set(_version_key(namespace), 1, VERSION_TIMEOUT)
+
+
+def invalidate(namespace):
+    """Drop every entry of a namespace by moving it to a new version."""
+    cache = get_cache()
+    key = _version_key(namespace)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        # no version yet (or it expired): anything cached was built on version 1
+        version = 2 if cache.add(key, 2, VERSION_TIMEOUT) else cache.incr(key)
+    cache.touch(key, VERSION_TIMEOUT)
+    logger.debug(f"Cache namespace {namespace} now at version {version}")
+    return version
+
+
+def make_key(namespace, *parts):
+    """Versioned key of an entry in a namespace."""
+    return ":".join([namespace, f"v{namespace_version(namespace)}", *map(str, parts)])
+
+
+def _count(namespace, outcome):
+    _incr(f"stats:{namespace.split(':', 1)[0]}:{outcome}")
+
+
+def stats(namespace):
+    """{"hits": n, "misses": n} counted for a namespace kind since the counters were last reset."""
+    cache = get_cache()
+    kind = namespace.split(":", 1)[0]
+    counts = cache.get_many([f"stats:{kind}:hits", f"stats:{kind}:misses"])
+    return {"hits": counts.get(f"stats:{kind}:hits", 0), "misses": counts.get(f"stats:{kind}:misses", 0)}
+
+
+def reset_stats(namespace):
+    kind = namespace.split(":", 1)[0]
+    get_cache().delete_many([f"stats:{kind}:hits", f"stats:{kind}:misses"])
+
+
+def get_value(namespace, *parts, default=None):
+    """Cached value of an entry, counting the hit or miss."""
+    value = get_cache().get(make_key(namespace, *parts), _MISSING)
+    _count(namespace, "misses" if value is _MISSING else "hits")
+    return default if value is _MISSING else value
+
+
+def set_value(namespace, *parts, value, timeout=DEFAULT_TIMEOUT):
+    get_cache().set(make_key(namespace, *parts), value, timeout)
+
+
+def get_or_set(namespace, *parts, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Cached value of an entry, computing and storing it on a miss. While one
+    process recomputes it, the others wait for its result rather than
+    recomputing too; if it takes longer than LOCK_WAIT_SECONDS they compute it
+    themselves so a request is never blocked on a crashed worker.
+    """
+    cache = get_cache()
+    key = make_key(namespace, *parts)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(namespace, "hits")
+        return value
+    _count(namespace, "misses")
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_SECONDS)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    logger.warning(f"Gave up waiting for {key} to be recomputed, computing it here")
+    return compute()
@@ -1,11 +1,18 @@
 import json
+import asyncio
+import time
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from channels.db import database_sync_to_async
 from rest_framework_simplejwt.tokens import AccessToken
 from datetime import datetime
 from Taxi.models import Message, CarpoolRide, RideRequest
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.utils import timezone
+from Taxi import live_location, proximity, token_users
+import redis
 import uuid
 
 import logging
@@ -19,8 +26,8 @@ def get_user_from_token(token):
     try:
         access_token = AccessToken(token)
         logger.info(f"Access token payload: {access_token}")
-        user_id = access_token['id']
-        user = User.objects.get(id=user_id)
+        # cached per token, so reconnects with the same token skip the query
+        user = token_users.get_user(access_token)
         logger.info(f"User found: {user.id}, is_active: {user.is_active}")
         return user
     except Exception as e:
@@ -501,6 +508,151 @@ class RideRequestConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error sending ride request update to user {self.user.id}, ride {self.ride_id}: {e}")
 
 
+@database_sync_to_async
+def get_location_role(user, ride_id):
+    """'driver' for the driver of an in-progress ride, 'passenger' for an accepted passenger, else None."""
+    try:
+        ride = CarpoolRide.objects.get(carpoolride_id=ride_id)
+    except (CarpoolRide.DoesNotExist, ValidationError):
+        logger.error(f"Ride {ride_id} does not exist")
+        return None
+    if ride.driver_id == user.id:
+        return "driver" if ride.status == "in_progress" else None
+    if ride.status in ("pending", "in_progress") and RideRequest.objects.filter(
+        ride=ride, passenger=user, status="accepted"
+    ).exists():
+        return "passenger"
+    return None
+
+# consumer for live driver location
+class RideLocationConsumer(AsyncWebsocketConsumer):
+    """Driver pushes location frames; accepted passengers receive them from ride_<id>_location.
+
+    Frames from the driver are throttled: at most one broadcast per
+    LIVE_LOCATION_STREAM_INTERVAL_SECONDS, and frames arriving in between are
+    coalesced so only the newest one is sent when the interval is up.
+    """
+
+    async def connect(self):
+        self.ride_id = self.scope["url_route"]["kwargs"]["ride_id"]
+        query_string = self.scope["query_string"].decode()
+        token = None
+        for param in query_string.split("&"):
+            if param.startswith("token="):
+                token = param.split("=")[1]
+
+        if not token:
+            logger.error(f"WebSocket rejected: No token provided for ride location {self.ride_id}")
+            await self.close(code=4001)
+            return
+
+        self.user = await get_user_from_token(token)
+        if not self.user or not self.user.is_authenticated:
+            logger.error(f"WebSocket rejected: Invalid or expired token for ride location {self.ride_id}")
+            await self.close(code=4001)
+            return
+
+        self.role = await get_location_role(self.user, self.ride_id)
+        if not self.role:
+            logger.error(f"WebSocket rejected: User {self.user.id} may not stream location for ride {self.ride_id}")
+            await self.close(code=4003)
+            return
+
+        self.group_name = live_location.group_name(self.ride_id)
+        self.last_sent = 0.0
+        self.pending_frame = None
+        self.flush_task = None
+        try:
+            if self.role == "passenger":
+                await self.channel_layer.group_add(self.group_name, self.channel_name)
+            await self.accept()
+            logger.info(f"WebSocket connected for ride location: {self.role} {self.user.id}, ride {self.ride_id}")
+        except Exception as e:
+            logger.error(f"Error connecting location WebSocket for user {self.user.id}, ride {self.ride_id}: {e}")
+            await self.close(code=4004)
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        try:
+            if self.role == "passenger":
+                await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            elif self.pending_frame:
+                # the coalesced frame the cancelled flush would have sent
+                frame, self.pending_frame = self.pending_frame, None
+                await self.broadcast(frame)
+            logger.info(f"Location WebSocket disconnected for user {self.user.id}, ride {self.ride_id}, code: {close_code}")
+        except Exception as e:
+            logger.error(f"Error disconnecting location WebSocket for user {self.user.id}, ride {self.ride_id}: {e}")
+
+    async def receive(self, text_data):
+        if self.role != "driver":
+            return
+        try:
+            data = json.loads(text_data)
+            frame = {
+                "latitude": float(data["latitude"]),
+                "longitude": float(data["longitude"]),
+                "is_simulated": bool(data.get("is_simulated", False)),
+            }
+            if not (-90 <= frame["latitude"] <= 90 and -180 <= frame["longitude"] <= 180):
+                raise ValueError("coordinates out of range")
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                "type": "error",
+                "message": "Frames need numeric latitude and longitude"
+            }))
+            return
+
+        interval = settings.LIVE_LOCATION_STREAM_INTERVAL_SECONDS
+        wait = self.last_sent + interval - time.monotonic()
+        if wait <= 0 and not self.flush_task:
+            await self.broadcast(frame)
+            return
+        # inside the interval: keep only the newest frame and send it when the interval is up
+        self.pending_frame = frame
+        if not self.flush_task:
+            self.flush_task = asyncio.ensure_future(self.flush_after(max(wait, 0)))
+
+    async def flush_after(self, delay):
+        # runs detached from receive(), so nothing else would see its errors
+        await asyncio.sleep(delay)
+        frame, self.pending_frame, self.flush_task = self.pending_frame, None, None
+        if not frame:
+            return
+        try:
+            await self.broadcast(frame)
+        except Exception as e:
+            logger.error(f"Error broadcasting coalesced location frame for ride {self.ride_id}: {e}")
+
+    async def broadcast(self, frame):
+        self.last_sent = time.monotonic()
+        try:
+            updated_at = await sync_to_async(live_location.record_fix)(
+                self.user.id, self.ride_id, frame["latitude"], frame["longitude"], frame["is_simulated"]
+            )
+        except redis.RedisError as e:
+            logger.error(f"Live location store unavailable for ride {self.ride_id}: {e}")
+            updated_at = timezone.now()
+        await self.channel_layer.group_send(
+            self.group_name,
+            live_location.location_event(
+                self.user.id, self.ride_id, frame["latitude"], frame["longitude"], frame["is_simulated"], updated_at
+            ),
+        )
+        if not frame["is_simulated"]:
+            await sync_to_async(proximity.check_and_notify)(self.ride_id, frame["latitude"], frame["longitude"])
+
+    async def driver_location(self, event):
+        try:
+            await self.send(text_data=json.dumps(event))
+        except Exception as e:
+            logger.error(f"Error sending driver location to user {self.user.id}, ride {self.ride_id}: {e}")
+
+
 # class RideConsumer(AsyncWebsocketConsumer):
 #     async def connect(self):
 #         # Extract carpoolride_id from the URL
@@ -0,0 +1,189 @@
+"""Transactional email outbox.
+
+Views build fully rendered payloads with render_email and hand them to
+queue_emails, which enqueues one send_email_batch Celery task once the
+current transaction commits. The worker sends each batch over a single SMTP
+connection that it keeps open between tasks, and retries only the messages
+that did not go out, with exponential backoff.
+
+Rendering goes through EmailLayout: the base_email templates are compiled
+once per process, and the layout is rendered once per (subject, year) with
+marker values in the per-recipient slots. Each recipient then only costs a
+few string joins, escaped exactly as the template would escape them.
+"""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import escape
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+RETRY_BACKOFF_SECONDS = 30  # doubled on every retry
+
+LAYOUT_TEMPLATES = ('emails/base_email.txt', 'emails/base_email.html')
+RECIPIENT_FIELDS = ('user_name', 'message')
+
+# SMTP connection reused by every batch this worker process sends
+_connection = None
+
+
+def default_from_email():
+    return f"DukeRides <{settings.DEFAULT_FROM_EMAIL}>"
+
+
+@lru_cache(maxsize=None)
+def _compiled(template_name):
+    # skips the loader lookup that get_template repeats on every call
+    return get_template(template_name)
+
+
+def _marker(field):
+    # the "<" shows whether the template escapes this slot ("&lt;") or not
+    return f"\x00{field}<\x00"
+
+
+class EmailLayout:
+    """The base email layout rendered once for a subject, with per-recipient slots left open."""
+
+    def __init__(self, subject, year=None):
+        context = {
+            'subject': subject,
+            'year': year or timezone.now().year,
+            **{field: _marker(field) for field in RECIPIENT_FIELDS},
+        }
+        self.parts = [self._split(_compiled(name).render(context)) for name in LAYOUT_TEMPLATES]
+
+    @staticmethod
+    def _split(rendered):
+        """Break a render into literal text and (field, escaped) slots."""
+        slots = {}
+        for field in RECIPIENT_FIELDS:
+            slots[_marker(field)] = (field, False)
+            slots[escape(_marker(field))] = (field, True)
+
+        parts = []
+        text = rendered
+        while True:
+            found = [(text.find(marker), marker) for marker in slots if marker in text]
+            if not found:
+                parts.append(text)
+                return parts
+            position, marker = min(found)
+            parts.append(text[:position])
+            parts.append(slots[marker])
+            text = text[position + len(marker):]
+
+    def render(self, **fields):
+        """Return (text, html) for one recipient."""
+        values = {field: str(fields.get(field, '')) for field in RECIPIENT_FIELDS}
+        escaped = {field: escape(value) for field, value in values.items()}
+        return tuple(
+            ''.join(
+                part if isinstance(part, str) else (escaped if part[1] else values)[part[0]]
+                for part in parts
+            )
+            for parts in self.parts
+        )
+
+
+@lru_cache(maxsize=128)
+def get_layout(subject, year):
+    return EmailLayout(subject, year)
+
+
+def render_emails(subject, recipients, from_email=None):
+    """
+    Render one subject for many recipients into outbox payloads.
+
+    Args:
+        subject (str): Email subject shared by the batch
+        recipients: iterable of (user_name, message, to_email) tuples; message
+            HTML is kept as-is in the HTML part
+        from_email (str, optional): Sender; DukeRides <DEFAULT_FROM_EMAIL> if None.
+    """
+    layout = get_layout(subject, timezone.now().year)
+    from_email = from_email or default_from_email()
+    payloads = []
+    for user_name, message, to_email in recipients:
+        body, html = layout.render(user_name=user_name, message=message)
+        payloads.append({
+            'subject': subject,
+            'body': body,
+            'html': html,
+            'from_email': from_email,
+            'to': [to_email] if isinstance(to_email, str) else list(to_email),
+        })
+    return payloads
+
+
+def render_email(subject, user_name, message, to_email, from_email=None):
+    """Render a single email into an outbox payload (see render_emails)."""
+    [payload] = render_emails(subject, [(user_name, message, to_email)], from_email)
+    return payload
+
+
+def queue_emails(payloads):
+    """Queue rendered payloads for sending once the current transaction commits."""
+    from .tasks import send_email_batch
+
+    payloads = [payload for payload in payloads if payload['to']]
+    if not payloads:
+        return
+    transaction.on_commit(lambda: send_email_batch.delay(payloads))
+
+
+def queue_email(subject, user_name, message, to_email, from_email=None):
+    """Render one email and queue it."""
+    queue_emails([render_email(subject, user_name, message, to_email, from_email)])
+
+
+def _get_connection():
+    global _connection
+    if _connection is None:
+        _connection = get_connection()
+    return _connection
+
+
+def _reset_connection():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except Exception:
+            pass
+    _connection = None
+
+
+def send_payloads(payloads):
+    """
+    Send rendered payloads over the worker's shared SMTP connection.
+
+    Returns the payloads that were not sent, starting with the one that
+    failed, plus the error. The connection is dropped after a failure so the
+    next attempt reconnects.
+    """
+    connection = _get_connection()
+    for position, payload in enumerate(payloads):
+        email = EmailMultiAlternatives(
+            subject=payload['subject'],
+            body=payload['body'],
+            from_email=payload['from_email'],
+            to=payload['to'],
+            connection=connection,
+        )
+        email.attach_alternative(payload['html'], "text/html")
+        try:
+            connection.open()
+            email.send()
+        except Exception as e:
+            logger.error(f"Failed to send email to {payload['to']}: {str(e)}")
+            _reset_connection()
+            return payloads[position:], e
+        logger.info(f"Email sent to {payload['to']} with subject: {payload['subject']}")
+    return [], None
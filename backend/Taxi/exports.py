@@ -0,0 +1,195 @@
+"""Streaming report exports.
+
+Rows come from queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE) as plain
+values, so memory stays flat however many rows a user has:
+
+- CSV is written one chunk of rows at a time into a StreamingHttpResponse.
+- HTML streams the report template's head, the rendered rows a chunk at a
+  time, and its tail.
+- PDF is drawn page by page with the reportlab canvas into a temporary file
+  that is then streamed back in blocks.
+
+The app is served by Daphne, and Django's ASGI handler reads a response built
+on a plain (sync) iterator into a list before sending anything. The bodies
+are therefore async iterators that fetch each chunk of rows (or block of the
+file) through sync_to_async, so only one chunk is in memory at a time.
+"""
+import csv
+import tempfile
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+from django.utils.http import content_disposition_header
+from rest_framework.renderers import BaseRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+FILE_BLOCK_SIZE = 64 * 1024
+
+RIDE_HISTORY_FIELDS = ('carpoolride_id', 'origin', 'destination', 'departure_time', 'contribution_per_seat', 'status')
+RIDE_HISTORY_COLUMNS = ('Origin', 'Destination', 'Departure Time', 'Price per Seat', 'Status')
+
+
+class PassthroughRenderer(BaseRenderer):
+    """Lets ?format=csv|pdf pass content negotiation; the views build the response body themselves."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(PassthroughRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+
+def ride_history_rows(queryset):
+    """Yield the report fields of each ride, streamed from the database."""
+    for ride in queryset.values(*RIDE_HISTORY_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'carpoolride_id': str(ride['carpoolride_id']),
+            'origin_label': (ride['origin'] or {}).get('label', 'N/A'),
+            'destination_label': (ride['destination'] or {}).get('label', 'N/A'),
+            'departure_time': ride['departure_time'],
+            'contribution_per_seat': ride['contribution_per_seat'],
+            'status': ride['status'],
+        }
+
+
+async def row_chunks(rows):
+    """
+    Lists of up to EXPORT_CHUNK_SIZE rows from a sync row iterator, each fetched
+    in one hop to the request's sync thread (the queryset's cursor lives there).
+    """
+    rows = iter(rows)
+    next_chunk = sync_to_async(lambda: list(islice(rows, EXPORT_CHUNK_SIZE)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def _row_values(ride):
+    return (
+        ride['origin_label'],
+        ride['destination_label'],
+        timezone.localtime(ride['departure_time']).strftime('%Y-%m-%d %H:%M'),
+        f"KES {ride['contribution_per_seat']}",
+        ride['status'].capitalize(),
+    )
+
+
+class _Echo:
+    """File-like object whose write returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, filename):
+    writer = csv.writer(_Echo())
+
+    async def lines():
+        yield writer.writerow(RIDE_HISTORY_COLUMNS)
+        async for chunk in row_chunks(rows):
+            yield ''.join(writer.writerow(_row_values(ride)) for ride in chunk)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def stream_html(template_name, row_template_name, context, rows):
+    """
+    Stream an HTML report whose template prints stream_marker where the rows
+    and the row count go (see reports/ride_history.html).
+    """
+    marker = '\x00rows\x00'
+    head, body, tail = get_template(template_name).render(
+        {**context, 'rides': [None], 'stream_marker': marker}
+    ).split(marker)
+    row_template = get_template(row_template_name)
+
+    async def chunks():
+        count = 0
+        yield head
+        async for chunk in row_chunks(rows):
+            count += len(chunk)
+            yield ''.join(row_template.render({'ride': ride}) for ride in chunk)
+        yield body
+        yield str(count)
+        yield tail
+
+    return StreamingHttpResponse(chunks(), content_type='text/html')
+
+
+def build_pdf(title, subtitle, rows, fileobj):
+    """Draw the rows as a table, one page at a time, into fileobj. Returns the row count."""
+    width, height = landscape(A4)
+    margin, line = 36, 18
+    columns = (margin, margin + 200, margin + 400, margin + 540, margin + 660)
+    pdf = canvas.Canvas(fileobj, pagesize=(width, height), pageCompression=1)
+
+    def start_page():
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(margin, height - margin, title)
+        pdf.setFont('Helvetica', 9)
+        pdf.drawString(margin, height - margin - 14, subtitle)
+        y = height - margin - 40
+        pdf.setFillColor(colors.HexColor('#4CAF50'))
+        pdf.rect(margin - 4, y - 5, width - 2 * margin + 8, line, stroke=0, fill=1)
+        pdf.setFillColor(colors.white)
+        pdf.setFont('Helvetica-Bold', 10)
+        for x, column in zip(columns, RIDE_HISTORY_COLUMNS):
+            pdf.drawString(x, y, column)
+        pdf.setFillColor(colors.black)
+        pdf.setFont('Helvetica', 9)
+        return y - line
+
+    count = 0
+    y = start_page()
+    for ride in rows:
+        if y < margin:
+            pdf.showPage()
+            y = start_page()
+        for x, value in zip(columns, _row_values(ride)):
+            pdf.drawString(x, y, str(value)[:40])
+        y -= line
+        count += 1
+
+    if y < margin + line:
+        pdf.showPage()
+        y = start_page()
+    pdf.setFont('Helvetica-Bold', 10)
+    pdf.drawString(margin, y - line, f"Total Rides: {count}")
+    pdf.save()
+    return count
+
+
+def pdf_response(title, subtitle, rows, filename):
+    fileobj = tempfile.TemporaryFile()
+    build_pdf(title, subtitle, rows, fileobj)
+    size = fileobj.tell()
+    fileobj.seek(0)
+
+    async def blocks():
+        read = sync_to_async(fileobj.read, thread_sensitive=False)
+        try:
+            while block := await read(FILE_BLOCK_SIZE):
+                yield block
+        finally:
+            fileobj.close()
+
+    response = StreamingHttpResponse(blocks(), content_type='application/pdf')
+    response['Content-Length'] = str(size)
+    response['Content-Disposition'] = content_disposition_header(True, f"{filename}.pdf")
+    return response
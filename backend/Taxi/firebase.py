@@ -1,21 +1,103 @@
+import logging
+from collections import Counter
+
 import firebase_admin
 from firebase_admin import credentials, messaging
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 # Initialize Firebase app
 if not firebase_admin._apps:
     cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS)
     firebase_admin.initialize_app(cred)
 
+FCM_BATCH_SIZE = 500  # most messages FCM accepts in one send_each call
+# errors meaning the token will never work again, so it is cleared from the user
+PRUNABLE_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+# sent / failed / pruned pushes since this process started
+push_counters = Counter()
+
+
+def _fake_fcm_service(app, endpoint):
+    """
+    A messaging service of app that sends to the fake FCM at endpoint.
+
+    firebase_admin has no public way to change the FCM URL, so this builds a
+    private _MessagingService of its own (never the cached per-app one) and
+    points it at the endpoint. Only used when FCM_ENDPOINT is set (tests,
+    staging); test_firebase checks these internals still exist.
+    """
+    service = messaging._MessagingService(app)
+    service._fcm_url = f"{endpoint.rstrip('/')}/v1/projects/{app.project_id}/messages:send"
+    return service
+
+
+def _send_each(messages, app=None):
+    endpoint = getattr(settings, "FCM_ENDPOINT", None)
+    if endpoint:
+        return _fake_fcm_service(app or firebase_admin.get_app(), endpoint).send_each(messages)
+    return messaging.send_each(messages, app=app)
+
+
+def send_push_batch(pushes, app=None):
+    """
+    Send Firebase push notifications in FCM batches of up to FCM_BATCH_SIZE.
+
+    Args:
+        pushes: list of (token, title, body) tuples.
+        app: Firebase app to send with; the default app if None.
+
+    Returns:
+        list of (message_id, error) pairs in the same order as pushes; exactly
+        one of the two is None. Tokens FCM reports as unregistered are cleared
+        from CustomUser.fcm_token in one UPDATE per batch.
+    """
+    from .models import CustomUser
+
+    outcomes = []
+    for start in range(0, len(pushes), FCM_BATCH_SIZE):
+        chunk = pushes[start:start + FCM_BATCH_SIZE]
+        messages = [
+            messaging.Message(notification=messaging.Notification(title=title, body=body), token=token)
+            for token, title, body in chunk
+        ]
+        try:
+            responses = _send_each(messages, app).responses
+        except Exception as e:
+            logger.error(f"FCM batch of {len(messages)} failed: {str(e)}")
+            outcomes.extend((None, str(e)) for _ in chunk)
+            push_counters["failed"] += len(chunk)
+            continue
+
+        dead_tokens = set()
+        for (token, _, _), response in zip(chunk, responses):
+            if response.success:
+                outcomes.append((response.message_id, None))
+                push_counters["sent"] += 1
+                continue
+            outcomes.append((None, str(response.exception)))
+            push_counters["failed"] += 1
+            if isinstance(response.exception, PRUNABLE_ERRORS):
+                dead_tokens.add(token)
+
+        if dead_tokens:
+            pruned = CustomUser.objects.filter(fcm_token__in=dead_tokens).update(fcm_token=None)
+            push_counters["pruned"] += pruned
+            logger.info(f"Pruned {pruned} unregistered FCM tokens")
+    return outcomes
+
+
 def send_push_notification(token, title, body):
     """
     Send a Firebase push notification to a specific device.
-    
+
     Args:
         token (str): The FCM token for the user's device.
         title (str): The title of the notification.
         body (str): The body content of the notification.
-    
+
     Returns:
         str: Response from Firebase or None if failed.
     """
@@ -23,14 +105,9 @@ def send_push_notification(token, title, body):
         print("No FCM token provided")
         return None
 
-    message = messaging.Message(
-        notification=messaging.Notification(title=title, body=body),
-        token=token,
-    )
-    try:
-        response = messaging.send(message)
-        print(f"Successfully sent notification: {response}")
-        return response
-    except Exception as e:
-        print(f"Error sending notification: {e}")
+    [(response, error)] = send_push_batch([(token, title, body)])
+    if error:
+        print(f"Error sending notification: {error}")
         return None
+    print(f"Successfully sent notification: {response}")
+    return response
@@ -0,0 +1,72 @@
+"""Geohash encoding for bucketing coordinates by area.
+
+Each extra character narrows a cell by 5 bits, alternating longitude and
+latitude: precision 3 is roughly 156km x 156km, 4 is 39km x 19.5km and
+5 is 4.9km x 4.9km. Points sharing a prefix are in the same cell.
+"""
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# shortest km per degree of latitude, and km per degree of longitude at the equator
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+
+
+def encode(lat, lng, precision=5):
+    """Geohash of a point as a string of `precision` characters."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # even bits refine longitude, odd bits latitude
+    while len(chars) < precision:
+        target, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= mid:
+            value |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """(latitude degrees, longitude degrees) spanned by one cell of `precision` characters."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering(lat, lng, radius_km, max_precision=7):
+    """Prefixes of the geohash cells that together contain every point within radius_km of (lat, lng).
+
+    Uses the finest precision (up to max_precision) whose cells are at least as
+    large as the radius, so the circle's bounding box touches at most 3 x 3 cells.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlng = radius_km / max(KM_PER_DEGREE_LNG * math.cos(math.radians(lat)), 1e-9)
+    precision = 1
+    for candidate in range(max_precision, 0, -1):
+        cell_lat, cell_lng = cell_size(candidate)
+        if cell_lat >= dlat and cell_lng >= dlng:
+            precision = candidate
+            break
+
+    # sample the bounding box no further apart than one cell, so every cell it touches is hit
+    cell_lat, cell_lng = cell_size(precision)
+    lat_steps = math.ceil(2 * dlat / cell_lat) + 1
+    lng_steps = min(math.ceil(2 * dlng / cell_lng) + 1, math.ceil(360 / cell_lng) + 1)
+    prefixes = set()
+    for i in range(lat_steps):
+        sample_lat = min(max(lat - dlat + 2 * dlat * i / (lat_steps - 1), -90.0), 89.999999)
+        for j in range(lng_steps):
+            sample_lng = (lng - dlng + 2 * dlng * j / (lng_steps - 1) + 180.0) % 360.0 - 180.0
+            prefixes.add(encode(sample_lat, sample_lng, precision))
+    return sorted(prefixes)
@@ -0,0 +1,150 @@
+"""Hot store for live driver locations, kept in Redis.
+
+Every GPS ping lands here instead of Postgres: the driver is added to a
+per-ride GEO set and the last fix is kept in a per-ride hash. The ride is
+also marked dirty, and flush_checkpoints (run periodically by Celery)
+copies the latest fix of each dirty ride into UserLocation in bulk.
+
+Readers call get_fix first and only fall back to UserLocation when Redis
+has nothing, e.g. after the keys expired or if Redis is down. Passengers
+can also subscribe to group_name(ride_id) over a websocket
+(RideLocationConsumer) and get every fix pushed to them.
+"""
+import logging
+from datetime import datetime
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from .models import UserLocation
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = "live_location:dirty"
+FLUSH_BATCH_SIZE = 500
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def group_name(ride_id):
+    """Channels group that passengers of a ride listen on for driver location pushes."""
+    return f"ride_{ride_id}_location"
+
+
+def location_event(user_id, ride_id, latitude, longitude, is_simulated, updated_at):
+    """Channel layer message for a driver_location push."""
+    return {
+        "type": "driver_location",
+        "user_id": str(user_id),
+        "ride_id": str(ride_id),
+        "latitude": float(latitude),
+        "longitude": float(longitude),
+        "is_simulated": bool(is_simulated),
+        "updated_at": updated_at.isoformat(),
+    }
+
+
+def _geo_key(ride_id):
+    return f"live_location:ride:{ride_id}:geo"
+
+
+def _fix_key(ride_id):
+    return f"live_location:ride:{ride_id}:fix"
+
+
+def record_fix(user_id, ride_id, latitude, longitude, is_simulated=False):
+    """Store a driver's latest fix for a ride. Raises redis.RedisError if Redis is unavailable."""
+    ride_id = str(ride_id)
+    updated_at = timezone.now()
+    pipe = get_client().pipeline()
+    pipe.geoadd(_geo_key(ride_id), (float(longitude), float(latitude), str(user_id)))
+    pipe.hset(_fix_key(ride_id), mapping={
+        "user_id": str(user_id),
+        "latitude": float(latitude),
+        "longitude": float(longitude),
+        "is_simulated": int(bool(is_simulated)),
+        "updated_at": updated_at.isoformat(),
+    })
+    pipe.expire(_geo_key(ride_id), settings.LIVE_LOCATION_TTL_SECONDS)
+    pipe.expire(_fix_key(ride_id), settings.LIVE_LOCATION_TTL_SECONDS)
+    pipe.sadd(DIRTY_KEY, ride_id)
+    pipe.execute()
+    return updated_at
+
+
+def _parse_fix(ride_id, raw):
+    if not raw:
+        return None
+    return {
+        "user_id": raw["user_id"],
+        "ride_id": str(ride_id),
+        "latitude": float(raw["latitude"]),
+        "longitude": float(raw["longitude"]),
+        "is_simulated": raw.get("is_simulated") == "1",
+        "updated_at": datetime.fromisoformat(raw["updated_at"]),
+    }
+
+
+def get_fix(ride_id):
+    """Latest fix for a ride as a dict, or None when Redis has none or cannot be reached."""
+    try:
+        return _parse_fix(ride_id, get_client().hgetall(_fix_key(ride_id)))
+    except redis.RedisError as e:
+        logger.error(f"Live location read failed for ride {ride_id}: {str(e)}")
+        return None
+
+
+def flush_checkpoints():
+    """Write the latest fix of every dirty ride to UserLocation. Returns the number of rides flushed."""
+    client = get_client()
+    flushed = 0
+    while True:
+        ride_ids = client.spop(DIRTY_KEY, FLUSH_BATCH_SIZE)
+        if not ride_ids:
+            return flushed
+
+        pipe = client.pipeline()
+        for ride_id in ride_ids:
+            pipe.hgetall(_fix_key(ride_id))
+        fixes = [
+            fix for fix in (_parse_fix(ride_id, raw) for ride_id, raw in zip(ride_ids, pipe.execute()))
+            if fix is not None
+        ]
+        try:
+            _write_checkpoints(fixes)
+        except Exception:
+            # put them back so the next run retries instead of losing the checkpoint
+            client.sadd(DIRTY_KEY, *ride_ids)
+            raise
+        flushed += len(fixes)
+
+
+def _write_checkpoints(fixes):
+    existing = {
+        (str(location.user_id), str(location.ride_id)): location
+        for location in UserLocation.objects.filter(ride_id__in=[fix["ride_id"] for fix in fixes])
+    }
+    to_update, to_create = [], []
+    for fix in fixes:
+        location = existing.get((fix["user_id"], fix["ride_id"]))
+        if location is None:
+            to_create.append(UserLocation(
+                user_id=fix["user_id"], ride_id=fix["ride_id"],
+                latitude=fix["latitude"], longitude=fix["longitude"], is_simulated=fix["is_simulated"],
+            ))
+        else:
+            location.latitude = fix["latitude"]
+            location.longitude = fix["longitude"]
+            location.is_simulated = fix["is_simulated"]
+            location.updated_at = fix["updated_at"]
+            to_update.append(location)
+    UserLocation.objects.bulk_update(to_update, ["latitude", "longitude", "is_simulated", "updated_at"])
+    UserLocation.objects.bulk_create(to_create)
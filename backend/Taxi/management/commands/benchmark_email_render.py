@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from Taxi.emails import get_layout, render_emails
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering the base email layout for a fan-out to many recipients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=1000, help='Recipients per fan-out')
+        parser.add_argument('--rounds', type=int, default=5, help='Fan-outs to time; the best one is reported')
+
+    def handle(self, *args, **options):
+        if options['recipients'] < 1 or options['rounds'] < 1:
+            raise CommandError("--recipients and --rounds must be positive.")
+
+        subject = "Ride Update"
+        recipients = [
+            (f"Passenger {i}", f"<p>Your ride to <strong>JKIA</strong> leaves at {8 + i % 12}:00.</p>", f"p{i}@example.com")
+            for i in range(options['recipients'])
+        ]
+
+        self.stdout.write(f"{'renderer':>16} {'best s':>8} {'emails/s':>10}")
+        for name, fan_out in (("render_to_string", self.render_each), ("layout", self.render_batch)):
+            best = min(self.time(fan_out, subject, recipients) for _ in range(options['rounds']))
+            self.stdout.write(f"{name:>16} {best:>8.4f} {len(recipients) / best:>10.0f}")
+
+    def time(self, fan_out, subject, recipients):
+        started = time.perf_counter()
+        fan_out(subject, recipients)
+        return time.perf_counter() - started
+
+    def render_each(self, subject, recipients):
+        year = timezone.now().year
+        for user_name, message, _ in recipients:
+            context = {'subject': subject, 'user_name': user_name, 'message': message, 'year': year}
+            render_to_string('emails/base_email.txt', context)
+            render_to_string('emails/base_email.html', context)
+
+    def render_batch(self, subject, recipients):
+        get_layout.cache_clear()  # include the one layout render in every timed round
+        render_emails(subject, recipients)
@@ -0,0 +1,66 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from Taxi.matching import run_matching, prepare_shards, score_shard, merge_shard_results
+from Taxi.synthetic import DEFAULT_BBOX, generate_city
+
+class Command(BaseCommand):
+    help = 'Benchmark passenger-to-ride matching on synthetic data (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Number of rides (and of requests) to generate per run')
+        parser.add_argument('--bbox', type=float, nargs=4, default=list(DEFAULT_BBOX),
+                            metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'), help='City bounding box')
+        parser.add_argument('--hours', type=int, default=12, help='Spread departures over this many hours')
+        parser.add_argument('--shards', type=int, default=1, help='Benchmark the sharded pipeline with N shards')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        south, west, north, east = options['bbox']
+        if south >= north or west >= east:
+            raise CommandError("Bounding box must be SOUTH WEST NORTH EAST with south < north and west < east.")
+
+        self.stdout.write(f"{'scale':>8} {'rides':>8} {'matches':>8} {'wall s':>8} {'queries':>8} {'peak MB':>8}")
+        for scale in options['scales']:
+            result = self.benchmark(scale, options)
+            self.stdout.write(
+                f"{scale:>8} {result['rides']:>8} {result['matches']:>8} {result['wall']:>8.3f} "
+                f"{result['queries']:>8} {result['peak'] / 1024 / 1024:>8.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark completed; synthetic data rolled back."))
+
+    def match(self, shards):
+        if shards <= 1:
+            return run_matching()
+        return merge_shard_results([score_shard(payload) for payload in prepare_shards(shards)])
+
+    def benchmark(self, scale, options):
+        with transaction.atomic():
+            rides, _ = generate_city(scale, scale, tuple(options['bbox']), options['hours'], options['seed'])
+
+            # timed run first, without tracemalloc slowing it down
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    matches = self.match(options['shards'])
+                    wall = time.perf_counter() - started
+                transaction.set_rollback(True)
+
+            # same run again from the same state, for peak memory
+            with transaction.atomic():
+                tracemalloc.start()
+                try:
+                    self.match(options['shards'])
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                transaction.set_rollback(True)
+
+            transaction.set_rollback(True)
+
+        return {"rides": rides, "matches": matches, "wall": wall, "queries": len(queries), "peak": peak}
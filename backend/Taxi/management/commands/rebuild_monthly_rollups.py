@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Taxi.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Recompute monthly earnings/spending rollups from completed wallet transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', metavar='USER_ID',
+                            help='Only rebuild this user (repeatable); all users by default')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_rollups(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} monthly rollup(s) in {time.perf_counter() - started:.2f}s."
+        ))
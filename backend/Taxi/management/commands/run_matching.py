@@ -1,10 +1,48 @@
+import time
+from multiprocessing import Pool
+
+import django
 from django.core.management.base import BaseCommand
+
+from Taxi.matching import prepare_shards, score_shard, merge_shard_results
 from Taxi.tasks import match_passengers_to_rides
 
 class Command(BaseCommand):
     help = 'Manually run the passenger-to-ride matching task'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', type=int, default=1, help='Split the run into N geographic shards')
+        parser.add_argument('--workers', type=int, default=1, help='Score shards in a local pool of N processes')
+        parser.add_argument('--celery', action='store_true', help='Dispatch the shards to Celery workers instead')
+
     def handle(self, *args, **options):
-        self.stdout.write("Running matching task...")
-        match_passengers_to_rides()
-        self.stdout.write(self.style.SUCCESS("Matching task completed."))
\ No newline at end of file
+        shards = max(1, options['shards'])
+        workers = max(1, options['workers'])
+
+        if options['celery']:
+            self.stdout.write(f"Dispatching matching task with {shards} shard(s)...")
+            match_passengers_to_rides.delay(shards=shards)
+            self.stdout.write(self.style.SUCCESS("Matching task queued."))
+            return
+
+        self.stdout.write(f"Running matching task: {shards} shard(s), {workers} worker(s)...")
+        started = time.perf_counter()
+        payloads = prepare_shards(shards)
+        loaded = time.perf_counter()
+
+        if workers > 1 and len(payloads) > 1:
+            # shards are plain data; children only need Django set up to import Taxi.matching
+            with Pool(min(workers, len(payloads)), initializer=django.setup) as pool:
+                results = pool.map(score_shard, payloads)
+        else:
+            results = [score_shard(payload) for payload in payloads]
+        scored = time.perf_counter()
+
+        created = merge_shard_results(results)
+        finished = time.perf_counter()
+
+        self.stdout.write(
+            f"load+shard {loaded - started:.3f}s, score {scored - loaded:.3f}s, "
+            f"merge+save {finished - scored:.3f}s, total {finished - started:.3f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Matching task completed: {created} new matches."))
@@ -0,0 +1,364 @@
+"""Passenger-to-ride matching engine.
+
+Open rides are bucketed into an in-memory grid keyed by origin cell and
+departure-time window, so each pending request is only scored against rides
+that could possibly clear the match threshold. Requests that fall in the same
+cell share a candidate set and are scored together with score_matrix.
+
+New rides and requests are matched as they are created (match_ride,
+match_ride_request); the periodic reconcile_matching pass only picks up
+whatever changed recently, in case a targeted task was lost.
+
+A full run can also be split into geographic shards (build_shards) that are
+scored independently (score_shard) and merged back (merge_shard_results),
+either across Celery workers or in a local process pool.
+"""
+import math
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .geohash import encode as geohash_encode
+from .models import CarpoolRide, RideRequest, RideMatch
+from .scoring import (
+    MATCH_THRESHOLD, MAX_DISTANCE_KM, TIME_WINDOW_HOURS,
+    LOCATION_WEIGHT, TIME_WEIGHT, PREFERENCE_WEIGHT, score_matrix,
+)
+
+logger = logging.getLogger(__name__)
+
+# A pair can only clear the threshold if the location part alone makes up for
+# whatever the time and preference parts cannot give, which bounds the search
+# radius: (0.7 - 0.3 - 0.2) / 0.5 = 0.4 -> anything further than 30km loses.
+CANDIDATE_RADIUS_KM = MAX_DISTANCE_KM * (
+    1 - (MATCH_THRESHOLD - TIME_WEIGHT - PREFERENCE_WEIGHT) / LOCATION_WEIGHT
+)
+# shortest length of one degree of latitude, so a cell is never smaller than the radius
+KM_PER_DEGREE = 110.574
+CELL_SIZE_DEG = CANDIDATE_RADIUS_KM / KM_PER_DEGREE
+TIME_BUCKET_SECONDS = TIME_WINDOW_HOURS * 3600
+# a pair further apart than this in time scores at most 0.7 and never matches
+TIME_WINDOW = timedelta(hours=TIME_WINDOW_HOURS)
+# ~39km x 19.5km areas; a shard is a set of whole areas
+SHARD_GEOHASH_PRECISION = 4
+# how far back reconcile_matching looks; a bit longer than its beat interval
+RECONCILE_LOOKBACK = timedelta(minutes=15)
+
+RIDE_FIELDS = ("carpoolride_id", "origin", "departure_time", "is_women_only")
+REQUEST_FIELDS = (
+    "passenger_id", "pickup_location", "created_at",
+    "passenger__gender", "passenger__preferences__prefers_women_only_rides",
+)
+
+
+def _coords(location):
+    """Return (lat, lng) floats from a location JSON blob, or None if unusable."""
+    if not isinstance(location, dict):
+        return None
+    try:
+        return float(location["lat"]), float(location["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _cell_key(lat, lng, timestamp):
+    return (
+        math.floor(lat / CELL_SIZE_DEG),
+        math.floor(lng / CELL_SIZE_DEG),
+        math.floor(timestamp / TIME_BUCKET_SECONDS),
+    )
+
+
+def ride_points(rows):
+    """(ride_id, lat, lng, departure timestamp, is_women_only) for RIDE_FIELDS rows.
+
+    Rides without a usable origin are dropped; they can never score above the threshold.
+    """
+    for ride_id, origin, departure_time, is_women_only in rows:
+        coords = _coords(origin)
+        if coords is not None:
+            yield ride_id, coords[0], coords[1], departure_time.timestamp(), bool(is_women_only)
+
+
+def request_points(rows):
+    """(passenger_id, lat, lng, created timestamp, is_female, prefers_women_only) for REQUEST_FIELDS rows.
+
+    Requests without a pickup point are dropped; with no location credit they top out at 0.5.
+    """
+    for passenger_id, pickup_location, created_at, gender, prefers_women_only in rows:
+        coords = _coords(pickup_location)
+        if coords is not None:
+            yield (
+                passenger_id, coords[0], coords[1], created_at.timestamp(),
+                gender == "female", bool(prefers_women_only),
+            )
+
+
+class RideIndex:
+    """Grid of open rides keyed by (lat cell, lng cell, departure time bucket).
+
+    Built from ride_points. Ride attributes are kept in parallel arrays and
+    the grid maps each cell to positions in those arrays.
+    """
+
+    def __init__(self, points=()):
+        self.ride_ids = []
+        lat, lng, departure, women_only = [], [], [], []
+        self._cells = defaultdict(list)
+        for ride_id, ride_lat, ride_lng, timestamp, is_women_only in points:
+            self._cells[_cell_key(ride_lat, ride_lng, timestamp)].append(len(self.ride_ids))
+            self.ride_ids.append(ride_id)
+            lat.append(ride_lat)
+            lng.append(ride_lng)
+            departure.append(timestamp)
+            women_only.append(is_women_only)
+        self.lat = np.array(lat, dtype=float)
+        self.lng = np.array(lng, dtype=float)
+        self.departure_time = np.array(departure, dtype=float)
+        self.is_women_only = np.array(women_only, dtype=bool)
+
+    @property
+    def size(self):
+        return len(self.ride_ids)
+
+    def point(self, position):
+        return (
+            self.ride_ids[position], float(self.lat[position]), float(self.lng[position]),
+            float(self.departure_time[position]), bool(self.is_women_only[position]),
+        )
+
+    def candidates_for_key(self, key):
+        """Positions of rides in the cells around a request cell key."""
+        lat_cell, lng_cell, bucket = key
+        # longitude degrees shrink away from the equator, so widen the ring accordingly
+        edge_lat = min((abs(lat_cell) + 2) * CELL_SIZE_DEG, 89.0)
+        lng_ring = math.ceil(1 / max(math.cos(math.radians(edge_lat)), 0.01))
+        positions = []
+        for d_lat in (-1, 0, 1):
+            for d_lng in range(-lng_ring, lng_ring + 1):
+                for d_time in (-1, 0, 1):
+                    positions.extend(self._cells.get((lat_cell + d_lat, lng_cell + d_lng, bucket + d_time), ()))
+        return np.array(positions, dtype=np.intp)
+
+    def candidates(self, lat, lng, moment):
+        """Ride ids whose origin and departure could be within range of a request."""
+        positions = self.candidates_for_key(_cell_key(lat, lng, moment.timestamp()))
+        return [self.ride_ids[i] for i in positions]
+
+
+def load_index(rides):
+    return RideIndex(ride_points(rides.values_list(*RIDE_FIELDS)))
+
+
+def load_requests(ride_requests):
+    return list(request_points(ride_requests.values_list(*REQUEST_FIELDS)))
+
+
+def open_rides():
+    """Rides that can still take passengers."""
+    return CarpoolRide.objects.filter(
+        status="pending",
+        is_completed=False,
+        is_cancelled=False,
+        is_full=False,
+        available_seats__gt=0
+    )
+
+
+def pending_requests():
+    return RideRequest.objects.filter(status="pending")
+
+
+def _group_by_cell(requests):
+    groups = defaultdict(list)
+    for point in requests:
+        groups[_cell_key(point[1], point[2], point[3])].append(point)
+    return groups
+
+
+def find_matches(index, requests, existing=frozenset()):
+    """Score request_points against their candidate rides.
+
+    Returns {(passenger_id, ride_id): score} for new pairs above the threshold,
+    keeping the best score when a passenger has several pending requests.
+    """
+    matches = {}
+    for key, group in _group_by_cell(requests).items():
+        positions = index.candidates_for_key(key)
+        if not len(positions):
+            continue
+        passenger_ids, lat, lng, created_at, is_female, prefers = zip(*group)
+        scores = score_matrix(
+            lat, lng, created_at, is_female, prefers,
+            index.lat[positions], index.lng[positions],
+            index.departure_time[positions], index.is_women_only[positions],
+        )
+        for row, col in zip(*np.nonzero(scores > MATCH_THRESHOLD)):
+            pair = (passenger_ids[row], index.ride_ids[positions[col]])
+            score = float(scores[row, col])
+            if pair not in existing and score > matches.get(pair, 0):
+                matches[pair] = score
+    return matches
+
+
+def save_matches(matches):
+    """Write suggested matches in bulk; pairs that already exist are skipped by the DB."""
+    RideMatch.objects.bulk_create(
+        [
+            RideMatch(passenger_id=passenger_id, ride_id=ride_id, score=score)
+            for (passenger_id, ride_id), score in matches.items()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return len(matches)
+
+
+def run_matching():
+    """Match every pending request against every open ride. Returns the number of new matches."""
+    rides = open_rides()
+    index = load_index(rides)
+    existing = set(
+        RideMatch.objects.filter(ride__in=rides).values_list("passenger_id", "ride_id")
+    )
+    matches = find_matches(index, load_requests(pending_requests()), existing)
+    created = save_matches(matches)
+    logger.info(f"Matching run: {index.size} rides indexed, {created} new matches")
+    return created
+
+
+def prepare_shards(shard_count):
+    """Load open rides and pending requests and split them with build_shards."""
+    return build_shards(load_index(open_rides()), load_requests(pending_requests()), shard_count)
+
+
+def build_shards(index, requests, shard_count):
+    """Split request_points into at most shard_count payloads by pickup geohash.
+
+    Areas are handed out largest first to the least loaded shard. Each payload
+    carries its requests plus every ride that is a candidate for them, so
+    shards score independently; a ride near an area boundary is copied into
+    every shard that needs it. Payloads are plain lists and strings so they
+    go through Celery's JSON serializer unchanged.
+    """
+    areas = defaultdict(list)
+    for point in requests:
+        areas[geohash_encode(point[1], point[2], SHARD_GEOHASH_PRECISION)].append(point)
+
+    shards = [[] for _ in range(max(1, shard_count))]
+    for _, points in sorted(areas.items(), key=lambda area: -len(area[1])):
+        min(shards, key=len).extend(points)
+
+    payloads = []
+    for shard_requests in shards:
+        if not shard_requests:
+            continue
+        positions = set()
+        for key in _group_by_cell(shard_requests):
+            positions.update(index.candidates_for_key(key).tolist())
+        rides = []
+        for position in sorted(positions):
+            ride_id, *point = index.point(position)
+            rides.append([str(ride_id), *point])
+        payloads.append({
+            "rides": rides,
+            "requests": [[str(passenger_id), *point] for passenger_id, *point in shard_requests],
+        })
+    return payloads
+
+
+def score_shard(payload):
+    """Score one build_shards payload. Touches no database, so it runs in any worker process."""
+    index = RideIndex(tuple(point) for point in payload["rides"])
+    matches = find_matches(index, (tuple(point) for point in payload["requests"]))
+    return [[passenger_id, ride_id, score] for (passenger_id, ride_id), score in matches.items()]
+
+
+def merge_shard_results(results):
+    """Combine score_shard outputs and write the new pairs. Returns the number of new matches."""
+    merged = {}
+    for result in results:
+        for passenger_id, ride_id, score in result:
+            pair = (str(passenger_id), str(ride_id))
+            if score > merged.get(pair, 0):
+                merged[pair] = score
+    existing = {
+        (str(passenger_id), str(ride_id))
+        for passenger_id, ride_id in RideMatch.objects.filter(ride__in=open_rides()).values_list("passenger_id", "ride_id")
+    }
+    created = save_matches({pair: score for pair, score in merged.items() if pair not in existing})
+    logger.info(f"Sharded matching run: {len(results)} shards merged, {created} new matches")
+    return created
+
+
+def _score_and_save(rides, ride_requests, existing):
+    matches = find_matches(load_index(rides), load_requests(ride_requests), set(existing))
+    return save_matches(matches)
+
+
+def match_ride(ride_id):
+    """Score a single ride against the pending requests made around its departure time."""
+    rides = open_rides().filter(carpoolride_id=ride_id)
+    departure_time = rides.values_list("departure_time", flat=True).first()
+    if departure_time is None:
+        return 0
+    ride_requests = pending_requests().filter(
+        created_at__range=(departure_time - TIME_WINDOW, departure_time + TIME_WINDOW)
+    )
+    existing = RideMatch.objects.filter(ride_id=ride_id).values_list("passenger_id", "ride_id")
+    created = _score_and_save(rides, ride_requests, existing)
+    logger.info(f"Matched ride {ride_id}: {created} new matches")
+    return created
+
+
+def match_ride_request(ride_request_id):
+    """Score a single pending request against the open rides departing around it."""
+    ride_requests = pending_requests().filter(ridrequest_id=ride_request_id)
+    row = ride_requests.values_list("passenger_id", "created_at").first()
+    if row is None:
+        return 0
+    passenger_id, created_at = row
+    rides = open_rides().filter(
+        departure_time__range=(created_at - TIME_WINDOW, created_at + TIME_WINDOW)
+    )
+    existing = RideMatch.objects.filter(passenger_id=passenger_id).values_list("passenger_id", "ride_id")
+    created = _score_and_save(rides, ride_requests, existing)
+    logger.info(f"Matched ride request {ride_request_id}: {created} new matches")
+    return created
+
+
+def reconcile_matching(lookback=RECONCILE_LOOKBACK):
+    """Re-score rides and requests created or changed within the lookback.
+
+    Targeted tasks normally do the work; this catches anything they missed
+    (broker hiccups, rides edited after creation) without touching the rest.
+    """
+    since = timezone.now() - lookback
+    created = 0
+
+    recent_rides = open_rides().filter(last_updated__gte=since)
+    window = recent_rides.aggregate(first=Min("departure_time"), last=Max("departure_time"))
+    if window["first"] is not None:
+        ride_requests = pending_requests().filter(
+            created_at__range=(window["first"] - TIME_WINDOW, window["last"] + TIME_WINDOW)
+        )
+        existing = RideMatch.objects.filter(ride__in=recent_rides).values_list("passenger_id", "ride_id")
+        created += _score_and_save(recent_rides, ride_requests, existing)
+
+    recent_requests = pending_requests().filter(created_at__gte=since)
+    window = recent_requests.aggregate(first=Min("created_at"), last=Max("created_at"))
+    if window["first"] is not None:
+        rides = open_rides().filter(
+            departure_time__range=(window["first"] - TIME_WINDOW, window["last"] + TIME_WINDOW)
+        )
+        existing = RideMatch.objects.filter(
+            passenger__in=recent_requests.values("passenger_id")
+        ).values_list("passenger_id", "ride_id")
+        created += _score_and_save(rides, recent_requests, existing)
+
+    logger.info(f"Matching reconciliation since {since.isoformat()}: {created} new matches")
+    return created
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0037_alter_customuser_profile_picture_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['status', 'created_at'], name='Taxi_ridere_status_35b244_idx'),
+        ),
+    ]
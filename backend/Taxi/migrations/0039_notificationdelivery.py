@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:15
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0038_riderequest_status_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('delivery_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('carpoolride_id', models.UUIDField(blank=True, null=True)),
+                ('message', models.TextField()),
+                ('channel', models.CharField(choices=[('websocket', 'WebSocket'), ('push', 'Push')], max_length=10)),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_deliveries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='Taxi_notifi_user_id_3f8e8f_idx'), models.Index(fields=['status', 'created_at'], name='Taxi_notifi_status_9e3793_idx')],
+            },
+        ),
+    ]
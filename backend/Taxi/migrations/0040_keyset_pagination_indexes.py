@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0039_notificationdelivery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carpoolride',
+            index=models.Index(fields=['last_updated', 'carpoolride_id'], name='Taxi_carpoo_last_up_dc887d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carpoolride',
+            index=models.Index(fields=['driver', 'last_updated', 'carpoolride_id'], name='Taxi_carpoo_driver__e8fd14_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['user', 'created_at', 'walletTransactionid'], name='Taxi_wallet_user_id_a90239_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['recipient', 'created_at', 'walletTransactionid'], name='Taxi_wallet_recipie_78e7a5_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0040_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyUserRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('spending', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('deposits', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('withdrawals', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transfers_sent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transfers_received', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-month'],
+                'unique_together': {('user', 'month')},
+            },
+        ),
+    ]
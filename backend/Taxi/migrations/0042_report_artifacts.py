@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0041_monthlyuserrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='etag',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='period',
+            field=models.CharField(blank=True, max_length=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(condition=models.Q(('period__isnull', False)), fields=('user', 'report_type', 'period'), name='unique_report_artifact_per_period'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0042_report_artifacts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='carpoolride',
+            name='Taxi_carpoo_origin_9c0532_idx',
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='destination_label',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='destination_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='destination_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='origin_label',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='origin_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='origin_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='carpoolride',
+            index=models.Index(fields=['origin_lat', 'origin_lng'], name='Taxi_carpoo_origin__b31253_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carpoolride',
+            index=models.Index(fields=['destination_lat', 'destination_lng'], name='Taxi_carpoo_destina_2212c2_idx'),
+        ),
+    ]
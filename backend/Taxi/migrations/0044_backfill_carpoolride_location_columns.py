@@ -0,0 +1,75 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+TRIGRAM_INDEXES = {
+    "Taxi_carpoo_origin_label_trgm": "origin_label",
+    "Taxi_carpoo_destination_label_trgm": "destination_label",
+}
+
+
+def location_columns(point):
+    # frozen copy of Taxi.models.location_columns as of this migration, so later
+    # edits to the model helper cannot change what the backfill does
+    if not isinstance(point, dict):
+        return "", None, None
+    coordinates = []
+    for key in ("lat", "lng"):
+        try:
+            coordinates.append(float(point.get(key)))
+        except (TypeError, ValueError):
+            coordinates.append(None)
+    return str(point.get("label") or "")[:255], coordinates[0], coordinates[1]
+
+
+def backfill_location_columns(apps, schema_editor):
+    CarpoolRide = apps.get_model('Taxi', 'CarpoolRide')
+    columns = [
+        "origin_label", "origin_lat", "origin_lng",
+        "destination_label", "destination_lat", "destination_lng",
+    ]
+    batch = []
+    for ride in CarpoolRide.objects.only("pk", "origin", "destination").iterator(chunk_size=BATCH_SIZE):
+        ride.origin_label, ride.origin_lat, ride.origin_lng = location_columns(ride.origin)
+        ride.destination_label, ride.destination_lat, ride.destination_lng = location_columns(ride.destination)
+        batch.append(ride)
+        if len(batch) == BATCH_SIZE:
+            CarpoolRide.objects.bulk_update(batch, columns)
+            batch = []
+    if batch:
+        CarpoolRide.objects.bulk_update(batch, columns)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # icontains compiles to UPPER(column::text) LIKE UPPER('%...%') on PostgreSQL,
+    # which a trigram GIN index on that same expression can serve
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "Taxi_carpoolride" '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0043_carpoolride_location_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_location_columns, migrations.RunPython.noop),
+        # needs a superuser, or on PostgreSQL 13+ (pg_trgm is a trusted extension) CREATE on the database;
+        # a no-op on other databases and where pg_trgm is already installed
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+GEOHASH_PRECISION = 7
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# frozen copies of Taxi.geohash.encode and Taxi.models.location_geohash as of this
+# migration, so later edits to those helpers cannot change what the backfill does
+def encode(lat, lng, precision):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # even bits refine longitude, odd bits latitude
+    while len(chars) < precision:
+        target, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= mid:
+            value |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def location_geohash(lat, lng):
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return ""
+    return encode(lat, lng, GEOHASH_PRECISION)
+
+
+def backfill_geohashes(apps, schema_editor):
+    CarpoolRide = apps.get_model('Taxi', 'CarpoolRide')
+    batch = []
+    rides = CarpoolRide.objects.only("pk", "origin_lat", "origin_lng", "destination_lat", "destination_lng")
+    for ride in rides.iterator(chunk_size=BATCH_SIZE):
+        ride.origin_geohash = location_geohash(ride.origin_lat, ride.origin_lng)
+        ride.destination_geohash = location_geohash(ride.destination_lat, ride.destination_lng)
+        batch.append(ride)
+        if len(batch) == BATCH_SIZE:
+            CarpoolRide.objects.bulk_update(batch, ["origin_geohash", "destination_geohash"])
+            batch = []
+    if batch:
+        CarpoolRide.objects.bulk_update(batch, ["origin_geohash", "destination_geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Taxi', '0044_backfill_carpoolride_location_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carpoolride',
+            name='destination_geohash',
+            field=models.CharField(blank=True, default='', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='carpoolride',
+            name='origin_geohash',
+            field=models.CharField(blank=True, default='', max_length=7),
+        ),
+        migrations.RunPython(backfill_geohashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='carpoolride',
+            index=models.Index(fields=['origin_geohash'], name='Taxi_ride_origin_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='carpoolride',
+            index=models.Index(fields=['destination_geohash'], name='Taxi_ride_dest_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -4,6 +4,7 @@ import hashlib
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from . import geohash
 
 #user manager 
 class CustomUserManager(BaseUserManager):
@@ -134,6 +135,24 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+# outcome of each websocket/push delivery made by the notification fan-out task
+class NotificationDelivery(models.Model):
+    delivery_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="notification_deliveries")
+    carpoolride_id = models.UUIDField(null=True, blank=True)
+    message = models.TextField()
+    channel = models.CharField(max_length=10, choices=[("websocket", "WebSocket"), ("push", "Push")])
+    status = models.CharField(max_length=10, choices=[("sent", "Sent"), ("failed", "Failed"), ("skipped", "Skipped")])
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+
 # vehicle
 """vehicle make"""
 class VehicleMake(models.Model):
@@ -200,6 +219,30 @@ CustomUser = get_user_model()
 #         return geodesic(driver_coords, passenger_coords).meters  # Returns distance in meters
 
     #the ride itself
+# ~153m x 153m cells
+RIDE_GEOHASH_PRECISION = 7
+
+
+def location_columns(point):
+    """(label, lat, lng) of a {"label", "lat", "lng"} location; missing or malformed parts become ""/None."""
+    if not isinstance(point, dict):
+        return "", None, None
+    coordinates = []
+    for key in ("lat", "lng"):
+        try:
+            coordinates.append(float(point.get(key)))
+        except (TypeError, ValueError):
+            coordinates.append(None)
+    return str(point.get("label") or "")[:255], coordinates[0], coordinates[1]
+
+
+def location_geohash(lat, lng):
+    """Stored geohash of a point ("" without usable coordinates)."""
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return ""
+    return geohash.encode(lat, lng, RIDE_GEOHASH_PRECISION)
+
+
 class CarpoolRide(models.Model):
     carpoolride_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     driver = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="ride_driver")
@@ -207,6 +250,16 @@ class CarpoolRide(models.Model):
     
     origin = models.JSONField()  # expects dict with keys: label, lat, lng
     destination = models.JSONField()
+    # typed copies of origin/destination for indexed search; kept in sync by sync_location_columns()
+    origin_label = models.CharField(max_length=255, blank=True, default="")
+    origin_lat = models.FloatField(null=True, blank=True)
+    origin_lng = models.FloatField(null=True, blank=True)
+    destination_label = models.CharField(max_length=255, blank=True, default="")
+    destination_lat = models.FloatField(null=True, blank=True)
+    destination_lng = models.FloatField(null=True, blank=True)
+    # geohash cells of origin/destination for radius search (Taxi/ride_search.py); a prefix is an enclosing cell
+    origin_geohash = models.CharField(max_length=RIDE_GEOHASH_PRECISION, blank=True, default="")
+    destination_geohash = models.CharField(max_length=RIDE_GEOHASH_PRECISION, blank=True, default="")
     departure_time = models.DateTimeField()
     available_seats = models.IntegerField(default=1)
     contribution_per_seat = models.DecimalField(max_digits=10, decimal_places=2)
@@ -223,9 +276,26 @@ class CarpoolRide(models.Model):
     )
     total_amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # New field
 
+    LOCATION_COLUMNS = [
+        "origin_label", "origin_lat", "origin_lng", "origin_geohash",
+        "destination_label", "destination_lat", "destination_lng", "destination_geohash",
+    ]
+
+    def sync_location_columns(self):
+        """Copy label/lat/lng out of the origin and destination JSON. Call before bulk_create/bulk_update."""
+        self.origin_label, self.origin_lat, self.origin_lng = location_columns(self.origin)
+        self.destination_label, self.destination_lat, self.destination_lng = location_columns(self.destination)
+        self.origin_geohash = location_geohash(self.origin_lat, self.origin_lng)
+        self.destination_geohash = location_geohash(self.destination_lat, self.destination_lng)
+
     def save(self, *args, **kwargs):
         if self.is_women_only and self.driver.gender != "female":
             raise ValueError("Only female drivers can create Women-Only rides.")
+
+        self.sync_location_columns()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"origin", "destination"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | set(self.LOCATION_COLUMNS)
         
         # Calculate total_amount_paid on save if status changes to completed
         if self.status == "completed" and not self.total_amount_paid:
@@ -236,9 +306,19 @@ class CarpoolRide(models.Model):
         super().save(*args, **kwargs)
     class Meta:
         indexes = [
-            models.Index(fields=["origin", "destination"]),
+            # label search uses trigram GIN indexes, created on PostgreSQL only (migration 0044)
+            models.Index(fields=["origin_lat", "origin_lng"]),
+            models.Index(fields=["destination_lat", "destination_lng"]),
+            # startswith lookups on PostgreSQL need the pattern opclass
+            models.Index(fields=["origin_geohash"], name="Taxi_ride_origin_geohash_idx", opclasses=["varchar_pattern_ops"]),
+            models.Index(
+                fields=["destination_geohash"], name="Taxi_ride_dest_geohash_idx", opclasses=["varchar_pattern_ops"]
+            ),
             models.Index(fields=["departure_time"]),
             models.Index(fields=["status", "is_full"]),
+            # keyset pagination of ride history (newest first)
+            models.Index(fields=["last_updated", "carpoolride_id"]),
+            models.Index(fields=["driver", "last_updated", "carpoolride_id"]),
         ]
         
         
@@ -314,6 +394,7 @@ class RideRequest(models.Model):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["passenger", "ride"]),
+            models.Index(fields=["status", "created_at"]),  # incremental matching time window
         ]
     
 #get driver location:class UserLocation(models.Model):
@@ -456,8 +537,32 @@ class WalletTransaction(models.Model):
     
     class Meta:
         indexes = [models.Index(fields=['created_at']),
+            # keyset pagination of transaction listings (newest first)
+            models.Index(fields=['user', 'created_at', 'walletTransactionid']),
+            models.Index(fields=['recipient', 'created_at', 'walletTransactionid']),
     ]
         
+# per-user monthly totals, kept in step with completed wallet transactions (see Taxi/rollups.py)
+class MonthlyUserRollup(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="monthly_rollups")
+    month = models.DateField()  # first day of the month, in TIME_ZONE
+    earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    spending = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    deposits = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    withdrawals = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transfers_sent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transfers_received = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "month")
+        ordering = ["-month"]
+
+    def __str__(self):
+        return f"{self.user} - {self.month:%Y-%m}"
+
 # report generation
 class Report(models.Model):
     report_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -466,3 +571,21 @@ class Report(models.Model):
     report_data = models.JSONField()  # Store report details as JSON
     created_at = models.DateTimeField(auto_now_add=True)
     file_url = models.URLField(null=True, blank=True)  # Optional link to PDF/CSV
+    # set for cached closed-month reports (see Taxi/reports.py): "YYYY-MM", the job status and the artifact's validators
+    period = models.CharField(max_length=7, null=True, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=[("pending", "Pending"), ("ready", "Ready"), ("failed", "Failed")],
+        default="ready",
+    )
+    etag = models.CharField(max_length=32, null=True, blank=True)
+    generated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "report_type", "period"],
+                condition=models.Q(period__isnull=False),
+                name="unique_report_artifact_per_period",
+            ),
+        ]
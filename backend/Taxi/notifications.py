@@ -0,0 +1,87 @@
+"""Notification fan-out off the request path.
+
+Views call notify_many (or notify_user in utils, which wraps it) and return
+straight away; the dispatch_notifications Celery task then delivers every
+notification in one go: all websocket group sends are gathered
+concurrently, push messages go out in FCM batches (send_push_batch), and
+each outcome is recorded as a NotificationDelivery row.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .firebase import send_push_batch
+from .models import CustomUser, NotificationDelivery
+
+logger = logging.getLogger(__name__)
+
+PUSH_TITLE = "Ride Update"
+
+
+def notify_many(notifications, carpoolride_id=None):
+    """Queue one fan-out job for (user_id, message) pairs once the current transaction commits."""
+    from .tasks import dispatch_notifications
+
+    payload = [[str(user_id), message] for user_id, message in notifications]
+    if not payload:
+        return
+    ride_id = str(carpoolride_id) if carpoolride_id else None
+    transaction.on_commit(lambda: dispatch_notifications.delay(payload, ride_id))
+
+
+def notify_users(users, message, carpoolride_id=None):
+    """Queue the same message for several users."""
+    notify_many([(user.id, message) for user in users], carpoolride_id)
+
+
+async def _group_send_all(events):
+    channel_layer = get_channel_layer()
+    return await asyncio.gather(
+        *(channel_layer.group_send(group, event) for group, event in events),
+        return_exceptions=True,
+    )
+
+
+def dispatch(notifications, carpoolride_id=None):
+    """Deliver (user_id, message) pairs over websocket and push. Returns the delivery rows created."""
+    users = {
+        str(user_id): fcm_token
+        for user_id, fcm_token in CustomUser.objects.filter(
+            id__in=[user_id for user_id, _ in notifications]
+        ).values_list("id", "fcm_token")
+    }
+    notifications = [(user_id, message) for user_id, message in notifications if user_id in users]
+    deliveries = []
+
+    events = [
+        (f"user_{user_id}", {"type": "send_notification", "message": message, "carpoolride_id": carpoolride_id})
+        for user_id, message in notifications
+    ]
+    results = async_to_sync(_group_send_all)(events)
+    for (user_id, message), result in zip(notifications, results):
+        deliveries.append(NotificationDelivery(
+            user_id=user_id, carpoolride_id=carpoolride_id, message=message, channel="websocket",
+            status="failed" if isinstance(result, Exception) else "sent",
+            error=str(result) if isinstance(result, Exception) else "",
+        ))
+
+    with_token = [(user_id, message) for user_id, message in notifications if users[user_id]]
+    outcomes = send_push_batch([(users[user_id], PUSH_TITLE, message) for user_id, message in with_token])
+    for (user_id, message), (_, error) in zip(with_token, outcomes):
+        deliveries.append(NotificationDelivery(
+            user_id=user_id, carpoolride_id=carpoolride_id, message=message, channel="push",
+            status="failed" if error else "sent", error=error or "",
+        ))
+    for user_id, message in notifications:
+        if not users[user_id]:
+            deliveries.append(NotificationDelivery(
+                user_id=user_id, carpoolride_id=carpoolride_id, message=message, channel="push",
+                status="skipped", error="No FCM token",
+            ))
+
+    NotificationDelivery.objects.bulk_create(deliveries, batch_size=500)
+    logger.info(f"Dispatched {len(notifications)} notifications for ride {carpoolride_id}")
+    return deliveries
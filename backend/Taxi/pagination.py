@@ -0,0 +1,109 @@
+"""Keyset pagination for long, newest-first listings.
+
+Pages are addressed by the (timestamp, id) of the last row served instead of
+an offset, so every page is one indexed range scan of page_size + 1 rows:
+no OFFSET walk and no COUNT(*), however deep the user pages.
+"""
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate newest first on (ordering_field, id_field).
+
+    The cursor is an opaque token holding the last row's key. Subclasses set
+    ordering_field (a datetime) and id_field (the UUID primary key, used to
+    break ties), and should have a matching descending composite index.
+    """
+    ordering_field = None
+    id_field = None
+    page_size = 5
+    page_size_query_param = 'limit'
+    max_page_size = 10
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        key = [getattr(row, self.ordering_field).isoformat(), str(getattr(row, self.id_field))]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            moment, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            # a well-formed token can still carry a bad key; reject it here, not as a 500 in the filter
+            return datetime.fromisoformat(moment), UUID(row_id)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        queryset = queryset.order_by(f'-{self.ordering_field}', f'-{self.id_field}')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            moment, row_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.ordering_field}__lt': moment})
+                | Q(**{self.ordering_field: moment, f'{self.id_field}__lt': row_id})
+            )
+
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[:self.page_size_value]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size_value)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RideHistoryPagination(KeysetPagination):
+    ordering_field = 'last_updated'
+    id_field = 'carpoolride_id'
+
+
+class WalletTransactionPagination(KeysetPagination):
+    ordering_field = 'created_at'
+    id_field = 'walletTransactionid'
+    max_page_size = 50
@@ -0,0 +1,107 @@
+"""Pickup proximity checks for in-progress rides.
+
+When a ride starts, the pickup points of its accepted passengers are cached
+in Redis (cache_pickups). Each driver ping is then checked against all of
+them in one vectorized haversine pass, without touching the database.
+
+A passenger is notified once when the driver comes within ENTER_KM of their
+pickup. They are only re-armed after the driver has moved beyond REARM_KM,
+so GPS jitter around the boundary or a driver idling nearby does not send
+the same notification on every ping.
+"""
+import json
+import logging
+
+import numpy as np
+import redis
+from django.conf import settings
+
+from .live_location import get_client
+from .models import RideRequest
+from .scoring import haversine_km
+from .tasks import notify_pickup_approaching
+
+logger = logging.getLogger(__name__)
+
+ENTER_KM = 0.5
+REARM_KM = 0.8
+
+
+def _pickups_key(ride_id):
+    return f"proximity:ride:{ride_id}:pickups"
+
+
+def _notified_key(ride_id):
+    return f"proximity:ride:{ride_id}:notified"
+
+
+def cache_pickups(ride_id):
+    """Cache the pickup points of a ride's accepted passengers. Returns the pickups cached."""
+    pickups = []
+    for passenger_id, pickup_location in RideRequest.objects.filter(
+        ride_id=ride_id, status="accepted"
+    ).values_list("passenger_id", "pickup_location"):
+        try:
+            pickups.append({
+                "passenger_id": str(passenger_id),
+                "lat": float(pickup_location["lat"]),
+                "lng": float(pickup_location["lng"]),
+                "label": pickup_location.get("label", ""),
+            })
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Skipping unusable pickup location for passenger {passenger_id} on ride {ride_id}")
+    get_client().set(
+        _pickups_key(ride_id), json.dumps(pickups), ex=settings.LIVE_LOCATION_TTL_SECONDS
+    )
+    return pickups
+
+
+def check_proximity(ride_id, latitude, longitude):
+    """Passengers the driver has just come within ENTER_KM of, as (passenger_id, label) pairs.
+
+    Each passenger is returned once per approach. Raises redis.RedisError if Redis is unavailable.
+    """
+    client = get_client()
+    pipe = client.pipeline()
+    pipe.get(_pickups_key(ride_id))
+    pipe.smembers(_notified_key(ride_id))
+    raw_pickups, notified = pipe.execute()
+
+    if raw_pickups is None:
+        # started before the cache existed, or it expired
+        pickups = cache_pickups(ride_id)
+    else:
+        pickups = json.loads(raw_pickups)
+    if not pickups:
+        return []
+
+    distance = haversine_km(
+        float(latitude), float(longitude),
+        np.array([p["lat"] for p in pickups]), np.array([p["lng"] for p in pickups]),
+    )
+    entered = [p for p, inside in zip(pickups, distance < ENTER_KM) if inside and p["passenger_id"] not in notified]
+    left = [p["passenger_id"] for p, outside in zip(pickups, distance > REARM_KM) if outside and p["passenger_id"] in notified]
+
+    pipe = client.pipeline()
+    if left:
+        pipe.srem(_notified_key(ride_id), *left)
+    for pickup in entered:
+        pipe.sadd(_notified_key(ride_id), pickup["passenger_id"])
+    pipe.expire(_notified_key(ride_id), settings.LIVE_LOCATION_TTL_SECONDS)
+    results = pipe.execute()
+
+    # SADD returns 0 if a concurrent ping already claimed the passenger
+    added = results[1 if left else 0:len(results) - 1]
+    return [(p["passenger_id"], p["label"]) for p, was_added in zip(entered, added) if was_added]
+
+
+def check_and_notify(ride_id, latitude, longitude):
+    """Run check_proximity for a driver ping and queue the pickup notifications it produces."""
+    try:
+        entered = check_proximity(ride_id, latitude, longitude)
+    except redis.RedisError as e:
+        logger.error(f"Proximity check skipped for ride {ride_id}: {str(e)}")
+        return []
+    if entered:
+        notify_pickup_approaching.delay(str(ride_id), entered)
+    return entered
@@ -0,0 +1,413 @@
+"""HTML reports and their cached artifacts.
+
+Report types are registered in REPORTS with the @report decorator: a
+function that builds a template context from a ReportContext, the user's
+already authenticated request for one period. The ReportContext evaluates
+the querysets the report types share (wallet transactions, rides, rollup
+totals) at most once, so build_reports can produce several report types for
+a period in one pass. serve_report answers a single report request and
+writes its one audit Report row.
+
+Reports for a closed month (one that has already ended) cannot change any
+more, so they are rendered once by the generate_report_artifact Celery task
+into a file under MEDIA_ROOT and every later request for the same (user,
+report_type, period) is served from that file with ETag/Last-Modified
+validators. The Report row keyed by those three columns tracks the job
+(pending -> ready/failed) and holds the artifact URL.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import FileResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .exports import ride_history_rows
+from .models import CarpoolRide, Report, RideRequest, WalletTransaction
+from .rollups import period_bounds, period_rollups, totals
+
+logger = logging.getLogger(__name__)
+
+# a pending job older than this is assumed lost (worker restart) and enqueued again
+REPORT_JOB_TIMEOUT = timedelta(minutes=10)
+# seconds a client should wait before asking again for a report still being built
+REPORT_RETRY_AFTER = 2
+
+SPENDING_TYPES = ["escrow_hold", "transfer", "ride_payment", "deposit", "escrow_refund"]
+SPENDING_TYPE_LABELS = {
+    "escrow_hold": "Ride Payment",
+    "transfer": "Friend Transfer",
+    "escrow_refund": "Refund",
+    "deposit": "Deposit",
+    "ride_payment": "Ride Payment",
+}
+
+# report_type -> (template, context builder, context key of the report's rows)
+REPORTS = {}
+DRIVER_REPORTS = {"driver_earnings"}
+
+
+def report(report_type, template, rows_key):
+    def register(build):
+        REPORTS[report_type] = (template, build, rows_key)
+        return build
+    return register
+
+
+def parse_period_params(year, month):
+    """Validate ?year=&month= the way every report does. Returns (year, month, error_message)."""
+    if not year:
+        return None, month, None
+    try:
+        year = int(year)
+    except ValueError:
+        return year, month, 'Invalid year format.'
+    if not month:
+        return year, None, None
+    try:
+        month = int(month)
+    except ValueError:
+        return year, month, 'Invalid month format.'
+    if not (1 <= month <= 12):
+        return year, month, 'Invalid month value. Please select a valid month.'
+    return year, month, None
+
+
+class ReportContext:
+    """
+    A user's report period. Every queryset is evaluated on first use and then
+    shared by all the report types built from this context.
+    """
+
+    def __init__(self, user, year=None, month=None):
+        self.user = user
+        self.year = year
+        self.month = month
+
+    def _in_period(self, queryset, field):
+        if not self.year:
+            return queryset
+        start, end = period_bounds(self.year, self.month)
+        return queryset.filter(**{f"{field}__gte": start, f"{field}__lt": end})
+
+    @cached_property
+    def transactions(self):
+        """Completed spending-type transactions the user sent or received, newest first."""
+        return list(self._in_period(WalletTransaction.objects.filter(
+            Q(user=self.user) | Q(recipient=self.user),
+            status="completed",
+            transaction_type__in=SPENDING_TYPES,
+        ).select_related('user', 'recipient').distinct().order_by('-created_at'), 'created_at'))
+
+    @cached_property
+    def driven_rides(self):
+        return list(self._in_period(CarpoolRide.objects.filter(
+            driver=self.user,
+            status="completed",
+            is_cancelled=False
+        ).select_related('driver').prefetch_related(
+            Prefetch(
+                'requests',
+                queryset=RideRequest.objects.filter(status="accepted", payment_status="paid").select_related("passenger"),
+                to_attr='paid_requests',
+            )
+        ), 'departure_time'))
+
+    @cached_property
+    def ride_history(self):
+        user_requests = RideRequest.objects.filter(passenger=self.user).values('ride_id')
+        return list(ride_history_rows(self._in_period(CarpoolRide.objects.filter(
+            Q(driver=self.user) | Q(carpoolride_id__in=user_requests),
+            is_cancelled=False
+        ).order_by('-last_updated'), 'departure_time')))
+
+    @cached_property
+    def summary(self):
+        return totals(period_rollups(self.user, self.year, self.month))
+
+    def base(self, error_message=None):
+        return {
+            'user': self.user,
+            'summary': self.summary,
+            'report_generated_at': timezone.now(),
+            'year': timezone.now().year,
+            'filter_month': self.month,
+            'filter_year': self.year,
+            'error_message': error_message,
+        }
+
+
+@report('payment_receipt', 'reports/payment_receipt.html', 'transactions')
+def payment_receipt_context(ctx):
+    transactions_data = [
+        {
+            'transaction_id': str(transaction.walletTransactionid),
+            'amount': transaction.amount,
+            'spending_type': SPENDING_TYPE_LABELS.get(transaction.transaction_type, "Other"),
+            'transaction_type': transaction.transaction_type or 'n/a',
+            'reference': transaction.reference or 'N/A',
+            'sender_name': transaction.sender_name or 'N/A',
+            'recipient_name': transaction.recipient_name or 'Credit',
+            'created_at': transaction.created_at,
+            'status': transaction.status,
+            'ride_id': getattr(transaction, 'ride_id', 'N/A'),  # Handle missing ride_id
+        }
+        for transaction in ctx.transactions
+    ]
+    error_message = 'No payment receipts found for the selected period.' if ctx.year and not transactions_data else None
+    return {**ctx.base(error_message), 'transactions': transactions_data}
+
+
+@report('passenger_spending', 'reports/passenger_spending.html', 'spending')
+def passenger_spending_context(ctx):
+    spending_data = [
+        {
+            'transaction_id': str(transaction.walletTransactionid),
+            'spending_type': SPENDING_TYPE_LABELS.get(transaction.transaction_type, "Other"),
+            'amount': transaction.amount,
+            'trans_type': transaction.transaction_type,
+            'reference': transaction.reference,
+            'recipient_name': transaction.recipient_name or 'Credit',
+            'created_at': transaction.created_at,
+        }
+        for transaction in ctx.transactions
+        if transaction.user_id == ctx.user.pk
+    ]
+    return {**ctx.base(), 'spending': spending_data}
+
+
+@report('driver_earnings', 'reports/driver_earnings.html', 'earnings')
+def driver_earnings_context(ctx):
+    earnings_data = []
+    for ride in ctx.driven_rides:
+        accepted_requests = ride.paid_requests
+        passengers = [
+            {
+                "name": req.passenger.fullname,
+                "phone": req.passenger.phone_number,
+                "seats_booked": req.seats_requested,
+                "amount_paid": float(ride.contribution_per_seat) * req.seats_requested,
+            }
+            for req in accepted_requests
+        ]
+
+        earnings_data.append({
+            "carpoolride_id": str(ride.carpoolride_id),
+            "origin": ride.origin.get("label", "Unknown"),
+            "destination": ride.destination.get("label", "Unknown"),
+            "total_amount_paid": ride.total_amount_paid,
+            "departure_time": ride.departure_time,
+            "passenger_count": len(accepted_requests),
+            "passenger_breakdown": passengers,
+        })
+    return {**ctx.base(), 'earnings': earnings_data}
+
+
+@report('ride_history', 'reports/ride_history.html', 'rides')
+def ride_history_context(ctx):
+    rides = ctx.ride_history
+    error_message = 'No rides found for the selected period.' if ctx.year and not rides else None
+    return {**ctx.base(error_message), 'rides': rides}
+
+
+def build_reports(ctx, report_types):
+    """Batch mode: the template context of each report type, built from one shared ReportContext."""
+    return {report_type: REPORTS[report_type][1](ctx) for report_type in report_types}
+
+
+def render_report(report_type, user, year=None, month=None):
+    template, build, _ = REPORTS[report_type]
+    return render_to_string(template, build(ReportContext(user, year, month)))
+
+
+def report_period(year, month):
+    return f"{year:04d}-{month:02d}"
+
+
+def parse_period(period):
+    year, month = period.split("-")
+    return int(year), int(month)
+
+
+def is_closed_period(year, month):
+    """Whether the month has ended in the current time zone, so its report can no longer change."""
+    _, end = period_bounds(year, month)
+    return end <= timezone.now()
+
+
+def artifact_name(report):
+    # the report id keeps the path unguessable; MEDIA_URL is public in development
+    return f"reports/{report.user_id}/{report.report_id}.html"
+
+
+def build_artifact(report):
+    """Render a closed-period report into MEDIA_ROOT and mark its job ready."""
+    year, month = parse_period(report.period)
+    content = render_report(report.report_type, report.user, year, month).encode()
+    name = artifact_name(report)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+
+    report.file_url = default_storage.url(name)
+    report.etag = hashlib.md5(content).hexdigest()
+    report.generated_at = timezone.now()
+    report.status = "ready"
+    report.report_data = {**report.report_data, "size": len(content)}
+    report.save(update_fields=["file_url", "etag", "generated_at", "status", "report_data"])
+    logger.info(f"Built {report.report_type} report {report.report_id} for period {report.period}")
+
+
+def _enqueue(report):
+    from .tasks import generate_report_artifact
+
+    report_id = str(report.report_id)
+    transaction.on_commit(lambda: generate_report_artifact.delay(report_id))
+
+
+def _artifact_ready(report):
+    return report.status == "ready" and default_storage.exists(artifact_name(report))
+
+
+def closed_period_response(request, user, report_type, year, month):
+    """
+    Serve a closed month's report from its artifact, answering conditional
+    requests with 304, or start (at most one) job building it and answer 202.
+    """
+    report, created = Report.objects.get_or_create(
+        user=user,
+        report_type=report_type,
+        period=report_period(year, month),
+        defaults={"status": "pending", "report_data": {"user_id": str(user.id), "format": "html"}},
+    )
+
+    if not created and _artifact_ready(report):
+        last_modified = int(report.generated_at.timestamp())
+        etag = quote_etag(report.etag)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = FileResponse(default_storage.open(artifact_name(report)), content_type='text/html')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # the content never changes, but it is private to the user
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+    stale = report.status == "pending" and report.created_at < timezone.now() - REPORT_JOB_TIMEOUT
+    if created or stale or report.status != "pending":
+        if not created:
+            # a failed job, a lost job, or an artifact removed from MEDIA_ROOT
+            Report.objects.filter(pk=report.pk).update(status="pending", created_at=timezone.now())
+        _enqueue(report)
+
+    # the client polls this same URL until the artifact is served
+    return Response(
+        {"report_id": str(report.report_id), "period": report.period, "status": "pending"},
+        status=202,
+        headers={"Retry-After": str(REPORT_RETRY_AFTER)},
+    )
+
+
+def record_access(user, report_type, **report_data):
+    """Write the one audit Report row of a report access."""
+    return Report.objects.create(
+        user=user,
+        report_type=report_type,
+        report_data={
+            "user_id": str(user.id),
+            "format": "html",
+            "generated_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
+            **report_data,
+        },
+    )
+
+
+def _error_page(template, ctx, rows_key, error_message):
+    context = {
+        'user': ctx.user,
+        rows_key: [],
+        'report_generated_at': timezone.now(),
+        'year': timezone.now().year,
+        'filter_month': ctx.month,
+        'filter_year': ctx.year,
+        'error_message': error_message,
+    }
+    return HttpResponse(render_to_string(template, context), content_type='text/html')
+
+
+def serve_report(request, report_type):
+    """Answer one report request for the already authenticated request.user."""
+    user = request.user
+    template, build, rows_key = REPORTS[report_type]
+    if report_type in DRIVER_REPORTS and not user.is_driver:
+        return Response({"error": "Only drivers can access earnings report"}, status=403)
+
+    year, month, error_message = parse_period_params(
+        request.query_params.get('year'), request.query_params.get('month')
+    )
+    ctx = ReportContext(user, year, month)
+    if error_message:
+        return _error_page(template, ctx, rows_key, error_message)
+
+    if year and month and is_closed_period(year, month):
+        response = closed_period_response(request, user, report_type, year, month)
+        record_access(user, report_type, period=report_period(year, month), status=response.status_code)
+        return response
+
+    period = {"month": month or "all", "year": year or str(timezone.now().year)}
+    try:
+        context = build(ctx)
+        html_content = render_to_string(template, context)
+    except Exception as e:
+        logger.error(f"Error generating {report_type} report for user {user.id}: {str(e)}")
+        record_access(user, report_type, failed=True, **period)
+        return _error_page(template, ctx, rows_key, 'Failed to generate report. Please try again.')
+
+    record_access(user, report_type, row_count=len(context[rows_key]), **period)
+    logger.info(f"{report_type} report generated for user {user.id}, month={month}, year={year}")
+    return HttpResponse(html_content, content_type='text/html')
+
+
+def serve_reports(request, report_types):
+    """
+    Batch mode: several report types for one period as {report_type: html},
+    built from one ReportContext and audited with a single row. Closed months
+    reuse their ready artifacts.
+    """
+    user = request.user
+    if DRIVER_REPORTS.intersection(report_types) and not user.is_driver:
+        return Response({"error": "Only drivers can access earnings report"}, status=403)
+
+    year, month, error_message = parse_period_params(
+        request.query_params.get('year'), request.query_params.get('month')
+    )
+    if error_message:
+        return Response({"error": error_message}, status=400)
+
+    reports = {}
+    if year and month and is_closed_period(year, month):
+        artifacts = Report.objects.filter(
+            user=user, report_type__in=report_types, period=report_period(year, month), status="ready"
+        )
+        for artifact in artifacts:
+            if default_storage.exists(artifact_name(artifact)):
+                with default_storage.open(artifact_name(artifact)) as artifact_file:
+                    reports[artifact.report_type] = artifact_file.read().decode()
+
+    missing = [report_type for report_type in report_types if report_type not in reports]
+    ctx = ReportContext(user, year, month)
+    for report_type, context in build_reports(ctx, missing).items():
+        reports[report_type] = render_to_string(REPORTS[report_type][0], context)
+
+    record_access(user, "batch", report_types=report_types, month=month or "all", year=year or str(timezone.now().year))
+    logger.info(f"Batch report {report_types} generated for user {user.id}, month={month}, year={year}")
+    return Response({"reports": {report_type: reports[report_type] for report_type in report_types}})
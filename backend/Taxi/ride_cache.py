@@ -0,0 +1,135 @@
+"""Read-through cache of the open-rides listing (PassengerCarpoolRideViewSet).
+
+The ids of the open rides matching a (pickup date, time slot, women-only)
+bucket are kept in the shared cache (Taxi/cache.py), so the browse screen
+does not re-run the date/time filtering on every hit. What a single passenger
+must not see (rides they have a pending or canceled request for, and their
+own rides) is a second, per-user set subtracted on top. The view then loads
+only those ids, re-checking the cheap open-ride columns in case a set is a
+little stale.
+
+Each departure date (and "any" date) is its own cache namespace:
+invalidate_rides invalidates the dates a ride departs on, and invalidate_user
+the user's namespace, so readers move to fresh keys at once and the old ones
+simply expire. Any Redis error falls back to computing the sets from the
+database.
+"""
+import logging
+from datetime import datetime, time
+
+import redis
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache
+from .models import CarpoolRide, RideRequest
+
+logger = logging.getLogger(__name__)
+
+ANY = "any"
+TIME_SLOTS = ("before_06", "06_12", "12_18", "after_18")
+NAMESPACE = "open_rides"
+BUCKET_TTL = 300
+EXCLUSIONS_TTL = 300
+
+
+def bucket_for(params):
+    """(date, time slot, women-only) bucket of the listing's query params; unknown values mean "any"."""
+    day = ANY
+    pickup_date = params.get("pickup_date")
+    if pickup_date:
+        try:
+            day = datetime.strptime(pickup_date, '%Y-%m-%d').date().isoformat()
+        except ValueError:
+            logger.warning(f"Invalid pickup_date format: {pickup_date}")
+    time_slot = params.get("time_slot")
+    women_only = params.get("is_women_only")
+    return (
+        day,
+        time_slot if time_slot in TIME_SLOTS else ANY,
+        women_only if women_only in ("true", "false") else ANY,
+    )
+
+
+def open_rides():
+    """Rides a passenger can still request."""
+    return CarpoolRide.objects.filter(
+        is_completed=False,
+        is_cancelled=False,
+        available_seats__gt=0,
+        departure_time__gte=timezone.now()
+    )
+
+
+def bucket_queryset(day, time_slot, women_only):
+    queryset = open_rides()
+    if day != ANY:
+        queryset = queryset.filter(departure_time__date=datetime.strptime(day, '%Y-%m-%d').date())
+
+    if time_slot == "before_06":
+        queryset = queryset.filter(departure_time__time__lt=time(6, 0))
+    elif time_slot == "06_12":
+        queryset = queryset.filter(departure_time__time__gte=time(6, 0), departure_time__time__lte=time(12, 0))
+    elif time_slot == "12_18":
+        queryset = queryset.filter(departure_time__time__gte=time(12, 1), departure_time__time__lte=time(18, 0))
+    elif time_slot == "after_18":
+        queryset = queryset.filter(departure_time__time__gt=time(18, 0))
+
+    if women_only != ANY:
+        queryset = queryset.filter(is_women_only=women_only == "true")
+    return queryset
+
+
+def _day_namespace(day):
+    return f"{NAMESPACE}:{day}"
+
+
+def _user_namespace(user_id):
+    return cache.user_namespace(NAMESPACE, user_id)
+
+
+def candidate_ids(day, time_slot, women_only):
+    """Ids (as strings) of the open rides in a bucket."""
+    def compute():
+        return {str(pk) for pk in bucket_queryset(day, time_slot, women_only).values_list("carpoolride_id", flat=True)}
+
+    try:
+        return cache.get_or_set(_day_namespace(day), time_slot, women_only, compute=compute, timeout=BUCKET_TTL)
+    except redis.RedisError as e:
+        logger.error(f"Open rides cache unavailable, querying the database: {str(e)}")
+        return compute()
+
+
+def excluded_ids(user):
+    """Ids (as strings) of open rides hidden from this user: their own, and those they requested or canceled."""
+    def compute():
+        requested = RideRequest.objects.filter(
+            passenger=user, status__in=["pending", "canceled"]
+        ).values_list("ride_id", flat=True)
+        own = open_rides().filter(driver=user).values_list("carpoolride_id", flat=True)
+        return {str(pk) for pk in [*requested, *own]}
+
+    try:
+        return cache.get_or_set(_user_namespace(user.pk), "excluded", compute=compute, timeout=EXCLUSIONS_TTL)
+    except redis.RedisError as e:
+        logger.error(f"Open rides cache unavailable, querying the database: {str(e)}")
+        return compute()
+
+
+def _invalidate(namespaces):
+    try:
+        for namespace in namespaces:
+            cache.invalidate(namespace)
+    except redis.RedisError as e:
+        logger.error(f"Could not invalidate open rides cache {namespaces}: {str(e)}")
+
+
+def invalidate_rides(*departure_times):
+    """After commit, drop the buckets of rides departing at these times (e.g. before and after an update)."""
+    days = {timezone.localdate(departure).isoformat() for departure in departure_times if departure} | {ANY}
+    transaction.on_commit(lambda: _invalidate([_day_namespace(day) for day in sorted(days)]))
+
+
+def invalidate_user(user_id):
+    """After commit, drop a user's exclusion set (they requested, canceled or created a ride)."""
+    transaction.on_commit(lambda: _invalidate([_user_namespace(user_id)]))
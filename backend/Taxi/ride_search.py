@@ -0,0 +1,109 @@
+"""Proximity ride search: open rides leaving near a pickup point (and,
+optionally, arriving near a dropoff point) within a departure window.
+
+The database narrows the search with the origin/destination geohash columns:
+the circle around each point is covered by at most 3 x 3 geohash cells
+(geohash.covering) and a ride qualifies if its stored geohash starts with
+one of them, which an index on the column serves. Exact distances are then
+computed for the few candidates left with the same NumPy haversine the
+matcher uses, and the rides within both radii are ranked with score_matrix,
+i.e. by the same location, time and women-only factors as
+calculate_match_score.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Q
+from django.utils import timezone
+
+from .geohash import covering
+from .models import CarpoolRide, RIDE_GEOHASH_PRECISION
+from .scoring import haversine_km, score_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PICKUP_RADIUS_KM = 2
+DEFAULT_DROPOFF_RADIUS_KM = 3
+MAX_RADIUS_KM = 25
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 50
+
+CANDIDATE_FIELDS = (
+    "carpoolride_id", "origin_lat", "origin_lng", "destination_lat", "destination_lng",
+    "departure_time", "is_women_only",
+)
+
+
+def near(field, lat, lng, radius_km):
+    """Q matching rides whose `field` geohash lies in a cell covering the circle."""
+    condition = Q()
+    for prefix in covering(lat, lng, radius_km, RIDE_GEOHASH_PRECISION):
+        condition |= Q(**{f"{field}__startswith": prefix})
+    return condition
+
+
+def open_rides(user, start, end):
+    """Rides the user could still join that depart in [start, end]."""
+    return CarpoolRide.objects.filter(
+        is_completed=False,
+        is_cancelled=False,
+        available_seats__gt=0,
+        departure_time__gte=max(start, timezone.now()),
+        departure_time__lte=end,
+    ).exclude(
+        driver=user,
+    ).exclude(
+        requests__passenger=user,
+        requests__status__in=["pending", "canceled"],
+    )
+
+
+def search_rides(
+    user, pickup, pickup_radius_km=DEFAULT_PICKUP_RADIUS_KM, dropoff=None,
+    dropoff_radius_km=DEFAULT_DROPOFF_RADIUS_KM, departure_time=None, window=None, limit=DEFAULT_RESULTS,
+):
+    """
+    Best-scoring rides for a passenger, as (ride_id, score, pickup_km, dropoff_km)
+    tuples, best first. pickup/dropoff are (lat, lng); dropoff_km is None without a dropoff.
+    """
+    departure_time = departure_time or timezone.now()
+    window = window or timedelta(hours=2)
+    rides = open_rides(user, departure_time - window, departure_time + window).filter(
+        near("origin_geohash", pickup[0], pickup[1], pickup_radius_km)
+    )
+    if dropoff:
+        rides = rides.filter(near("destination_geohash", dropoff[0], dropoff[1], dropoff_radius_km))
+
+    rows = list(rides.values_list(*CANDIDATE_FIELDS))
+    if not rows:
+        return []
+    ride_ids, origin_lat, origin_lng, destination_lat, destination_lng, departures, women_only = zip(*rows)
+
+    pickup_km = haversine_km(pickup[0], pickup[1], origin_lat, origin_lng)
+    within = pickup_km <= pickup_radius_km
+    dropoff_km = None
+    if dropoff:
+        dropoff_km = haversine_km(dropoff[0], dropoff[1], destination_lat, destination_lng)
+        within &= dropoff_km <= dropoff_radius_km
+
+    preferences = getattr(user, "preferences", None)
+    scores = score_matrix(
+        [pickup[0]], [pickup[1]], [departure_time.timestamp()], [user.gender == "female"],
+        [bool(preferences and preferences.prefers_women_only_rides)],
+        origin_lat, origin_lng, [departure.timestamp() for departure in departures], women_only,
+    )[0]
+
+    candidates = np.flatnonzero(within)
+    # best score first; the nearer pickup breaks ties
+    ranked = candidates[np.lexsort((pickup_km[candidates], -scores[candidates]))][:limit]
+    logger.debug(f"Ride search for {user.id}: {len(rows)} candidates, {len(candidates)} within radius")
+    return [
+        (
+            ride_ids[i],
+            round(float(scores[i]), 4),
+            round(float(pickup_km[i]), 3),
+            None if dropoff_km is None else round(float(dropoff_km[i]), 3),
+        )
+        for i in ranked
+    ]
@@ -0,0 +1,164 @@
+"""Monthly per-user money rollups.
+
+Every completed WalletTransaction adds its amount to one MonthlyUserRollup
+row of its owner (and, for transfers, of its recipient), so report totals
+read one row per month instead of scanning transaction history.
+apply_transaction and reverse_transaction are called from the
+WalletTransaction signals in Taxi/signals.py, so a completed transaction that
+is deleted, leaves "completed" or is edited is taken back out again;
+rebuild_rollups recomputes everything from scratch (see the
+rebuild_monthly_rollups command).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import MonthlyUserRollup, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+# rollup column credited to the transaction's user, per transaction type
+OWNER_FIELDS = {
+    "escrow_release": "earnings",
+    "ride_earnings": "earnings",
+    "escrow_hold": "spending",
+    "ride_payment": "spending",
+    "escrow_refund": "refunds",
+    "ride_refund": "refunds",
+    "deposit": "deposits",
+    "withdrawal": "withdrawals",
+    "transfer": "transfers_sent",
+}
+# rollup column credited to the transaction's recipient
+RECIPIENT_FIELDS = {
+    "transfer": "transfers_received",
+}
+AMOUNT_FIELDS = ("earnings", "spending", "refunds", "deposits", "withdrawals", "transfers_sent", "transfers_received")
+
+
+def month_start(moment):
+    """First day of moment's month in the current time zone."""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def period_bounds(year, month=None):
+    """Aware [start, end) datetimes for a year or one of its months, for index-friendly range filters."""
+    first = datetime(year, month or 1, 1)
+    if month and month < 12:
+        last = datetime(year, month + 1, 1)
+    else:
+        last = datetime(year + 1, 1, 1)
+    return timezone.make_aware(first), timezone.make_aware(last)
+
+
+def _credit(user_id, month, field, amount):
+    rollup, _ = MonthlyUserRollup.objects.get_or_create(user_id=user_id, month=month)
+    MonthlyUserRollup.objects.filter(pk=rollup.pk).update(**{
+        field: F(field) + amount,
+        "transaction_count": F("transaction_count") + 1,
+        "updated_at": timezone.now(),
+    })
+
+
+def _debit(user_id, month, field, amount):
+    # no row means nothing to take back (e.g. the user is being deleted with its rollups)
+    MonthlyUserRollup.objects.filter(user_id=user_id, month=month).update(**{
+        field: F(field) - amount,
+        "transaction_count": F("transaction_count") - 1,
+        "updated_at": timezone.now(),
+    })
+
+
+def rollup_entries(wallet_transaction):
+    """(user_id, month, field, amount) of every rollup column a completed transaction counts towards."""
+    month = month_start(wallet_transaction.created_at or timezone.now())
+    amount = Decimal(wallet_transaction.amount)
+    entries = []
+    field = OWNER_FIELDS.get(wallet_transaction.transaction_type)
+    if field:
+        entries.append((wallet_transaction.user_id, month, field, amount))
+    field = RECIPIENT_FIELDS.get(wallet_transaction.transaction_type)
+    if field and wallet_transaction.recipient_id:
+        entries.append((wallet_transaction.recipient_id, month, field, amount))
+    return entries
+
+
+def apply_transaction(wallet_transaction):
+    """Add one newly completed transaction to the rollups."""
+    for user_id, month, field, amount in rollup_entries(wallet_transaction):
+        _credit(user_id, month, field, amount)
+
+
+def reverse_transaction(wallet_transaction):
+    """Take a previously completed transaction back out of the rollups."""
+    for user_id, month, field, amount in rollup_entries(wallet_transaction):
+        _debit(user_id, month, field, amount)
+
+
+def _aggregate(queryset, user_field, fields):
+    return queryset.filter(
+        status="completed", transaction_type__in=list(fields), **{f"{user_field}__isnull": False}
+    ).annotate(
+        rollup_month=TruncMonth("created_at")
+    ).values(user_field, "rollup_month", "transaction_type").annotate(
+        total=Sum("amount"), count=Count("pk")
+    ).order_by()
+
+
+def rebuild_rollups(user_ids=None):
+    """Recompute rollups from completed transactions; all users, or only user_ids. Returns rows written."""
+    transactions = WalletTransaction.objects.all()
+    rollups = MonthlyUserRollup.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    rows = defaultdict(lambda: {"transaction_count": 0, **{field: Decimal("0") for field in AMOUNT_FIELDS}})
+    for user_field, fields in (("user", OWNER_FIELDS), ("recipient", RECIPIENT_FIELDS)):
+        queryset = transactions if user_ids is None else transactions.filter(**{f"{user_field}__in": user_ids})
+        for group in _aggregate(queryset, user_field, fields):
+            month = group["rollup_month"]
+            month = month.date() if isinstance(month, datetime) else month
+            row = rows[(group[user_field], month)]
+            row[fields[group["transaction_type"]]] += group["total"]
+            row["transaction_count"] += group["count"]
+
+    with transaction.atomic():
+        rollups.delete()
+        MonthlyUserRollup.objects.bulk_create(
+            [MonthlyUserRollup(user_id=user_id, month=month, **row) for (user_id, month), row in rows.items()],
+            batch_size=1000,
+        )
+    logger.info(f"Rebuilt {len(rows)} monthly rollups")
+    return len(rows)
+
+
+def rollups_for(user, start=None, end=None):
+    """A user's rollup rows, newest first, optionally limited to months in [start, end]."""
+    rollups = MonthlyUserRollup.objects.filter(user=user)
+    if start:
+        rollups = rollups.filter(month__gte=start)
+    if end:
+        rollups = rollups.filter(month__lte=end)
+    return rollups
+
+
+def totals(rollups):
+    """Sum the amount columns (and transaction_count) over rollup rows."""
+    sums = rollups.aggregate(
+        transaction_count=Sum("transaction_count"), **{field: Sum(field) for field in AMOUNT_FIELDS}
+    )
+    return {field: value or 0 for field, value in sums.items()}
+
+
+def period_rollups(user, year=None, month=None):
+    """Rollup rows covering a report period (a year, one month, or everything)."""
+    if not year:
+        return rollups_for(user)
+    start, end = period_bounds(year, month)
+    return rollups_for(user, start.date(), (end - timedelta(days=1)).date())
@@ -0,0 +1,104 @@
+"""Match scoring for passenger requests against carpool rides.
+
+calculate_match_score scores one (request, ride) pair with geopy; score_matrix
+computes the same score for every pair of two batches at once with NumPy.
+
+score_matrix uses the haversine formula on a sphere of the mean Earth radius
+instead of the WGS-84 geodesic. Within the 50km range that matters for the
+location term the two distances differ by at most ~0.6%, which moves a score
+by less than SCORE_TOLERANCE.
+"""
+import numpy as np
+from geopy.distance import geodesic
+
+# scoring weights
+MATCH_THRESHOLD = 0.7
+MAX_DISTANCE_KM = 50
+TIME_WINDOW_HOURS = 2
+LOCATION_WEIGHT = 0.5
+TIME_WEIGHT = 0.3
+PREFERENCE_WEIGHT = 0.2
+
+EARTH_RADIUS_KM = 6371.0088
+# max |score_matrix - calculate_match_score| for any pair
+SCORE_TOLERANCE = 5e-3
+
+
+def calculate_match_score(ride_request, ride):
+    """Calculate a match score based on location, time, and preferences."""
+    score = 0.0
+    try:
+        # Location proximity
+        pickup_location = ride_request.pickup_location
+        if pickup_location and "lat" in pickup_location and "lng" in pickup_location:
+            passenger_coords = (pickup_location["lat"], pickup_location["lng"])
+            ride_origin = (ride.origin["lat"], ride.origin["lng"])
+            distance = geodesic(passenger_coords, ride_origin).km
+            score += max(0, 1 - distance / MAX_DISTANCE_KM) * LOCATION_WEIGHT  # 50km max range, 50% weight
+
+        # Time compatibility
+        time_diff = abs((ride.departure_time - ride_request.created_at).total_seconds() / 3600)
+        score += max(0, 1 - time_diff / TIME_WINDOW_HOURS) * TIME_WEIGHT  # 2-hour window, 30% weight
+
+        # Women-only preference
+        passenger = ride_request.passenger
+        preferences = getattr(passenger, "preferences", None)
+        if ride.is_women_only and (passenger.gender == "female" or (preferences and preferences.prefers_women_only_rides)):
+            score += PREFERENCE_WEIGHT  # 20% weight for preference match
+        elif not ride.is_women_only and preferences and preferences.prefers_women_only_rides:
+            score -= PREFERENCE_WEIGHT  # Penalize if passenger prefers women-only but ride isn't
+
+        return min(max(score, 0), 1)  # Normalize between 0 and 1
+    except Exception as e:
+        print(f"Error calculating match score for {ride_request.passenger.fullname}: {e}")
+        return 0.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km; arguments broadcast like any NumPy ufunc."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lng1, lat2, lng2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def score_matrix(
+    req_lat, req_lng, req_created_at, req_is_female, req_prefers_women_only,
+    ride_lat, ride_lng, ride_departure_time, ride_is_women_only,
+):
+    """Score every request against every ride.
+
+    Request arrays have length R and ride arrays length N; the result is an
+    (R, N) float array matching calculate_match_score within SCORE_TOLERANCE.
+    Times are POSIX timestamps in seconds. A request without a pickup point
+    has NaN lat/lng and gets no location credit; a ride without a usable
+    origin has NaN lat/lng and scores 0 against requests that have one, as
+    the per-pair function does when it fails to read the origin.
+    """
+    req_lat = np.asarray(req_lat, dtype=float)[:, None]
+    req_lng = np.asarray(req_lng, dtype=float)[:, None]
+    req_created_at = np.asarray(req_created_at, dtype=float)[:, None]
+    wants_women_only = np.asarray(req_prefers_women_only, dtype=bool)[:, None]
+    women_only_ok = np.asarray(req_is_female, dtype=bool)[:, None] | wants_women_only
+
+    ride_lat = np.asarray(ride_lat, dtype=float)[None, :]
+    ride_lng = np.asarray(ride_lng, dtype=float)[None, :]
+    ride_departure_time = np.asarray(ride_departure_time, dtype=float)[None, :]
+    ride_is_women_only = np.asarray(ride_is_women_only, dtype=bool)[None, :]
+
+    with np.errstate(invalid="ignore"):
+        distance = haversine_km(req_lat, req_lng, ride_lat, ride_lng)
+    location = np.nan_to_num(np.maximum(0, 1 - distance / MAX_DISTANCE_KM), nan=0.0)
+    score = location * LOCATION_WEIGHT
+
+    time_diff = np.abs(ride_departure_time - req_created_at) / 3600
+    score = score + np.maximum(0, 1 - time_diff / TIME_WINDOW_HOURS) * TIME_WEIGHT
+
+    score = score + np.where(ride_is_women_only & women_only_ok, PREFERENCE_WEIGHT, 0.0)
+    score = score - np.where(~ride_is_women_only & wants_women_only, PREFERENCE_WEIGHT, 0.0)
+
+    score = np.clip(score, 0, 1)
+    bad_origin = (np.isnan(ride_lat) | np.isnan(ride_lng)) & ~(np.isnan(req_lat) | np.isnan(req_lng))
+    return np.where(bad_origin, 0.0, score)
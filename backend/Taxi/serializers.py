@@ -314,7 +314,7 @@ class CarpoolRideSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CarpoolRide
-        fields = "__all__"
+        exclude = CarpoolRide.LOCATION_COLUMNS  # derived from origin/destination
         
         read_only_fields = ["carpoolride_id", "created_at", "last_updated", "driver", "requests", "driver_name", "driver_number", "vehicle"]
     def validate_departure_time(self, value):
@@ -333,6 +333,8 @@ class CarpoolRideSerializer(serializers.ModelSerializer):
             return data
         
 
+from django.db.models import Prefetch
+
 class RideHistorySerializer(serializers.ModelSerializer):
     driver_contact = serializers.SerializerMethodField()
     passengers_info = serializers.SerializerMethodField()
@@ -345,11 +347,20 @@ class RideHistorySerializer(serializers.ModelSerializer):
             'driver_contact', 'passengers_info', 'total_amount_paid', 'requests'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load drivers and all requests with their passengers up front; the getters filter in Python."""
+        return queryset.select_related('driver').prefetch_related(
+            Prefetch('requests', queryset=RideRequest.objects.select_related('passenger'))
+        )
+
+    def _accepted_requests(self, obj):
+        return [req for req in obj.requests.all() if req.status == 'accepted']
+
     def get_driver_contact(self, obj):
         user = self.context['request'].user
         # If user is a passenger (has an accepted ride request)
-        ride_requests = obj.requests.filter(passenger=user, status='accepted')
-        if ride_requests.exists():
+        if any(req.passenger_id == user.id for req in self._accepted_requests(obj)):
             return {
                 'name': obj.driver.fullname,
                 'phone': obj.driver.phone_number,
@@ -357,7 +368,7 @@ class RideHistorySerializer(serializers.ModelSerializer):
                 'id': str(obj.driver.id)
             }
         # If user is the driver, return their own contact info
-        if obj.driver == user:
+        if obj.driver_id == user.id:
             return {
                 'name': user.fullname,
                 'phone': user.phone_number,
@@ -369,19 +380,19 @@ class RideHistorySerializer(serializers.ModelSerializer):
     def get_passengers_info(self, obj):
         user = self.context['request'].user
         info = []
-        for reqs in obj.requests.filter(status='accepted'):
+        for reqs in self._accepted_requests(obj):
             passenger = reqs.passenger
             data = {
                 'id': str(passenger.id),
                 'name': passenger.fullname,
                 'phone': passenger.phone_number,
             }
-            if obj.driver == user:
+            if obj.driver_id == user.id:
                 data.update({
                     'phone': passenger.phone_number,
                     'email': passenger.email,
                     'seats_requested': reqs.seats_requested,
-                    'amount_paid': float(reqs.ride.contribution_per_seat) * reqs.seats_requested
+                    'amount_paid': float(obj.contribution_per_seat) * reqs.seats_requested
                 })
             info.append(data)
         return info
@@ -658,7 +669,8 @@ class registeruserserializer(serializers.ModelSerializer):
         user.save()
         return user
     
-from Taxi.models import UserWallet, ProfileStats, WalletTransaction
+from Taxi.models import UserWallet, ProfileStats, WalletTransaction, MonthlyUserRollup
+from Taxi.rollups import month_start
 from django.db import models
 class UserProfileSerializer(serializers.ModelSerializer):
     wallet_balance = serializers.SerializerMethodField()
@@ -718,15 +730,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         if not obj.is_driver:
             return 0.00
         try:
-            current_year = timezone.now().year
-            current_month = timezone.now().month
-            earnings = WalletTransaction.objects.filter(
-                user=obj,
-                transaction_type="escrow_release",
-                status="completed",
-                created_at__year=current_year,
-                created_at__month=current_month
-            ).aggregate(total=models.Sum('amount'))['total'] or 0.00
+            # one row from the monthly rollups instead of summing this month's transactions
+            earnings = MonthlyUserRollup.objects.filter(
+                user=obj, month=month_start(timezone.now())
+            ).values_list('earnings', flat=True).first() or 0.00
             return float(earnings)
         except Exception as e:
             logger.error(f"Error calculating monthly earnings for user {obj.id}: {e}")
@@ -849,4 +856,39 @@ from Taxi.models import Report
 class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
-        fields = ['report_id', 'report_type', 'report_data', 'created_at', 'file_url']
\ No newline at end of file
+        fields = ['report_id', 'report_type', 'report_data', 'created_at', 'file_url', 'period', 'status']
+
+
+from Taxi.models import MonthlyUserRollup
+
+class MonthlyUserRollupSerializer(serializers.ModelSerializer):
+    month = serializers.DateField(format="%Y-%m")
+
+    class Meta:
+        model = MonthlyUserRollup
+        fields = [
+            'month', 'earnings', 'spending', 'refunds', 'deposits', 'withdrawals',
+            'transfers_sent', 'transfers_received', 'transaction_count',
+        ]
+
+
+from Taxi.ride_search import (
+    DEFAULT_DROPOFF_RADIUS_KM, DEFAULT_PICKUP_RADIUS_KM, DEFAULT_RESULTS, MAX_RADIUS_KM, MAX_RESULTS,
+)
+
+class NearbyRideSearchSerializer(serializers.Serializer):
+    """Query parameters of the proximity ride search."""
+    pickup_lat = serializers.FloatField(min_value=-90, max_value=90)
+    pickup_lng = serializers.FloatField(min_value=-180, max_value=180)
+    pickup_radius_km = serializers.FloatField(min_value=0.1, max_value=MAX_RADIUS_KM, default=DEFAULT_PICKUP_RADIUS_KM)
+    dropoff_lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    dropoff_lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    dropoff_radius_km = serializers.FloatField(min_value=0.1, max_value=MAX_RADIUS_KM, default=DEFAULT_DROPOFF_RADIUS_KM)
+    departure_time = serializers.DateTimeField(required=False)
+    window_hours = serializers.FloatField(min_value=0.25, max_value=24, default=2)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_RESULTS, default=DEFAULT_RESULTS)
+
+    def validate(self, data):
+        if ("dropoff_lat" in data) != ("dropoff_lng" in data):
+            raise serializers.ValidationError("dropoff_lat and dropoff_lng must be given together")
+        return data
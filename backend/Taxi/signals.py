@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import UserWallet, CustomUser
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .models import UserWallet, CustomUser, WalletTransaction, VehicleMake, VehicleModel
+from .rollups import apply_transaction, reverse_transaction, rollup_entries
+from . import token_users, vehicle_catalog
 
 # @receiver(post_save, sender=UserWallet)
 # def update_wallet_balance(sender, instance, **kwargs):
@@ -18,4 +21,65 @@ from .models import UserWallet, CustomUser
 @receiver(post_delete, sender=CustomUser)
 def delete_profile_picture_on_user_delete(sender, instance, **kwargs):
     if instance.profile_picture:
-        instance.profile_picture.delete(False)
\ No newline at end of file
+        instance.profile_picture.delete(False)
+
+
+@receiver(pre_save, sender=WalletTransaction)
+def remember_stored_transaction(sender, instance, **kwargs):
+    """Keep the stored row so post_save can tell what the save changed for the rollups."""
+    if instance._state.adding:
+        instance._previous = None
+    else:
+        instance._previous = WalletTransaction.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=WalletTransaction)
+def update_monthly_rollups(sender, instance, raw=False, **kwargs):
+    """
+    Add a transaction to the monthly rollups the moment it is completed, and
+    take it back out if it leaves "completed" or its amount, type, users or
+    month are edited afterwards.
+    """
+    if raw:
+        return
+    previous = getattr(instance, "_previous", None)
+    was_completed = previous is not None and previous.status == "completed"
+    if was_completed and instance.status == "completed" and rollup_entries(previous) == rollup_entries(instance):
+        return
+    if was_completed:
+        reverse_transaction(previous)
+    if instance.status == "completed":
+        apply_transaction(instance)
+
+
+@receiver(post_delete, sender=WalletTransaction)
+def remove_deleted_transaction_from_rollups(sender, instance, **kwargs):
+    if instance.status == "completed":
+        reverse_transaction(instance)
+
+
+@receiver(post_save, sender=VehicleMake)
+@receiver(post_delete, sender=VehicleMake)
+@receiver(post_save, sender=VehicleModel)
+@receiver(post_delete, sender=VehicleModel)
+def invalidate_vehicle_catalog(sender, raw=False, **kwargs):
+    """Rebuild the cached make/model lists whenever the admin (or anything else) changes them."""
+    if raw:
+        return
+    vehicle_catalog.invalidate()
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def forget_websocket_user_on_blacklist(sender, instance, created, raw=False, **kwargs):
+    """Logout (or refresh rotation) blacklists a refresh token: drop the user's cached socket logins."""
+    if raw or not created or instance.token.user_id is None:
+        return
+    token_users.invalidate_user(instance.token.user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def forget_websocket_user_on_change(sender, instance, raw=False, **kwargs):
+    """Sockets must not connect with a stale (e.g. deactivated) user."""
+    if raw:
+        return
+    token_users.invalidate_user(instance.pk)
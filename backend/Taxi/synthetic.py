@@ -0,0 +1,103 @@
+"""Synthetic city-scale data for benchmarking the matching engine.
+
+generate_city creates drivers (each with a vehicle and a pending ride) and
+passengers (each with a pending request) spread uniformly over a bounding
+box, using bulk inserts so 100k-row scales stay practical. Nothing here is
+meant for production data; callers wrap it in a transaction and roll back.
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .models import CustomUser, UserPreferences, Vehicle, CarpoolRide, RideRequest
+
+# (south, west, north, east) around Nairobi
+DEFAULT_BBOX = (-1.45, 36.65, -1.15, 37.10)
+BATCH_SIZE = 2000
+# request creation times are spread over this many slots, one UPDATE per slot
+REQUEST_TIME_SLOTS = 24
+
+
+def _point(rng, bbox):
+    south, west, north, east = bbox
+    return {"lat": rng.uniform(south, north), "lng": rng.uniform(west, east), "label": "Synthetic"}
+
+
+def generate_city(rides, requests, bbox=DEFAULT_BBOX, hours=12, seed=0):
+    """Create `rides` rides and `requests` requests inside bbox.
+
+    Departures are spread over the next `hours`; requests were created at
+    some point in the last `hours`. About 15% of rides are women-only and
+    about 20% of passengers prefer women-only rides. Returns the created
+    ride and request counts.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    run = uuid.uuid4().hex[:8]
+    # one hash for everyone; hashing per user would dominate generation time
+    password = make_password(None)
+
+    drivers = [
+        CustomUser(
+            email=f"bench-driver-{run}-{i}@example.com", phone_number=f"d{run}{i}",
+            password=password, is_driver=True, gender=rng.choice(["male", "female"]),
+        )
+        for i in range(rides)
+    ]
+    passengers = [
+        CustomUser(
+            email=f"bench-passenger-{run}-{i}@example.com", phone_number=f"p{run}{i}",
+            password=password, gender=rng.choice(["male", "female"]),
+        )
+        for i in range(requests)
+    ]
+    CustomUser.objects.bulk_create(drivers + passengers, batch_size=BATCH_SIZE)
+
+    UserPreferences.objects.bulk_create(
+        [UserPreferences(user=p, prefers_women_only_rides=True) for p in passengers if rng.random() < 0.2],
+        batch_size=BATCH_SIZE,
+    )
+    vehicles = [
+        Vehicle(driver=d, plate_number=f"B{run}{i}", capacity=4, year=2018)
+        for i, d in enumerate(drivers)
+    ]
+    Vehicle.objects.bulk_create(vehicles, batch_size=BATCH_SIZE)
+
+    ride_objs = [
+        CarpoolRide(
+            driver=driver,
+            vehicle=vehicle,
+            origin=_point(rng, bbox),
+            destination=_point(rng, bbox),
+            departure_time=now + timedelta(seconds=rng.uniform(0, hours * 3600)),
+            available_seats=rng.randint(1, 4),
+            contribution_per_seat=200,
+            is_women_only=driver.gender == "female" and rng.random() < 0.3,
+        )
+        for driver, vehicle in zip(drivers, vehicles)
+    ]
+    for ride in ride_objs:
+        ride.sync_location_columns()  # bulk_create skips save()
+    CarpoolRide.objects.bulk_create(ride_objs, batch_size=BATCH_SIZE)
+
+    request_objs = [
+        RideRequest(ride=rng.choice(ride_objs), passenger=passenger, pickup_location=_point(rng, bbox))
+        for passenger in passengers
+    ] if ride_objs else []
+    RideRequest.objects.bulk_create(request_objs, batch_size=BATCH_SIZE)
+
+    # created_at is auto_now_add, so backdate in a few slot-wide updates
+    slots = [[] for _ in range(REQUEST_TIME_SLOTS)]
+    for ride_request in request_objs:
+        slots[rng.randrange(REQUEST_TIME_SLOTS)].append(ride_request.pk)
+    slot_length = timedelta(hours=hours) / REQUEST_TIME_SLOTS
+    for slot, pks in enumerate(slots):
+        for start in range(0, len(pks), BATCH_SIZE):
+            RideRequest.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).update(
+                created_at=now - slot * slot_length
+            )
+
+    return len(ride_objs), len(request_objs)
@@ -1,13 +1,25 @@
-from celery import shared_task
+from celery import shared_task, chord
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from datetime import datetime
 from geopy.distance import geodesic
+import logging
 import requests
 
-from .models import CustomUser, RideRequest, CarpoolRide, RideMatch, UserPreferences, UserLocation
+from .models import CustomUser, RideRequest, CarpoolRide, RideMatch, UserPreferences, UserLocation, Report
 from .utils import send_notification
+from .notifications import dispatch
+from .live_location import flush_checkpoints
+from .emails import send_payloads, MAX_RETRIES, RETRY_BACKOFF_SECONDS
+from .matching import (
+    run_matching, match_ride, match_ride_request, reconcile_matching,
+    prepare_shards, score_shard, merge_shard_results,
+)
+from .scoring import calculate_match_score
+from .reports import build_artifact
+
+logger = logging.getLogger(__name__)
 
 @shared_task
 def check_license_expiry():
@@ -69,78 +81,80 @@ def check_driver_proximity(ride_id):
         pass  # Ride or location might not exist
 
 @shared_task
-def match_passengers_to_rides():
-    """Match passengers to rides based on location, time, and preferences."""
-    rides = CarpoolRide.objects.filter(
-        status="pending",
-        is_completed=False,
-        is_cancelled=False,
-        is_full=False,
-        available_seats__gt=0
+def dispatch_notifications(notifications, carpoolride_id=None):
+    """Deliver queued (user_id, message) notifications over websocket and FCM in one batch."""
+    return len(dispatch(notifications, carpoolride_id))
+
+@shared_task
+def notify_pickup_approaching(ride_id, pickups):
+    """Tell passengers their driver is about to reach them; pickups are (passenger_id, label) pairs."""
+    dispatch(
+        [(passenger_id, f"Your ride is approaching! Get ready for pickup at {label}.") for passenger_id, label in pickups],
+        carpoolride_id=ride_id,
     )
 
-    for ride in rides:
-        ride_requests = RideRequest.objects.filter(status="pending").select_related("passenger")
+@shared_task
+def match_passengers_to_rides(shards=1):
+    """Match passengers to rides based on location, time, and preferences.
+
+    With shards > 1 the run is split by area and scored on separate workers
+    through a chord; returns the number of shards dispatched in that case.
+    """
+    if shards <= 1:
+        return run_matching()
+    payloads = prepare_shards(shards)
+    if payloads:
+        chord(score_matching_shard.s(payload) for payload in payloads)(save_matching_shards.s())
+    return len(payloads)
+
+@shared_task
+def score_matching_shard(payload):
+    """Score one geographic shard; the chord callback writes the results."""
+    return score_shard(payload)
 
-        for ride_request in ride_requests:
-            passenger = ride_request.passenger
-            if RideMatch.objects.filter(passenger=passenger, ride=ride).exists():
-                continue
+@shared_task
+def save_matching_shards(results):
+    """Chord callback: merge shard results and bulk-write the new matches."""
+    return merge_shard_results(results)
 
-            score = calculate_match_score(ride_request, ride)
-            if score > 0.7:  # Threshold for a good match
-                RideMatch.objects.create(
-                    passenger=passenger,
-                    ride=ride,
-                    score=score
-                )
+@shared_task
+def match_new_ride(ride_id):
+    """Suggest a newly posted ride to the pending requests around its departure time."""
+    return match_ride(ride_id)
 
-def calculate_match_score(ride_request, ride):
-    """Calculate a match score based on location, time, and preferences."""
-    score = 0.0
+@shared_task
+def match_new_ride_request(ride_request_id):
+    """Suggest open rides to a passenger right after they post a request."""
+    return match_ride_request(ride_request_id)
+
+@shared_task
+def flush_live_locations():
+    """Checkpoint the latest live driver locations from Redis into UserLocation."""
+    return flush_checkpoints()
+
+@shared_task
+def reconcile_ride_matches():
+    """Periodic safety net: re-score only rides and requests that changed recently."""
+    return reconcile_matching()
+
+@shared_task(bind=True, max_retries=MAX_RETRIES)
+def send_email_batch(self, payloads):
+    """Send pre-rendered emails over one SMTP connection; retry whatever did not go out."""
+    unsent, error = send_payloads(payloads)
+    if unsent:
+        raise self.retry(args=[unsent], exc=error, countdown=RETRY_BACKOFF_SECONDS * 2 ** self.request.retries)
+    return len(payloads)
+
+@shared_task
+def generate_report_artifact(report_id):
+    """Render a closed-month report into MEDIA_ROOT (see Taxi/reports.py)."""
+    report = Report.objects.select_related('user').filter(report_id=report_id, status="pending").first()
+    if report is None:
+        return None
     try:
-        # Location proximity
-        pickup_location = ride_request.pickup_location
-        if pickup_location and "lat" in pickup_location and "lng" in pickup_location:
-            passenger_coords = (pickup_location["lat"], pickup_location["lng"])
-            ride_origin = (ride.origin["lat"], ride.origin["lng"])
-            distance = geodesic(passenger_coords, ride_origin).km
-            score += max(0, 1 - distance / 50) * 0.5  # 50km max range, 50% weight
-
-        # Time compatibility
-        time_diff = abs((ride.departure_time - ride_request.created_at).total_seconds() / 3600)
-        score += max(0, 1 - time_diff / 2) * 0.3  # 2-hour window, 30% weight
-
-        # Women-only preference
-        passenger = ride_request.passenger
-        preferences = getattr(passenger, "preferences", None)
-        if ride.is_women_only and (passenger.gender == "female" or (preferences and preferences.prefers_women_only_rides)):
-            score += 0.2  # 20% weight for preference match
-        elif not ride.is_women_only and preferences and preferences.prefers_women_only_rides:
-            score -= 0.2  # Penalize if passenger prefers women-only but ride isn't
-
-        return min(max(score, 0), 1)  # Normalize between 0 and 1
+        build_artifact(report)
     except Exception as e:
-        print(f"Error calculating match score for {ride_request.passenger.fullname}: {e}")
-        return 0.0
-    
-# # tasks.py
-# from celery import shared_task
-# from django.core.mail import EmailMultiAlternatives
-# from django.template.loader import render_to_string
-
-# @shared_task
-# def send_email_async(subject, to_email, context):
-#     text_content = render_to_string('emails/base_email.txt', context)
-#     html_content = render_to_string('emails/base_email.html', context)
-#     email = EmailMultiAlternatives(
-#         subject=subject,
-#         body=text_content,
-#         from_email=settings.DEFAULT_FROM_EMAIL,
-#         to=[to_email] if isinstance(to_email, str) else to_email,
-#     )
-#     email.attach_alternative(html_content, "text/html")
-#     email.send()
-
-# in the views
-# send_email_async.delay(subject, user.email, context)
\ No newline at end of file
+        logger.error(f"Failed to build report {report_id}: {str(e)}")
+        Report.objects.filter(pk=report.pk).update(status="failed")
+        raise
+    return report.file_url
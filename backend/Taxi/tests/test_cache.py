@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from Taxi import cache
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "taxi-cache-tests"}}
+
+
+@override_settings(CACHES=LOCMEM)
+class CacheHelperTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_get_or_set_computes_once(self):
+        compute = mock.Mock(return_value={"makes": ["Toyota"]})
+
+        first = cache.get_or_set("vehicle_catalog", "makes", compute=compute)
+        second = cache.get_or_set("vehicle_catalog", "makes", compute=compute)
+
+        self.assertEqual(first, {"makes": ["Toyota"]})
+        self.assertEqual(second, first)
+        compute.assert_called_once()
+        self.assertEqual(cache.stats("vehicle_catalog"), {"hits": 1, "misses": 1})
+
+    def test_cached_none_is_a_hit(self):
+        compute = mock.Mock(return_value=None)
+
+        cache.get_or_set("vehicle_catalog", "empty", compute=compute)
+        cache.get_or_set("vehicle_catalog", "empty", compute=compute)
+
+        compute.assert_called_once()
+
+    def test_invalidate_moves_namespace_to_new_keys(self):
+        cache.set_value("vehicle_catalog", "makes", value="old")
+        old_key = cache.make_key("vehicle_catalog", "makes")
+
+        cache.invalidate("vehicle_catalog")
+
+        self.assertNotEqual(cache.make_key("vehicle_catalog", "makes"), old_key)
+        self.assertIsNone(cache.get_value("vehicle_catalog", "makes"))
+        self.assertEqual(cache.get_or_set("vehicle_catalog", "makes", compute=lambda: "new"), "new")
+
+    def test_invalidating_a_namespace_without_a_version_yet(self):
+        self.assertEqual(cache.invalidate("open_rides:2026-10-19"), 2)
+        self.assertTrue(cache.make_key("open_rides:2026-10-19", "any").startswith("open_rides:2026-10-19:v2:"))
+
+    def test_user_namespaces_are_invalidated_independently(self):
+        alice, bob = cache.user_namespace("ws_user", 1), cache.user_namespace("ws_user", 2)
+        cache.set_value(alice, "token", value="alice")
+        cache.set_value(bob, "token", value="bob")
+
+        cache.invalidate(alice)
+
+        self.assertIsNone(cache.get_value(alice, "token"))
+        self.assertEqual(cache.get_value(bob, "token"), "bob")
+        # counters are shared by every namespace of the same kind
+        self.assertEqual(cache.stats(alice), {"hits": 1, "misses": 1})
+        cache.reset_stats(bob)
+        self.assertEqual(cache.stats("ws_user"), {"hits": 0, "misses": 0})
+
+    def test_waits_for_the_process_holding_the_lock(self):
+        key = cache.make_key("vehicle_catalog", "makes")
+        caches["default"].add(f"{key}:lock", 1)
+        compute = mock.Mock(return_value="recomputed here")
+
+        def other_process_finishes(seconds):
+            caches["default"].set(key, "from the lock holder")
+
+        with mock.patch.object(cache.time, "sleep", side_effect=other_process_finishes):
+            value = cache.get_or_set("vehicle_catalog", "makes", compute=compute)
+
+        self.assertEqual(value, "from the lock holder")
+        compute.assert_not_called()
+
+    def test_computes_itself_when_the_lock_holder_is_too_slow(self):
+        key = cache.make_key("vehicle_catalog", "makes")
+        caches["default"].add(f"{key}:lock", 1)
+
+        with mock.patch.object(cache, "LOCK_WAIT_SECONDS", 0):
+            value = cache.get_or_set("vehicle_catalog", "makes", compute=lambda: "recomputed here")
+
+        self.assertEqual(value, "recomputed here")
+
+    def test_lock_is_released_when_compute_fails(self):
+        def broken():
+            raise RuntimeError("database down")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_set("vehicle_catalog", "makes", compute=broken)
+
+        self.assertEqual(cache.get_or_set("vehicle_catalog", "makes", compute=lambda: "ok"), "ok")
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from itertools import count
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi.models import RideRequest, UserLocation, Vehicle, VehicleMake, VehicleModel
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+_plate = count(100)
+
+
+def make_driver():
+    driver = make_user(is_driver=True, gender="female", first_name="Wanjiru")
+    make, _ = VehicleMake.objects.get_or_create(name="Toyota")
+    model, _ = VehicleModel.objects.get_or_create(make=make, name="Probox")
+    Vehicle.objects.create(driver=driver, make=make, model=model, plate_number=f"KDA {next(_plate)}A", year=2018)
+    return driver
+
+
+class UserDashboardTests(TestCase):
+    def setUp(self):
+        self.passenger = make_user(first_name="Otieno")
+        self.client = APIClient()
+        self.client.force_authenticate(self.passenger)
+
+    def add_ride(self, minutes):
+        driver = make_driver()
+        ride = make_ride(driver, -1.2921, 36.8219, timezone.now() + timedelta(minutes=minutes), vehicle=driver.vehicle)
+        for passenger in (self.passenger, make_user(), make_user()):
+            ride_request = make_request(ride, passenger, -1.29, 36.82)
+            RideRequest.objects.filter(pk=ride_request.pk).update(status="accepted")
+        now = timezone.now()
+        for age, lat in ((10, -1.30), (1, -1.2950)):
+            location = UserLocation.objects.create(user=driver, ride=ride, latitude=lat, longitude=36.82)
+            UserLocation.objects.filter(pk=location.pk).update(updated_at=now - timedelta(minutes=age))
+        return ride
+
+    def get_dashboard(self):
+        response = self.client.get(reverse("user-dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return response.data["upcoming_rides"]
+
+    def test_query_count_does_not_grow_with_rides(self):
+        self.add_ride(30)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.get_dashboard()), 1)
+        for minutes in (40, 50, 60, 70):
+            self.add_ride(minutes)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.get_dashboard()), 5)
+
+    def test_payload(self):
+        ride = self.add_ride(30)
+        other = make_ride(make_driver(), -1.2921, 36.8219, timezone.now() + timedelta(minutes=20))
+        make_request(other, self.passenger, -1.29, 36.82)  # still pending
+
+        [ride_data] = self.get_dashboard()
+        self.assertEqual(ride_data["carpoolride_id"], str(ride.carpoolride_id))
+        self.assertEqual(ride_data["driver_name"], ride.driver.fullname)
+        self.assertEqual(ride_data["vehicle"]["make_name"], "Toyota")
+        self.assertEqual(len(ride_data["requests"]), 3)
+        self.assertEqual(ride_data["driver_location"]["latitude"], -1.2950)
+        self.assertEqual(ride_data["driver_location"]["user_id"], str(ride.driver.id))
+        self.assertEqual(ride_data["passenger_request"]["passenger_id"], str(self.passenger.id))
+        self.assertEqual(ride_data["passenger_request"]["pickup_location"]["lat"], -1.29)
@@ -0,0 +1,96 @@
+from io import StringIO
+from unittest import mock
+
+from celery.exceptions import Retry
+from django.core import mail
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi import emails, tasks
+from Taxi.models import UserWallet
+from Taxi.tests.test_matching import make_user
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        emails._reset_connection()
+
+    def test_transfer_queues_one_batch_after_commit(self):
+        sender = make_user(first_name="Amina")
+        recipient = make_user(first_name="Brian")
+        UserWallet.objects.create(user=sender, balance=1000)
+        UserWallet.objects.create(user=recipient)
+
+        client = APIClient()
+        client.force_authenticate(sender)
+        with mock.patch.object(tasks.send_email_batch, "delay") as delay:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = client.post(reverse("transfer"), {"phone_number": recipient.phone_number, "amount": "250"})
+            self.assertEqual(response.status_code, 200)
+            delay.assert_not_called()
+            for callback in callbacks:
+                callback()
+        delay.assert_called_once()
+        [payloads] = delay.call_args.args
+        self.assertEqual([payload["to"] for payload in payloads], [[sender.email], [recipient.email]])
+        self.assertIn("Dear Brian", payloads[1]["html"])
+        self.assertEqual(mail.outbox, [])
+
+    def test_batch_shares_one_connection(self):
+        payloads = [emails.render_email("Hello", f"User {i}", "Hi", f"user{i}@example.com") for i in range(3)]
+        with mock.patch.object(emails, "get_connection", wraps=emails.get_connection) as get_connection:
+            self.assertEqual(tasks.send_email_batch.apply(args=[payloads]).get(), 3)
+            tasks.send_email_batch.apply(args=[payloads[:1]]).get()
+        get_connection.assert_called_once()
+        self.assertEqual([message.to for message in mail.outbox], [[f"user{i}@example.com"] for i in range(3)] + [["user0@example.com"]])
+        self.assertIn("Dear User 2", mail.outbox[2].alternatives[0][0])
+
+    def test_retries_only_unsent_messages(self):
+        payloads = [emails.render_email("Hello", "User", "Hi", f"user{i}@example.com") for i in range(3)]
+        send = mail.EmailMessage.send
+        calls = []
+
+        def flaky_send(message, *args, **kwargs):
+            calls.append(message.to)
+            if len(calls) == 2:
+                raise ConnectionResetError("SMTP went away")
+            return send(message, *args, **kwargs)
+
+        with mock.patch.object(mail.EmailMessage, "send", flaky_send), \
+                mock.patch.object(tasks.send_email_batch, "retry", side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                tasks.send_email_batch.run(payloads)
+        self.assertEqual(retry.call_args.kwargs["args"], [payloads[1:]])
+        self.assertEqual(retry.call_args.kwargs["countdown"], emails.RETRY_BACKOFF_SECONDS)
+        self.assertEqual([message.to for message in mail.outbox], [["user0@example.com"]])
+        self.assertIsNone(emails._connection)
+
+
+class EmailLayoutTests(TestCase):
+    def test_matches_render_to_string(self):
+        recipients = [
+            ("O'Neil & <Sons>", "<p>Fare: <strong>KES 200</strong> & tips</p>", "a@example.com"),
+            (None, "plain text", ["b@example.com", "c@example.com"]),
+        ]
+        payloads = emails.render_emails("Ride <Update>", recipients)
+        for (user_name, message, _), payload in zip(recipients, payloads):
+            context = {'subject': "Ride <Update>", 'user_name': user_name, 'message': message, 'year': timezone.now().year}
+            self.assertEqual(payload["body"], render_to_string('emails/base_email.txt', context))
+            self.assertEqual(payload["html"], render_to_string('emails/base_email.html', context))
+        self.assertEqual(payloads[1]["to"], ["b@example.com", "c@example.com"])
+
+    def test_layout_rendered_once_per_batch(self):
+        emails.get_layout.cache_clear()
+        with mock.patch.object(emails, "EmailLayout", wraps=emails.EmailLayout) as layout:
+            emails.render_emails("Ride Update", [(f"User {i}", "Hi", f"user{i}@example.com") for i in range(50)])
+            emails.render_email("Ride Update", "User", "Hi", "user@example.com")
+        layout.assert_called_once()
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_email_render", "--recipients", "20", "--rounds", "1", stdout=out)
+        self.assertIn("layout", out.getvalue())
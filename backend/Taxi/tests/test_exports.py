@@ -0,0 +1,102 @@
+import csv
+import io
+import warnings
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.testing import ApplicationCommunicator
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Taxi import exports
+from Taxi.models import Report
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+RIDES = 60
+
+
+class RideHistoryExportTests(TransactionTestCase):
+    # TransactionTestCase: the ASGI handler runs the view on its own thread and connection
+    def setUp(self):
+        self.driver = make_user(is_driver=True, gender="female", first_name="Wanjiru")
+        start = timezone.now() - timedelta(days=RIDES)
+        for day in range(RIDES):
+            make_ride(self.driver, -1.2921, 36.8219, start + timedelta(days=day), status="completed")
+        self.passenger = make_user()
+        other_driver = make_user(is_driver=True, gender="female")
+        make_request(make_ride(other_driver, -1.30, 36.80, start), self.passenger, -1.29, 36.82)
+        make_ride(other_driver, -1.30, 36.80, start)  # not the passenger's
+
+    def download(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get("/reports/ride-history/", params)
+
+    async def download_asgi(self, user, **params):
+        """
+        GET the export through Django's ASGI handler, as Daphne serves it.
+        Returns (status, headers, body messages) and fails if the handler had
+        to buffer a sync iterator.
+        """
+        communicator = ApplicationCommunicator(ASGIHandler(), {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/reports/ride-history/", "raw_path": b"/reports/ride-history/",
+            "query_string": urlencode(params).encode(), "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {AccessToken.for_user(user)}".encode())],
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        })
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            await communicator.send_input({"type": "http.request"})
+            start = await communicator.receive_output(10)
+            messages = []
+            while True:
+                message = await communicator.receive_output(10)
+                messages.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+        self.assertFalse([w for w in caught if "synchronous iterators" in str(w.message)])
+        return start["status"], dict(start["headers"]), messages
+
+    async def test_csv_streams_every_ride(self):
+        with mock.patch.object(exports, "EXPORT_CHUNK_SIZE", 25):
+            status, headers, messages = await self.download_asgi(self.driver, format="csv")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"Content-Type"], b"text/csv")
+        # header line, then one message per chunk of 25 rows
+        self.assertEqual(len([body for body in messages if body]), 4)
+        rows = list(csv.reader(io.StringIO(b"".join(messages).decode())))
+        self.assertEqual(rows[0], ["Origin", "Destination", "Departure Time", "Price per Seat", "Status"])
+        self.assertEqual(len(rows), RIDES + 1)
+        self.assertEqual(rows[1][1], "JKIA")
+        report = await Report.objects.aget(user=self.driver)
+        self.assertEqual(report.report_data["ride_count"], RIDES)
+
+    async def test_pdf_spans_pages(self):
+        with mock.patch.object(exports, "FILE_BLOCK_SIZE", 1024):
+            status, headers, messages = await self.download_asgi(self.driver, format="pdf")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"Content-Type"], b"application/pdf")
+        self.assertIn(b"attachment", headers[b"Content-Disposition"])
+        content = b"".join(messages)
+        self.assertEqual(int(headers[b"Content-Length"]), len(content))
+        self.assertGreater(len(messages), 2)
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertGreater(content.count(b"/Type /Page\n"), 1)
+
+    async def test_html_streams_rows_and_total(self):
+        status, headers, messages = await self.download_asgi(self.passenger)
+        self.assertEqual(status, 200)
+        html = b"".join(messages).decode()
+        self.assertEqual(html.count("<td>JKIA</td>"), 1)
+        self.assertIn("Total Rides: 1</p>", html)
+        self.assertIn("Ride History Report for", html)
+
+    def test_empty_period_and_bad_format(self):
+        response = self.download(self.driver, year=1999)
+        self.assertIn(b"No rides found for the selected period.", response.content)
+        self.assertEqual(self.download(self.driver, format="xlsx").status_code, 404)
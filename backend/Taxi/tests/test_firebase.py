@@ -0,0 +1,124 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import firebase_admin
+from django.test import SimpleTestCase, TestCase, override_settings
+from firebase_admin import credentials, messaging
+from google.auth.credentials import AnonymousCredentials
+
+from Taxi import firebase
+from Taxi.tests.test_matching import make_user
+
+
+class NoAuthCredential(credentials.Base):
+    def get_credential(self):
+        return AnonymousCredentials()
+
+
+class FakeFCMHandler(BaseHTTPRequestHandler):
+    """Answers FCM v1 messages:send like Google would, keyed on the token."""
+    requests_seen = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        token = body["message"]["token"]
+        self.requests_seen.append(token)
+        if token.startswith("dead"):
+            status, payload = 404, {"error": {
+                "code": 404, "message": "Requested entity was not found.", "status": "NOT_FOUND",
+                "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": "UNREGISTERED"}],
+            }}
+        elif token.startswith("busy"):
+            status, payload = 503, {"error": {"code": 503, "message": "Unavailable", "status": "UNAVAILABLE"}}
+        else:
+            status, payload = 200, {"name": f"projects/fake/messages/{token}"}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class BatchedPushTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFCMHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.app = firebase_admin.initialize_app(
+            NoAuthCredential(), {"projectId": "fake", "httpTimeout": 5}, name="fake-fcm"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        firebase_admin.delete_app(cls.app)
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FakeFCMHandler.requests_seen = []
+        firebase.push_counters.clear()
+
+    def send(self, pushes):
+        endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        with override_settings(FCM_ENDPOINT=endpoint):
+            return firebase.send_push_batch(pushes, app=self.app)
+
+    def test_outcomes_and_pruning(self):
+        live = make_user(fcm_token="live-1")
+        dead = make_user(fcm_token="dead-1")
+        outcomes = self.send([
+            ("live-1", "Ride Update", "hello"),
+            ("dead-1", "Ride Update", "hello"),
+            ("busy-1", "Ride Update", "hello"),
+        ])
+
+        self.assertEqual(outcomes[0], ("projects/fake/messages/live-1", None))
+        self.assertIsNone(outcomes[1][0])
+        self.assertIsNotNone(outcomes[2][1])
+        live.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(live.fcm_token, "live-1")
+        self.assertIsNone(dead.fcm_token)
+        self.assertEqual(dict(firebase.push_counters), {"sent": 1, "failed": 2, "pruned": 1})
+
+    def test_splits_into_batches(self):
+        with mock.patch.object(firebase, "FCM_BATCH_SIZE", 2), \
+                mock.patch.object(firebase, "_send_each", wraps=firebase._send_each) as send_each:
+            outcomes = self.send([(f"live-{i}", "Ride Update", "hello") for i in range(5)])
+        self.assertEqual([len(call.args[0]) for call in send_each.call_args_list], [2, 2, 1])
+        self.assertEqual([message_id for message_id, _ in outcomes], [f"projects/fake/messages/live-{i}" for i in range(5)])
+        self.assertEqual(firebase.push_counters["sent"], 5)
+
+    def test_without_endpoint_sends_through_the_public_api(self):
+        with override_settings(FCM_ENDPOINT=None), \
+                mock.patch.object(messaging, "send_each", return_value=mock.Mock(responses=[])) as send_each, \
+                mock.patch.object(messaging, "_MessagingService") as private_service:
+            firebase.send_push_batch([("live-1", "Ride Update", "hello")], app=self.app)
+        self.assertIs(send_each.call_args.kwargs["app"], self.app)
+        private_service.assert_not_called()
+
+    def test_endpoint_override_leaves_the_shared_service_alone(self):
+        self.send([("live-1", "Ride Update", "hello")])
+        self.assertEqual(
+            messaging._get_messaging_service(self.app)._fcm_url,
+            "https://fcm.googleapis.com/v1/projects/fake/messages:send",
+        )
+
+
+class FirebaseAdminInternalsTests(SimpleTestCase):
+    """The FCM_ENDPOINT override relies on these; fail here, not in staging, when an upgrade drops them."""
+
+    def test_messaging_service_internals_exist(self):
+        app = firebase_admin.initialize_app(NoAuthCredential(), {"projectId": "fake"}, name="fcm-internals")
+        self.addCleanup(firebase_admin.delete_app, app)
+        service = messaging._MessagingService(app)
+        self.assertEqual(service._fcm_url, messaging._MessagingService.FCM_URL.format("fake"))
+        self.assertTrue(callable(service.send_each))
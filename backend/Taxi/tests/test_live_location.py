@@ -0,0 +1,84 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+import redis
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi import live_location
+from Taxi.models import UserLocation
+from Taxi.tests.test_matching import make_ride, make_user
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+class LiveLocationTestMixin:
+    def setUp(self):
+        live_location._client = None
+        self.driver = make_user(is_driver=True, gender="female")
+        self.ride = make_ride(self.driver, -1.2921, 36.8219, timezone.now() + timedelta(minutes=5), status="in_progress")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def tearDown(self):
+        live_location._client = None
+
+    def post_fix(self, lat, lng):
+        return self.client.post(
+            reverse("update-driver-location"),
+            {"latitude": lat, "longitude": lng, "ride_id": str(self.ride.carpoolride_id), "is_simulated": True},
+            format="json",
+        )
+
+
+@skipUnless(redis_available(), "needs a Redis server at REDIS_URL")
+class LiveLocationStoreTests(LiveLocationTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        live_location.get_client().delete(live_location.DIRTY_KEY)
+
+    def tearDown(self):
+        client = live_location.get_client()
+        client.delete(live_location._geo_key(self.ride.carpoolride_id), live_location._fix_key(self.ride.carpoolride_id))
+        client.srem(live_location.DIRTY_KEY, str(self.ride.carpoolride_id))
+        super().tearDown()
+
+    def test_ping_goes_to_redis_and_flush_checkpoints_latest(self):
+        with self.assertNumQueries(1):  # only the ride lookup
+            self.assertEqual(self.post_fix(-1.30, 36.80).status_code, 200)
+        self.assertEqual(self.post_fix(-1.31, 36.81).status_code, 200)
+        self.assertFalse(UserLocation.objects.exists())
+
+        fix = live_location.get_fix(self.ride.carpoolride_id)
+        self.assertEqual((fix["latitude"], fix["longitude"]), (-1.31, 36.81))
+
+        self.assertEqual(live_location.flush_checkpoints(), 1)
+        location = UserLocation.objects.get(user=self.driver, ride=self.ride)
+        self.assertEqual((location.latitude, location.longitude), (-1.31, 36.81))
+        self.assertEqual(live_location.flush_checkpoints(), 0)
+
+        self.post_fix(-1.32, 36.82)
+        live_location.flush_checkpoints()
+        self.assertEqual(UserLocation.objects.filter(user=self.driver, ride=self.ride).count(), 1)
+
+    def test_driver_location_reads_hot_store(self):
+        self.post_fix(-1.30, 36.80)
+        response = self.client.get(reverse("driver-location", args=[self.ride.carpoolride_id]))
+        self.assertEqual((response.data["latitude"], response.data["longitude"]), (-1.30, 36.80))
+
+
+@override_settings(REDIS_URL="redis://127.0.0.1:1/0")
+class LiveLocationFallbackTests(LiveLocationTestMixin, TestCase):
+    def test_ping_falls_back_to_database_without_redis(self):
+        self.assertEqual(self.post_fix(-1.30, 36.80).status_code, 200)
+        location = UserLocation.objects.get(user=self.driver, ride=self.ride)
+        self.assertEqual((location.latitude, location.longitude), (-1.30, 36.80))
+        self.assertIsNone(live_location.get_fix(self.ride.carpoolride_id))
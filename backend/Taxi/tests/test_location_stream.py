@@ -0,0 +1,90 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Taxi import live_location
+from Taxi.models import RideRequest
+from Taxi.routing import websocket_urlpatterns
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    LIVE_LOCATION_STREAM_INTERVAL_SECONDS=0.2,
+    REDIS_URL="redis://127.0.0.1:1/0",  # fan-out must not depend on the hot store
+)
+class RideLocationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        live_location._client = None
+        self.driver = make_user(is_driver=True, gender="female")
+        self.passenger = make_user(gender="male")
+        self.outsider = make_user(gender="male")
+        self.ride = make_ride(self.driver, -1.2921, 36.8219, timezone.now() + timedelta(minutes=5), status="in_progress")
+        ride_request = make_request(self.ride, self.passenger, -1.2900, 36.8200)
+        RideRequest.objects.filter(pk=ride_request.pk).update(status="accepted")
+
+    def tearDown(self):
+        live_location._client = None
+
+    def communicator(self, user):
+        return WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f"/ws/ride_location/ride_{self.ride.carpoolride_id}/?token={AccessToken.for_user(user)}",
+        )
+
+    async def test_driver_frames_are_throttled_and_coalesced(self):
+        driver, passenger = self.communicator(self.driver), self.communicator(self.passenger)
+        self.assertTrue((await driver.connect())[0])
+        self.assertTrue((await passenger.connect())[0])
+
+        for lat in (-1.30, -1.31, -1.32):
+            await driver.send_json_to({"latitude": lat, "longitude": 36.80})
+
+        first = await passenger.receive_json_from(timeout=1)
+        self.assertEqual((first["type"], first["latitude"]), ("driver_location", -1.30))
+        coalesced = await passenger.receive_json_from(timeout=1)
+        self.assertEqual(coalesced["latitude"], -1.32)
+        self.assertTrue(await passenger.receive_nothing(timeout=0.4))
+
+        await driver.disconnect()
+        await passenger.disconnect()
+
+    async def test_failed_coalesced_broadcast_is_logged(self):
+        driver = self.communicator(self.driver)
+        self.assertTrue((await driver.connect())[0])
+        await driver.send_json_to({"latitude": -1.30, "longitude": 36.80, "is_simulated": True})
+        await asyncio.sleep(0.05)
+
+        with mock.patch.object(InMemoryChannelLayer, "group_send", side_effect=RuntimeError("layer down")), \
+                self.assertLogs("Taxi.consumers", level="ERROR") as logs:
+            # inside the interval, so this frame is sent by the detached flush task
+            await driver.send_json_to({"latitude": -1.31, "longitude": 36.80, "is_simulated": True})
+            await asyncio.sleep(0.4)
+        self.assertIn("layer down", "\n".join(logs.output))
+
+        await driver.disconnect()
+
+    async def test_passenger_frames_are_ignored(self):
+        passenger = self.communicator(self.passenger)
+        self.assertTrue((await passenger.connect())[0])
+        await passenger.send_json_to({"latitude": -1.30, "longitude": 36.80})
+        self.assertTrue(await passenger.receive_nothing(timeout=0.3))
+        await passenger.disconnect()
+
+    async def test_outsider_is_rejected(self):
+        connected, code = await self.communicator(self.outsider).connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4003)
+
+    async def test_driver_of_ride_not_in_progress_is_rejected(self):
+        await database_sync_to_async(type(self.ride).objects.filter(pk=self.ride.pk).update)(status="pending")
+        connected, _ = await self.communicator(self.driver).connect()
+        self.assertFalse(connected)
@@ -0,0 +1,173 @@
+from datetime import timedelta
+from io import StringIO
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from Taxi.matching import (
+    build_shards, find_matches, load_index, load_requests, match_ride, match_ride_request,
+    merge_shard_results, open_rides, pending_requests, reconcile_matching, run_matching, score_shard,
+)
+from Taxi.models import CarpoolRide, RideMatch, RideRequest, UserPreferences
+from Taxi.scoring import MATCH_THRESHOLD, SCORE_TOLERANCE, calculate_match_score
+
+User = get_user_model()
+_phone = count(700000000)
+
+
+def make_user(**extra):
+    n = next(_phone)
+    return User.objects.create_user(
+        phone_number=f"0{n}", email=f"user{n}@example.com", password="Pass@1234", **extra
+    )
+
+
+def make_ride(driver, lat, lng, departure_time, **extra):
+    return CarpoolRide.objects.create(
+        driver=driver,
+        origin={"lat": lat, "lng": lng, "label": "Origin"},
+        destination={"lat": -1.2630, "lng": 36.7910, "label": "JKIA"},
+        departure_time=departure_time,
+        available_seats=3,
+        contribution_per_seat=200,
+        **extra
+    )
+
+
+def make_request(ride, passenger, lat, lng):
+    return RideRequest.objects.create(
+        ride=ride,
+        passenger=passenger,
+        pickup_location={"lat": lat, "lng": lng, "label": "Pickup"},
+    )
+
+
+class MatchingEngineTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.drivers = [make_user(is_driver=True, gender="female") for _ in range(4)]
+        self.near = make_ride(self.drivers[0], -1.2921, 36.8219, now + timedelta(minutes=20))
+        self.women_only = make_ride(self.drivers[1], -1.2950, 36.8250, now + timedelta(minutes=30), is_women_only=True)
+        self.far = make_ride(self.drivers[2], -0.0917, 34.7680, now + timedelta(minutes=20))  # Kisumu
+        self.late = make_ride(self.drivers[3], -1.2921, 36.8219, now + timedelta(hours=5))
+
+        self.passenger = make_user(gender="male")
+        self.female_passenger = make_user(gender="female")
+        self.picky_passenger = make_user(gender="female")
+        UserPreferences.objects.create(user=self.picky_passenger, prefers_women_only_rides=True)
+        make_request(self.late, self.passenger, -1.2900, 36.8200)
+        make_request(self.late, self.female_passenger, -1.2930, 36.8230)
+        make_request(self.late, self.picky_passenger, -1.2930, 36.8230)
+
+    def brute_force(self):
+        expected = {}
+        for ride in open_rides():
+            for ride_request in pending_requests():
+                score = calculate_match_score(ride_request, ride)
+                if score > MATCH_THRESHOLD:
+                    expected[(ride_request.passenger_id, ride.pk)] = score
+        return expected
+
+    def test_index_matches_exhaustive_scan(self):
+        expected = self.brute_force()
+        self.assertTrue(expected)
+
+        self.assertEqual(run_matching(), len(expected))
+        created = {
+            (m.passenger_id, m.ride_id): m.score for m in RideMatch.objects.all()
+        }
+        self.assertEqual(created.keys(), expected.keys())
+        for key, score in expected.items():
+            self.assertAlmostEqual(created[key], score, delta=SCORE_TOLERANCE)
+
+    def test_index_skips_far_and_late_rides(self):
+        index = load_index(open_rides())
+        candidates = set(index.candidates(-1.2900, 36.8200, timezone.now()))
+        self.assertIn(self.near.pk, candidates)
+        self.assertIn(self.women_only.pk, candidates)
+        self.assertNotIn(self.far.pk, candidates)
+        self.assertNotIn(self.late.pk, candidates)
+
+    def test_rerun_does_not_duplicate(self):
+        first = run_matching()
+        self.assertEqual(run_matching(), 0)
+        self.assertEqual(RideMatch.objects.count(), first)
+
+    def test_sharded_run_matches_single_run(self):
+        # a second city so the areas actually split across shards
+        mombasa = make_ride(make_user(is_driver=True), -4.0435, 39.6682, timezone.now() + timedelta(minutes=15))
+        make_request(mombasa, make_user(gender="male"), -4.0400, 39.6700)
+
+        index = load_index(open_rides())
+        requests = load_requests(pending_requests())
+        expected = {
+            (str(passenger_id), str(ride_id)): score
+            for (passenger_id, ride_id), score in find_matches(index, requests).items()
+        }
+        payloads = build_shards(index, requests, 3)
+        self.assertEqual(len(payloads), 2)
+
+        results = [score_shard(payload) for payload in payloads]
+        merged = {(passenger_id, ride_id): score for result in results for passenger_id, ride_id, score in result}
+        self.assertEqual(merged, expected)
+
+        self.assertEqual(merge_shard_results(results), len(expected))
+        self.assertEqual(merge_shard_results(results), 0)
+
+    def test_query_count_does_not_grow_with_pairs(self):
+        # ride rows, existing matches, request rows (+passenger/preferences join), bulk insert
+        with self.assertNumQueries(4):
+            run_matching()
+
+
+class IncrementalMatchingTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.driver = make_user(is_driver=True, gender="female")
+        self.other_driver = make_user(is_driver=True, gender="male")
+        self.ride = make_ride(self.driver, -1.2921, 36.8219, self.now + timedelta(minutes=20))
+        self.passenger = make_user(gender="male")
+
+    def test_new_request_is_matched_immediately(self):
+        ride_request = make_request(self.ride, self.passenger, -1.2900, 36.8200)
+        self.assertEqual(match_ride_request(ride_request.pk), 1)
+        self.assertTrue(RideMatch.objects.filter(passenger=self.passenger, ride=self.ride).exists())
+        self.assertEqual(match_ride_request(ride_request.pk), 0)
+
+    def test_new_ride_is_matched_against_waiting_requests(self):
+        make_request(self.ride, self.passenger, -1.2900, 36.8200)
+        new_ride = make_ride(self.other_driver, -1.2950, 36.8250, self.now + timedelta(minutes=10))
+        self.assertEqual(match_ride(new_ride.pk), 1)
+        self.assertEqual(
+            list(RideMatch.objects.filter(ride=new_ride).values_list("passenger_id", flat=True)),
+            [self.passenger.pk],
+        )
+
+    def test_new_ride_ignores_requests_outside_time_window(self):
+        make_request(self.ride, self.passenger, -1.2900, 36.8200)
+        late_ride = make_ride(self.other_driver, -1.2921, 36.8219, self.now + timedelta(hours=5))
+        self.assertEqual(match_ride(late_ride.pk), 0)
+
+    def test_reconcile_only_touches_recent_entities(self):
+        ride_request = make_request(self.ride, self.passenger, -1.2900, 36.8200)
+        RideRequest.objects.filter(pk=ride_request.pk).update(created_at=self.now - timedelta(minutes=30))
+        CarpoolRide.objects.filter(pk=self.ride.pk).update(last_updated=self.now - timedelta(minutes=30))
+        self.assertEqual(reconcile_matching(), 0)
+
+        make_request(self.ride, make_user(gender="female"), -1.2910, 36.8210)
+        self.assertEqual(reconcile_matching(), 1)
+
+
+class MatchingBenchmarkTests(TestCase):
+    def test_benchmark_reports_and_rolls_back(self):
+        out = StringIO()
+        call_command("benchmark_matching", scales=[40], stdout=out)
+        lines = out.getvalue().splitlines()
+        scale, rides, matches, wall, queries, peak = lines[1].split()
+        self.assertEqual((scale, rides), ("40", "40"))
+        self.assertGreater(int(queries), 0)
+        self.assertFalse(CarpoolRide.objects.exists())
+        self.assertFalse(User.objects.exists())
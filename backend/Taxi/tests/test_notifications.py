@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi import notifications, tasks
+from Taxi.models import NotificationDelivery, RideRequest
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+
+def fake_send_push_batch(pushes):
+    return [(None, "Unregistered") if token == "dead-token" else ("msg-1", None) for token, _, _ in pushes]
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        self.with_token = make_user(fcm_token="good-token")
+        self.dead_token = make_user(fcm_token="dead-token")
+        self.without_token = make_user()
+
+    def test_dispatch_sends_and_records_outcomes(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"user_{self.with_token.id}", channel)
+
+        users = (self.with_token, self.dead_token, self.without_token)
+        with mock.patch.object(notifications, "send_push_batch", side_effect=fake_send_push_batch) as send_push_batch:
+            notifications.dispatch([(str(user.id), "Ride started") for user in users])
+        send_push_batch.assert_called_once()
+        self.assertEqual(len(send_push_batch.call_args.args[0]), 2)
+
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual((event["type"], event["message"]), ("send_notification", "Ride started"))
+
+        outcomes = set(NotificationDelivery.objects.values_list("user_id", "channel", "status"))
+        self.assertEqual(outcomes, {
+            (self.with_token.id, "websocket", "sent"), (self.with_token.id, "push", "sent"),
+            (self.dead_token.id, "websocket", "sent"), (self.dead_token.id, "push", "failed"),
+            (self.without_token.id, "websocket", "sent"), (self.without_token.id, "push", "skipped"),
+        })
+
+    def test_start_ride_enqueues_one_job(self):
+        driver = make_user(is_driver=True, gender="female")
+        ride = make_ride(driver, -1.2921, 36.8219, timezone.now() + timedelta(minutes=10))
+        for _ in range(3):
+            ride_request = make_request(ride, make_user(), -1.29, 36.82)
+            RideRequest.objects.filter(pk=ride_request.pk).update(status="accepted")
+
+        client = APIClient()
+        client.force_authenticate(driver)
+        with mock.patch.object(tasks.dispatch_notifications, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(reverse("start-ride", args=[ride.carpoolride_id]))
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once()
+        payload, ride_id = delay.call_args.args
+        self.assertEqual(len(payload), 3)
+        self.assertEqual(ride_id, str(ride.carpoolride_id))
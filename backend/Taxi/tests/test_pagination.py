@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi.models import WalletTransaction
+from Taxi.tests.test_matching import make_user
+
+
+class WalletTransactionKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        other = make_user()
+        start = timezone.now() - timedelta(days=30)
+        for i in range(23):
+            sent = i % 2 == 0
+            WalletTransaction.objects.create(
+                user=cls.user if sent else other,
+                recipient=other if sent else cls.user,
+                amount=100 + i,
+                transaction_type="transfer",
+                status="completed",
+                reference=f"TRF-{i}",
+            )
+        WalletTransaction.objects.create(user=other, amount=5, transaction_type="deposit", reference="DEP-other")
+        # groups of three rows share a timestamp, so ties are broken by id
+        for i, row in enumerate(WalletTransaction.objects.exclude(reference="DEP-other").order_by("reference")):
+            WalletTransaction.objects.filter(pk=row.pk).update(created_at=start + timedelta(hours=i // 3))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_walks_every_row_once_in_order(self):
+        seen = []
+        url, params = "/wallet/transactions/", {"limit": 5}
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 5)
+            seen.extend(row["walletTransactionid"] for row in response.data["results"])
+            url, params = response.data["next"], None
+
+        expected = WalletTransaction.objects.exclude(reference="DEP-other").order_by(
+            "-created_at", "-walletTransactionid"
+        ).values_list("walletTransactionid", flat=True)
+        self.assertEqual(seen, [str(row_id) for row_id in expected])
+
+    def test_page_size_is_capped_and_bad_cursor_rejected(self):
+        response = self.client.get("/wallet/transactions/", {"limit": 500})
+        self.assertEqual(len(response.data["results"]), 23)
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(self.client.get("/wallet/transactions/", {"cursor": "not-a-cursor"}).status_code, 404)
+
+    def test_cursor_with_bad_key_is_rejected(self):
+        for key in (["2025-01-01T00:00:00+00:00", "not-a-uuid"], ["2025-01-01T00:00:00+00:00", 7], ["yesterday", None], 42):
+            cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+            self.assertEqual(self.client.get("/wallet/transactions/", {"cursor": cursor}).status_code, 404)
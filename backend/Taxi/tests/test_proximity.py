@@ -0,0 +1,65 @@
+from unittest import mock, skipUnless
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi import live_location, proximity
+from Taxi.models import RideRequest
+from Taxi.tests.test_live_location import redis_available
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+PICKUP = (-1.2900, 36.8200)
+# ~0.3km, ~0.65km and ~1.1km north of PICKUP
+NEAR = (-1.2873, 36.8200)
+BETWEEN = (-1.2842, 36.8200)
+FAR = (-1.2800, 36.8200)
+
+
+@skipUnless(redis_available(), "needs a Redis server at REDIS_URL")
+class ProximityTests(TestCase):
+    def setUp(self):
+        live_location._client = None
+        self.driver = make_user(is_driver=True, gender="female")
+        self.ride = make_ride(self.driver, -1.2921, 36.8219, timezone.now(), status="in_progress")
+        self.passenger = make_user(gender="male")
+        self.other = make_user(gender="male")
+        for passenger, pickup in ((self.passenger, PICKUP), (self.other, (-1.3500, 36.9000))):
+            ride_request = make_request(self.ride, passenger, *pickup)
+            RideRequest.objects.filter(pk=ride_request.pk).update(status="accepted")
+        proximity.cache_pickups(self.ride.carpoolride_id)
+
+    def tearDown(self):
+        live_location.get_client().delete(
+            proximity._pickups_key(self.ride.carpoolride_id), proximity._notified_key(self.ride.carpoolride_id)
+        )
+        live_location._client = None
+
+    def check(self, point):
+        return [passenger_id for passenger_id, _ in proximity.check_proximity(self.ride.carpoolride_id, *point)]
+
+    def test_notifies_once_per_approach(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.check(FAR), [])
+            self.assertEqual(self.check(NEAR), [str(self.passenger.id)])
+            self.assertEqual(self.check(NEAR), [])
+            # jitter just outside the entry radius does not re-arm
+            self.assertEqual(self.check(BETWEEN), [])
+            self.assertEqual(self.check(NEAR), [])
+            self.assertEqual(self.check(FAR), [])
+            self.assertEqual(self.check(NEAR), [str(self.passenger.id)])
+
+    def test_ping_queues_a_single_notification(self):
+        client = APIClient()
+        client.force_authenticate(self.driver)
+        with mock.patch.object(proximity.notify_pickup_approaching, "delay") as delay:
+            for point in (NEAR, NEAR, NEAR):
+                client.post(
+                    reverse("update-driver-location"),
+                    {"latitude": point[0], "longitude": point[1], "ride_id": str(self.ride.carpoolride_id)},
+                    format="json",
+                )
+        delay.assert_called_once()
+        ride_id, pickups = delay.call_args.args
+        self.assertEqual([passenger_id for passenger_id, _ in pickups], [str(self.passenger.id)])
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi import tasks
+from Taxi.models import Report, WalletTransaction
+from Taxi.reports import artifact_name, is_closed_period
+from Taxi.tests.test_matching import make_user
+
+
+class ClosedPeriodReportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.jobs = 0
+        self.passenger = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.passenger)
+        last_month = timezone.localtime(timezone.now()).replace(day=1) - timedelta(days=1)
+        self.period = {"year": last_month.year, "month": last_month.month}
+        spent = WalletTransaction.objects.create(
+            user=self.passenger, amount="345.00", transaction_type="ride_payment", status="completed", reference="TX-1",
+        )
+        WalletTransaction.objects.filter(pk=spent.pk).update(created_at=last_month)
+
+    def get(self, **headers):
+        # run the job inline where a worker would pick it up
+        with mock.patch.object(tasks.generate_report_artifact, "delay", side_effect=tasks.generate_report_artifact) as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get("/reports/passenger-spending/", self.period, **headers)
+        self.jobs += delay.call_count
+        return response
+
+    def test_closed_month_is_built_once_and_served_from_file(self):
+        self.assertTrue(is_closed_period(**self.period))
+        response = self.get()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Retry-After"], "2")
+        report = Report.objects.get(user=self.passenger, report_type="passenger_spending", period__isnull=False)
+        self.assertEqual(report.status, "ready")
+        self.assertTrue(default_storage.exists(artifact_name(report)))
+        self.assertTrue(report.file_url.endswith(f"{report.report_id}.html"))
+
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"345", b"".join(response.streaming_content))
+        self.assertEqual(response["ETag"], f'"{report.etag}"')
+        self.assertIn("Last-Modified", response)
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+
+        # closed months are never rebuilt, and every request reuses the same job row
+        self.assertEqual(Report.objects.get(pk=report.pk).generated_at, report.generated_at)
+        self.assertEqual(Report.objects.filter(user=self.passenger, period__isnull=False).count(), 1)
+        self.assertEqual(Report.objects.filter(user=self.passenger, period__isnull=True).count(), 4)
+        self.assertEqual(self.jobs, 1)
+
+    def test_failed_or_missing_artifact_is_rebuilt(self):
+        self.get()
+        report = Report.objects.get(user=self.passenger, report_type="passenger_spending", period__isnull=False)
+        default_storage.delete(artifact_name(report))
+        self.assertEqual(self.get().status_code, 202)
+        self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.jobs, 2)
+
+    def test_current_month_is_rendered_synchronously(self):
+        now = timezone.localtime(timezone.now())
+        response = self.client.get("/reports/passenger-spending/", {"year": now.year, "month": now.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertIsNone(Report.objects.get(user=self.passenger).period)
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi.models import Report, WalletTransaction
+from Taxi.reports import ReportContext, build_reports
+from Taxi.tests.test_matching import make_ride, make_user
+
+
+class ReportRegistryTests(TestCase):
+    def setUp(self):
+        self.driver = make_user(is_driver=True, gender="female")
+        self.passenger = make_user()
+        for reference, user, recipient in (("TX-1", self.passenger, None), ("TX-2", self.driver, self.passenger)):
+            WalletTransaction.objects.create(
+                user=user, recipient=recipient, amount="120.00", transaction_type="transfer",
+                status="completed", reference=reference,
+            )
+        make_ride(self.driver, -1.29, 36.82, timezone.now() - timedelta(hours=2), status="completed")
+        self.client = APIClient()
+
+    def get(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get("/reports/", params)
+
+    def test_single_report_writes_one_audit_row(self):
+        response = self.get(self.passenger, report_type="payment_receipt")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "TX-2")
+        [audit] = Report.objects.filter(user=self.passenger)
+        self.assertEqual((audit.report_type, audit.report_data["row_count"]), ("payment_receipt", 2))
+
+    def test_ride_history_and_driver_only_reports(self):
+        self.assertContains(self.get(self.driver, report_type="ride_history"), "Total Rides: 1")
+        self.assertEqual(self.get(self.passenger, report_type="driver_earnings").status_code, 403)
+        self.assertEqual(self.get(self.passenger, report_type="bogus").status_code, 400)
+        self.assertEqual(self.get(self.passenger).status_code, 400)
+
+    def test_batch_shares_querysets_and_audits_once(self):
+        ctx = ReportContext(self.passenger)
+        # one wallet transaction query and one rollup query serve both report types
+        with self.assertNumQueries(2):
+            contexts = build_reports(ctx, ["payment_receipt", "passenger_spending"])
+        self.assertEqual(len(contexts["payment_receipt"]["transactions"]), 2)
+        self.assertEqual([row["reference"] for row in contexts["passenger_spending"]["spending"]], ["TX-1"])
+
+        response = self.get(self.passenger, report_type="payment_receipt,passenger_spending")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["reports"]), {"payment_receipt", "passenger_spending"})
+        self.assertIn("TX-1", response.data["reports"]["passenger_spending"])
+        [audit] = Report.objects.filter(user=self.passenger)
+        self.assertEqual(audit.report_data["report_types"], ["payment_receipt", "passenger_spending"])
+        self.assertEqual(self.get(self.passenger, report_type="payment_receipt,passenger_spending", year="x").status_code, 400)
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from unittest import mock
+
+import redis
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi import cache, ride_cache
+from Taxi.models import RideRequest
+from Taxi.tests.test_cache import LOCMEM
+from Taxi.tests.test_matching import make_ride, make_user
+
+
+def clear_open_rides_cache():
+    caches["default"].clear()
+
+
+@override_settings(CACHES=LOCMEM)
+class OpenRidesCacheTests(TestCase):
+    def setUp(self):
+        clear_open_rides_cache()
+        self.addCleanup(clear_open_rides_cache)
+        self.driver = make_user(is_driver=True, gender="female")
+        self.passenger = make_user()
+        self.tomorrow = timezone.localtime(timezone.now() + timedelta(days=1)).replace(hour=9, minute=0)
+        self.ride = make_ride(self.driver, -1.29, 36.82, self.tomorrow)
+        self.client = APIClient()
+
+    def listing(self, user=None, **params):
+        self.client.force_authenticate(user or self.passenger)
+        response = self.client.get("/passenger/available-rides/", params)
+        self.assertEqual(response.status_code, 200)
+        return {ride["carpoolride_id"] for ride in response.data}
+
+    def test_buckets_are_cached_until_invalidated(self):
+        params = {"pickup_date": self.tomorrow.date().isoformat(), "time_slot": "06_12"}
+        self.assertEqual(self.listing(**params), {str(self.ride.pk)})
+        self.assertEqual(self.listing(self.driver, **params), set())  # own ride
+
+        other = make_ride(make_user(is_driver=True), -1.29, 36.82, self.tomorrow + timedelta(minutes=30))
+        # no invalidation yet: the cached bucket still answers
+        self.assertEqual(self.listing(**params), {str(self.ride.pk)})
+        with self.captureOnCommitCallbacks(execute=True):
+            ride_cache.invalidate_rides(other.departure_time)
+        self.assertEqual(self.listing(**params), {str(self.ride.pk), str(other.pk)})
+        self.assertEqual(self.listing(**{**params, "time_slot": "after_18"}), set())
+
+    def test_user_exclusions_and_stale_rows(self):
+        self.assertEqual(self.listing(), {str(self.ride.pk)})
+        RideRequest.objects.create(
+            ride=self.ride, passenger=self.passenger, pickup_location={"lat": -1.29, "lng": 36.82}, status="pending",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ride_cache.invalidate_user(self.passenger.pk)
+        self.assertEqual(self.listing(), set())
+
+        # a ride that filled up is dropped even before its bucket is invalidated
+        full = make_ride(self.driver, -1.29, 36.82, self.tomorrow)
+        with self.captureOnCommitCallbacks(execute=True):
+            ride_cache.invalidate_rides(full.departure_time)
+        other_passenger = make_user()
+        self.assertEqual(self.listing(other_passenger), {str(self.ride.pk), str(full.pk)})
+        full.available_seats = 0
+        full.save()
+        self.assertEqual(self.listing(other_passenger), {str(self.ride.pk)})
+
+    def test_declined_request_shows_the_ride_again(self):
+        ride_request = RideRequest.objects.create(
+            ride=self.ride, passenger=self.passenger, pickup_location={"lat": -1.29, "lng": 36.82}, status="pending",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ride_cache.invalidate_user(self.passenger.pk)
+        self.assertEqual(self.listing(), set())
+
+        self.client.force_authenticate(self.driver)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/driver/ride-request/decline/{ride_request.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.listing(), {str(self.ride.pk)})
+
+    def test_listing_falls_back_to_the_database_without_redis(self):
+        with mock.patch.object(cache, "get_or_set", side_effect=redis.ConnectionError("down")):
+            self.assertEqual(self.listing(), {str(self.ride.pk)})
+        with mock.patch.object(cache, "invalidate", side_effect=redis.ConnectionError("down")), \
+                self.assertLogs("Taxi.ride_cache", level="ERROR"), self.captureOnCommitCallbacks(execute=True):
+            ride_cache.invalidate_rides(self.ride.departure_time)
+
+    def test_updating_departure_moves_ride_between_date_buckets(self):
+        today, tomorrow = (self.tomorrow - timedelta(days=1)).date(), self.tomorrow.date()
+        self.assertEqual(self.listing(pickup_date=tomorrow.isoformat()), {str(self.ride.pk)})
+        later = self.tomorrow + timedelta(days=1)
+        self.client.force_authenticate(self.driver)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/driver/update-ride/{self.ride.pk}/", {"departure_time": later.strftime("%Y-%m-%dT%H:%M")}, format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.listing(pickup_date=tomorrow.isoformat()), set())
+        self.assertEqual(self.listing(pickup_date=later.date().isoformat()), {str(self.ride.pk)})
+        self.assertEqual(self.listing(pickup_date=today.isoformat()), set())
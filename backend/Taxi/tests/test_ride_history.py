@@ -0,0 +1,61 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi.models import CarpoolRide, RideRequest
+from Taxi.serializers import RideHistorySerializer
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+RIDES = 50
+PASSENGERS_PER_RIDE = 4
+
+
+class RideHistoryQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = make_user(is_driver=True, gender="female")
+        cls.passenger = make_user()
+        others = [make_user() for _ in range(PASSENGERS_PER_RIDE - 1)]
+        start = timezone.now() - timedelta(days=RIDES)
+        for day in range(RIDES):
+            ride = make_ride(cls.driver, -1.2921, 36.8219, start + timedelta(days=day), status="completed")
+            for passenger in [cls.passenger, *others]:
+                make_request(ride, passenger, -1.29, 36.82)
+            make_request(ride, make_user(), -1.29, 36.82)  # still pending, left out of passengers_info
+        RideRequest.objects.filter(passenger__in=[cls.passenger, *others]).update(status="accepted")
+
+    def serialize(self, user):
+        rides = RideHistorySerializer.setup_eager_loading(CarpoolRide.objects.order_by("departure_time"))
+        return RideHistorySerializer(rides, many=True, context={"request": SimpleNamespace(user=user)}).data
+
+    def test_serializer_queries_do_not_grow_with_rides_or_passengers(self):
+        with self.assertNumQueries(2):
+            data = self.serialize(self.driver)
+        self.assertEqual(len(data), RIDES)
+        self.assertEqual({len(ride["passengers_info"]) for ride in data}, {PASSENGERS_PER_RIDE})
+        self.assertEqual({len(ride["requests"]) for ride in data}, {PASSENGERS_PER_RIDE + 1})
+        self.assertEqual(data[0]["passengers_info"][0]["amount_paid"], 200.0)
+
+    def test_passenger_sees_driver_contact(self):
+        with self.assertNumQueries(2):
+            data = self.serialize(self.passenger)
+        self.assertEqual(data[0]["driver_contact"]["id"], str(self.driver.id))
+        self.assertNotIn("email", data[0]["passengers_info"][0])
+
+    def test_history_view_pages_by_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.passenger)
+        seen = []
+        url, params = "/rides/history/", {"limit": 10}
+        while url:
+            # rides page, prefetched requests; no COUNT(*)
+            with self.assertNumQueries(2):
+                response = client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(ride["carpoolride_id"] for ride in response.data["results"])
+            url, params = response.data["next"], None
+        expected = CarpoolRide.objects.order_by("-last_updated", "-carpoolride_id").values_list("carpoolride_id", flat=True)
+        self.assertEqual(seen, [str(ride_id) for ride_id in expected])
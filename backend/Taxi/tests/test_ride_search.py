@@ -0,0 +1,122 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi.geohash import covering
+from Taxi.models import CarpoolRide, Vehicle, VehicleMake, VehicleModel, location_columns, location_geohash
+from Taxi.tests.test_matching import make_ride, make_user
+from Taxi.tests.test_cache import LOCMEM
+from Taxi.tests.test_ride_cache import clear_open_rides_cache
+
+backfill = import_module("Taxi.migrations.0044_backfill_carpoolride_location_columns")
+
+
+class RideLocationColumnTests(TestCase):
+    def setUp(self):
+        self.driver = make_user(is_driver=True, gender="female")
+        self.ride = make_ride(self.driver, -1.2921, 36.8219, timezone.now() + timedelta(hours=3))
+
+    def test_save_syncs_columns(self):
+        ride = CarpoolRide.objects.get(pk=self.ride.pk)
+        self.assertEqual((ride.origin_label, ride.origin_lat, ride.origin_lng), ("Origin", -1.2921, 36.8219))
+        self.assertEqual(ride.destination_label, "JKIA")
+
+        ride.origin = {"lat": "-1.2833", "lng": "36.8172", "label": "Westlands"}
+        ride.save(update_fields=["origin"])
+        ride.refresh_from_db()
+        self.assertEqual((ride.origin_label, ride.origin_lat, ride.origin_lng), ("Westlands", -1.2833, 36.8172))
+        self.assertEqual(location_columns({"label": None, "lat": "x"}), ("", None, None))
+
+    def test_backfill_fills_existing_rows(self):
+        CarpoolRide.objects.filter(pk=self.ride.pk).update(origin_label="", origin_lat=None, destination_label="")
+        backfill.backfill_location_columns(apps, None)
+        ride = CarpoolRide.objects.get(pk=self.ride.pk)
+        self.assertEqual((ride.origin_label, ride.origin_lat, ride.destination_label), ("Origin", -1.2921, "JKIA"))
+
+    @override_settings(CACHES=LOCMEM)
+    def test_search_filters_on_label_columns(self):
+        clear_open_rides_cache()
+        other = make_ride(self.driver, -1.30, 36.80, timezone.now() + timedelta(hours=4))
+        other.origin = {"lat": -1.30, "lng": 36.80, "label": "Karen"}
+        other.save()
+        client = APIClient()
+        client.force_authenticate(make_user())
+        response = client.get("/passenger/available-rides/", {"origin": "orig", "destination": "jki"})
+        self.assertEqual(response.status_code, 200)
+        rides = response.data["results"] if isinstance(response.data, dict) else response.data
+        self.assertEqual([ride["carpoolride_id"] for ride in rides], [str(self.ride.pk)])
+        self.assertNotIn("origin_label", rides[0])
+
+
+class NearbyRideSearchTests(TestCase):
+    def setUp(self):
+        self.passenger = make_user(gender="female")
+        self.client = APIClient()
+        self.client.force_authenticate(self.passenger)
+        soon = timezone.now() + timedelta(minutes=30)
+        self.driver = make_user(is_driver=True, gender="female")
+        # pickup at Nairobi CBD; rides leaving ~0.5km, ~1.5km and ~10km away, all to JKIA
+        self.close = make_ride(self.driver, -1.2965, 36.8219, soon)
+        self.women_only = make_ride(self.driver, -1.3056, 36.8219, soon, is_women_only=True)
+        self.far = make_ride(self.driver, -1.3820, 36.8219, soon)
+        self.later = make_ride(self.driver, -1.2921, 36.8219, soon + timedelta(hours=6))
+        self.elsewhere = make_ride(self.driver, -1.2930, 36.8219, soon)
+        self.elsewhere.destination = {"lat": -1.1000, "lng": 37.0100, "label": "Thika"}
+        self.elsewhere.save()
+
+    def search(self, **params):
+        return self.client.get("/passenger/rides/nearby/", {"pickup_lat": -1.2921, "pickup_lng": 36.8219, **params})
+
+    def test_covering_cells_contain_every_point_in_radius(self):
+        cells = covering(-1.2921, 36.8219, 2)
+        for bearing_lat, bearing_lng in ((0.0179, 0), (-0.0179, 0), (0, 0.0179), (0, -0.0179), (0.0127, 0.0127)):
+            point = location_geohash(-1.2921 + bearing_lat, 36.8219 + bearing_lng)
+            self.assertTrue(any(point.startswith(cell) for cell in cells))
+        self.assertLessEqual(len(cells), 9)
+
+    def test_rides_within_both_radii_ranked_by_score(self):
+        response = self.search(dropoff_lat=-1.2630, dropoff_lng=36.7910)
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        # the women-only ride outranks the closer one for a female passenger, as in calculate_match_score
+        self.assertEqual(
+            [ride["carpoolride_id"] for ride in results], [str(self.women_only.pk), str(self.close.pk)]
+        )
+        self.assertGreater(results[0]["score"], results[1]["score"])
+        self.assertAlmostEqual(results[1]["pickup_distance_km"], 0.49, places=1)
+        self.assertEqual(results[1]["dropoff_distance_km"], 0.0)
+
+    def test_query_count_does_not_grow_with_results(self):
+        def search_with_vehicles(count):
+            make = VehicleMake.objects.create(name=f"Make {count}")
+            model = VehicleModel.objects.create(make=make, name="Model")
+            for i in range(count):
+                driver = make_user(is_driver=True)
+                vehicle = Vehicle.objects.create(
+                    driver=driver, make=make, model=model, plate_number=f"K{count}{i}", year=2020
+                )
+                make_ride(driver, -1.2930, 36.8219, timezone.now() + timedelta(minutes=30), vehicle=vehicle)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.search(pickup_radius_km=1, limit=50)
+            names = {ride["vehicle"]["make_name"] for ride in response.data["results"] if ride["vehicle"]}
+            self.assertIn(f"Make {count}", names)
+            return len(queries)
+
+        self.search()  # the passenger's preferences are then cached on the user
+        self.assertEqual(search_with_vehicles(1), search_with_vehicles(5))
+
+    def test_radius_window_and_validation(self):
+        ids = {ride["carpoolride_id"] for ride in self.search(pickup_radius_km=15).data["results"]}
+        self.assertIn(str(self.far.pk), ids)
+        self.assertIn(str(self.elsewhere.pk), ids)
+        self.assertNotIn(str(self.later.pk), ids)
+        later = self.search(departure_time=(timezone.now() + timedelta(hours=6)).isoformat())
+        self.assertEqual([ride["carpoolride_id"] for ride in later.data["results"]], [str(self.later.pk)])
+        self.assertEqual(self.search(pickup_radius_km=500).status_code, 400)
+        self.assertEqual(self.search(dropoff_lat=-1.26).status_code, 400)
@@ -0,0 +1,145 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Taxi.models import MonthlyUserRollup, RideRequest, WalletTransaction
+from Taxi.rollups import month_start
+from Taxi.serializers import UserProfileSerializer
+from Taxi.tests.test_matching import make_request, make_ride, make_user
+
+
+def make_transaction(user, amount, transaction_type, status="completed", recipient=None):
+    return WalletTransaction.objects.create(
+        user=user, recipient=recipient, amount=amount, transaction_type=transaction_type, status=status,
+        reference=f"TX-{WalletTransaction.objects.count()}-{transaction_type}",
+    )
+
+
+def snapshot():
+    return sorted(MonthlyUserRollup.objects.values_list(
+        "user_id", "month", "earnings", "spending", "refunds", "deposits", "withdrawals",
+        "transfers_sent", "transfers_received", "transaction_count",
+    ))
+
+
+class MonthlyRollupTests(TestCase):
+    def setUp(self):
+        self.driver = make_user(is_driver=True, gender="female")
+        self.passenger = make_user()
+        self.this_month = month_start(timezone.now())
+
+    def rollup(self, user):
+        return MonthlyUserRollup.objects.get(user=user, month=self.this_month)
+
+    def test_completed_transactions_roll_up_once(self):
+        make_transaction(self.passenger, "500.00", "deposit")
+        make_transaction(self.passenger, "200.00", "escrow_hold", recipient=self.driver)
+        make_transaction(self.driver, "200.00", "escrow_release", recipient=self.passenger)
+        make_transaction(self.passenger, "50.00", "transfer", recipient=self.driver)
+        withdrawal = make_transaction(self.driver, "100.00", "withdrawal", status="pending")
+
+        self.assertEqual(self.rollup(self.driver).withdrawals, 0)
+        withdrawal.status = "completed"
+        withdrawal.save()
+        withdrawal.save()  # saving again must not count it twice
+
+        passenger, driver = self.rollup(self.passenger), self.rollup(self.driver)
+        self.assertEqual((passenger.deposits, passenger.spending, passenger.transfers_sent), (500, 200, 50))
+        self.assertEqual((driver.earnings, driver.withdrawals, driver.transfers_received), (200, 100, 50))
+        self.assertEqual((passenger.transaction_count, driver.transaction_count), (3, 3))
+
+    def test_deleted_and_changed_transactions_are_taken_back_out(self):
+        deposit = make_transaction(self.passenger, "500.00", "deposit")
+        make_transaction(self.passenger, "40.00", "deposit")
+        withdrawal = make_transaction(self.driver, "100.00", "withdrawal")
+        transfer = make_transaction(self.passenger, "50.00", "transfer", recipient=self.driver)
+
+        deposit.delete()
+        withdrawal.status = "failed"
+        withdrawal.save()
+        transfer.amount = Decimal("70.00")
+        transfer.save()
+
+        passenger, driver = self.rollup(self.passenger), self.rollup(self.driver)
+        self.assertEqual((passenger.deposits, passenger.transfers_sent, passenger.transaction_count), (40, 70, 2))
+        self.assertEqual((driver.withdrawals, driver.transfers_received, driver.transaction_count), (0, 70, 1))
+
+        incremental = snapshot()
+        call_command("rebuild_monthly_rollups", stdout=StringIO())
+        self.assertEqual(
+            [row for row in incremental if row[-1]],
+            [row for row in snapshot() if row[-1]],
+        )
+
+    def test_deleting_a_user_with_completed_transactions(self):
+        make_transaction(self.passenger, "50.00", "transfer", recipient=self.driver)
+
+        passenger_id = self.passenger.pk
+        self.passenger.delete()
+
+        self.assertFalse(MonthlyUserRollup.objects.filter(user_id=passenger_id).exists())
+        # the transfer went with its sender, so the recipient's side is taken back too
+        driver = self.rollup(self.driver)
+        self.assertEqual((driver.transfers_received, driver.transaction_count), (0, 0))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for amount in ("120.00", "80.50"):
+            make_transaction(self.passenger, amount, "ride_payment")
+            make_transaction(self.driver, amount, "ride_earnings")
+        old = make_transaction(self.passenger, "30.00", "transfer", recipient=self.driver)
+        # an older transaction, rolled up by the rebuild into its own month
+        WalletTransaction.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=70))
+        MonthlyUserRollup.objects.filter(transfers_sent__gt=0).update(transfers_sent=0, transaction_count=2)
+        MonthlyUserRollup.objects.filter(transfers_received__gt=0).update(transfers_received=0, transaction_count=2)
+        expected = snapshot()
+
+        out = StringIO()
+        call_command("rebuild_monthly_rollups", stdout=out)
+        self.assertIn("Rebuilt 4 monthly rollup(s)", out.getvalue())
+        rebuilt = snapshot()
+        self.assertEqual([row for row in rebuilt if row[1] == self.this_month], expected)
+        older = month_start(timezone.now() - timedelta(days=70))
+        self.assertEqual(
+            MonthlyUserRollup.objects.get(user=self.driver, month=older).transfers_received, Decimal("30.00")
+        )
+
+    def test_summary_endpoint_and_profile_read_rollups(self):
+        make_transaction(self.driver, "300.00", "escrow_release", recipient=self.passenger)
+        MonthlyUserRollup.objects.create(user=self.driver, month=date(2020, 1, 1), earnings=75, transaction_count=1)
+
+        client = APIClient()
+        client.force_authenticate(self.driver)
+        response = client.get("/reports/monthly-summary/", {"from": "2019-06", "to": "2020-12"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["month"] for row in response.data["months"]], ["2020-01"])
+        self.assertEqual(response.data["totals"]["earnings"], 75)
+        self.assertEqual(len(client.get("/reports/monthly-summary/").data["months"]), 2)
+        self.assertEqual(client.get("/reports/monthly-summary/", {"from": "June"}).status_code, 400)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(UserProfileSerializer().get_monthly_earnings(self.driver), 300.0)
+
+    def test_driver_earnings_queries_do_not_grow_with_rides(self):
+        client = APIClient()
+        client.force_authenticate(self.driver)
+
+        def add_ride():
+            ride = make_ride(self.driver, -1.29, 36.82, timezone.now() - timedelta(days=1), status="completed")
+            for _ in range(3):
+                ride_request = make_request(ride, make_user(), -1.29, 36.82)
+                RideRequest.objects.filter(pk=ride_request.pk).update(status="accepted", payment_status="paid")
+
+        add_ride()
+        with self.assertNumQueries(4) as first:
+            response = client.get("/reports/driver-earnings/")
+        self.assertEqual(response.status_code, 200)
+        for _ in range(4):
+            add_ride()
+        with self.assertNumQueries(len(first.captured_queries)):
+            response = client.get("/reports/driver-earnings/")
+        self.assertContains(response, "Total Rides: 5")
@@ -0,0 +1,72 @@
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from Taxi.scoring import SCORE_TOLERANCE, calculate_match_score, score_matrix
+
+
+def fake_request(lat, lng, created_at, gender, prefers_women_only):
+    preferences = SimpleNamespace(prefers_women_only_rides=prefers_women_only)
+    passenger = SimpleNamespace(gender=gender, preferences=preferences, fullname="Test Passenger")
+    pickup = {"lat": lat, "lng": lng} if lat is not None else None
+    return SimpleNamespace(pickup_location=pickup, created_at=created_at, passenger=passenger)
+
+
+def fake_ride(lat, lng, departure_time, is_women_only):
+    origin = {"lat": lat, "lng": lng} if lat is not None else {}
+    return SimpleNamespace(origin=origin, departure_time=departure_time, is_women_only=is_women_only)
+
+
+def nan_if_none(value):
+    return float("nan") if value is None else value
+
+
+class ScoreMatrixParityTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        now = timezone.now()
+        # around Nairobi, spread wide enough to cover the whole 0-50km range
+        self.requests = [
+            fake_request(
+                None if i % 17 == 0 else -1.29 + rng.uniform(-0.4, 0.4),
+                36.82 + rng.uniform(-0.4, 0.4),
+                now + timedelta(minutes=rng.uniform(-180, 180)),
+                rng.choice(["male", "female", "other"]),
+                rng.random() < 0.3,
+            )
+            for i in range(60)
+        ]
+        self.rides = [
+            fake_ride(
+                None if i % 23 == 0 else -1.29 + rng.uniform(-0.4, 0.4),
+                36.82 + rng.uniform(-0.4, 0.4),
+                now + timedelta(minutes=rng.uniform(-180, 180)),
+                rng.random() < 0.3,
+            )
+            for i in range(50)
+        ]
+
+    def test_matches_calculate_match_score(self):
+        scores = score_matrix(
+            [nan_if_none(r.pickup_location and r.pickup_location["lat"]) for r in self.requests],
+            [nan_if_none(r.pickup_location and r.pickup_location["lng"]) for r in self.requests],
+            [r.created_at.timestamp() for r in self.requests],
+            [r.passenger.gender == "female" for r in self.requests],
+            [r.passenger.preferences.prefers_women_only_rides for r in self.requests],
+            [nan_if_none(ride.origin.get("lat")) for ride in self.rides],
+            [nan_if_none(ride.origin.get("lng")) for ride in self.rides],
+            [ride.departure_time.timestamp() for ride in self.rides],
+            [ride.is_women_only for ride in self.rides],
+        )
+        self.assertEqual(scores.shape, (len(self.requests), len(self.rides)))
+        for i, ride_request in enumerate(self.requests):
+            for j, ride in enumerate(self.rides):
+                expected = calculate_match_score(ride_request, ride)
+                self.assertAlmostEqual(scores[i, j], expected, delta=SCORE_TOLERANCE, msg=(i, j))
+
+    def test_empty_batches(self):
+        self.assertEqual(score_matrix([], [], [], [], [], [1.0], [1.0], [0.0], [False]).shape, (0, 1))
+        self.assertEqual(score_matrix([1.0], [1.0], [0.0], [False], [False], [], [], [], []).shape, (1, 0))
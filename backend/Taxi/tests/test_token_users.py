@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from Taxi import token_users
+from Taxi.consumers import get_user_from_token
+from Taxi.tests.test_cache import LOCMEM
+from Taxi.tests.test_matching import make_user
+
+
+@override_settings(CACHES=LOCMEM)
+class TokenUserCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = make_user()
+
+    def test_reconnects_with_the_same_token_skip_the_query(self):
+        token = AccessToken.for_user(self.user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(token_users.get_user(token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(token_users.get_user(AccessToken(str(token))), self.user)
+
+        # another token of the same user is a separate entry
+        with self.assertNumQueries(1):
+            token_users.get_user(AccessToken.for_user(self.user))
+
+    def test_cache_entry_expires_with_the_token(self):
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=timedelta(seconds=30))
+
+        with mock.patch.object(token_users.cache, "get_or_set", wraps=token_users.cache.get_or_set) as get_or_set:
+            token_users.get_user(token)
+
+        self.assertLessEqual(get_or_set.call_args.kwargs["timeout"], 30)
+
+    def test_blacklisting_a_refresh_token_drops_the_users_entries(self):
+        token = AccessToken.for_user(self.user)
+        token_users.get_user(token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RefreshToken.for_user(self.user).blacklist()
+
+        with self.assertNumQueries(1):
+            token_users.get_user(token)
+
+    def test_user_changes_drop_the_users_entries(self):
+        token = AccessToken.for_user(self.user)
+        token_users.get_user(token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertNumQueries(1):
+            self.assertFalse(token_users.get_user(token).is_active)
+
+    def test_consumers_reject_invalid_tokens(self):
+        self.assertIsNone(async_to_sync(get_user_from_token)("not-a-token"))
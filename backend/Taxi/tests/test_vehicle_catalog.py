@@ -0,0 +1,89 @@
+import uuid
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from Taxi import vehicle_catalog
+from Taxi.models import VehicleMake, VehicleModel
+from Taxi.tests.test_cache import LOCMEM
+
+
+@override_settings(CACHES=LOCMEM)
+class VehicleCatalogTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        # start from a known catalog rather than the one seeded by migration 0017
+        VehicleMake.objects.all().delete()
+        self.toyota = VehicleMake.objects.create(name="Toyota")
+        self.mazda = VehicleMake.objects.create(name="Mazda")
+        VehicleModel.objects.create(make=self.toyota, name="Vitz")
+        VehicleModel.objects.create(make=self.toyota, name="Axio")
+
+    def test_makes_are_served_from_cache_with_etag(self):
+        response = self.client.get("/vehicle-makes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([make["name"] for make in response.json()], ["Mazda", "Toyota"])
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/vehicle-makes/")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], etag)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get("/vehicle-makes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+
+    def test_models_of_a_make(self):
+        response = self.client.get("/vehicle-models/", {"make_id": str(self.toyota.make_id)})
+        self.assertEqual([model["name"] for model in response.json()], ["Axio", "Vitz"])
+        self.assertEqual(response.json()[0]["make_id"], str(self.toyota.make_id))
+
+        # an upper-case id is the same make and the same cache entry
+        with self.assertNumQueries(0):
+            same = self.client.get("/vehicle-models/", {"make_id": str(self.toyota.make_id).upper()})
+        self.assertEqual(same.content, response.content)
+
+        self.assertEqual(self.client.get("/vehicle-models/", {"make_id": "not-a-uuid"}).json(), [])
+        self.assertEqual(self.client.get("/vehicle-models/").json(), [])
+
+    def test_unknown_makes_share_the_empty_entry(self):
+        vehicle_catalog.warm()
+        entries = len(caches["default"]._cache)
+
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                response = self.client.get("/vehicle-models/", {"make_id": str(uuid.uuid4())})
+                self.assertEqual(response.json(), [])
+
+        # only the hit/miss counters may be new, not one entry per random id
+        self.assertLessEqual(len(caches["default"]._cache) - entries, 2)
+
+    def test_changes_invalidate_and_rebuild_the_catalog(self):
+        etag = self.client.get("/vehicle-makes/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VehicleMake.objects.create(name="Nissan")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/vehicle-makes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Nissan", [make["name"] for make in response.json()])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VehicleModel.objects.filter(name="Vitz").delete()
+        models = self.client.get("/vehicle-models/", {"make_id": str(self.toyota.make_id)}).json()
+        self.assertEqual([model["name"] for model in models], ["Axio"])
+
+    def test_warm_precomputes_every_list(self):
+        with self.assertNumQueries(2):
+            vehicle_catalog.warm()
+
+        with self.assertNumQueries(0):
+            self.client.get("/vehicle-makes/")
+            self.client.get("/vehicle-models/", {"make_id": str(self.mazda.make_id)})
+            self.client.get("/vehicle-models/")
@@ -0,0 +1,57 @@
+"""Users of JWT-authenticated WebSocket connects (consumers.get_user_from_token).
+
+Mobile clients reconnect their chat, notification and ride-request sockets
+all the time, each connect presenting the same access token. The token is
+still verified on every connect; only the user lookup is cached, keyed by
+the token's jti inside a per-user namespace, for at most USER_CACHE_TTL and
+never beyond the token's exp.
+
+The user's namespace is invalidated when one of their refresh tokens is
+blacklisted (logout, rotation) and when the user row changes, see signals.py.
+"""
+import logging
+import time
+
+import redis
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "ws_user"
+USER_CACHE_TTL = 300
+
+User = get_user_model()
+
+
+def get_user(access_token):
+    """The user an already verified AccessToken belongs to; raises User.DoesNotExist."""
+    user_id = access_token['id']
+    jti = access_token.get('jti')
+    ttl = min(USER_CACHE_TTL, int(access_token['exp'] - time.time()))
+    if not jti or ttl <= 0:
+        return User.objects.get(id=user_id)
+
+    try:
+        return cache.get_or_set(
+            cache.user_namespace(NAMESPACE, user_id), jti,
+            compute=lambda: User.objects.get(id=user_id),
+            timeout=ttl,
+        )
+    except redis.RedisError as e:
+        logger.error(f"WebSocket user cache unavailable, querying the database: {str(e)}")
+        return User.objects.get(id=user_id)
+
+
+def _forget(user_id):
+    try:
+        cache.invalidate(cache.user_namespace(NAMESPACE, user_id))
+    except redis.RedisError as e:
+        logger.error(f"Could not invalidate the WebSocket user cache of user {user_id}: {str(e)}")
+
+
+def invalidate_user(user_id):
+    """After commit, drop every cached token lookup of a user."""
+    transaction.on_commit(lambda: _forget(user_id))
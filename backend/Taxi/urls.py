@@ -13,6 +13,7 @@ from .views import(
     # UploadSmartDLView,
     WalletBalanceView,
     UserWalletBalanceView,
+    WalletTransactionListView,
     # PayoutRequestView,
     DriverAvailabilityView,
     OptimizeRouteView,
@@ -57,10 +58,10 @@ from .views import(
     RegisterView,LoginView, google_login, VerifyEmail, PasswordResetRequestView, PasswordResetView, LogoutView,
     CustomTokenRefreshView, UserProfileView, UpdateFCMTokenView,UpdateUserPreferencesView,
     
-    CarpoolRideViewSet, PassengerCarpoolRideViewSet,
+    CarpoolRideViewSet, PassengerCarpoolRideViewSet, NearbyRidesView,
     VehicleMakeListView, VehicleModelListView, DriverVehicleView,
     
-    DownloadRideHistoryView, UserReportsView, PaymentReceiptView, DriverEarningsView,PassengerSpendingView 
+    DownloadRideHistoryView, UserReportsView, PaymentReceiptView, DriverEarningsView,PassengerSpendingView, MonthlySummaryView
 )
 
 
@@ -129,11 +130,13 @@ urlpatterns = [
     # Get driver live location
     path("passenger/request-to-join", RequestToJoinRideView.as_view(), name="passenger-rquest-to-join-ride"),
     path('passenger/ride-requests/', PassengerRideRequestListView.as_view(), name='passenger-ride-requests'),
+    path('passenger/rides/nearby/', NearbyRidesView.as_view(), name='passenger-nearby-rides'),
     path("passenger/ride-match/<uuid:match_id>/accept/", AcceptRideMatchView.as_view(), name="accept-ride-match"),
     path("ride-match/<uuid:match_id>/decline/", DeclineRideMatchView.as_view(), name="decline-ride-match"),
     path("passenger/ride-matches/", PassengerRideMatchesView.as_view(), name="passenger-ride-matches"),
     path("wallet/release-payment/<uuid:carpoolride_id>/", ReleaseRidePaymentToDriverView.as_view(), name="wallet-release-payment"),
     path('wallet/balance/', UserWalletBalanceView.as_view(), name='wallet-balance'),
+    path('wallet/transactions/', WalletTransactionListView.as_view(), name='wallet-transactions'),
     path("api/wallet/topup/mock-callback/", WalletTopUpCallbackView.as_view(), name="mock-wallet-callback"),
     path("wallet/transfer/", TransferFundsView.as_view(), name="transfer"),
     path("wallet/pay-ride/<uuid:carpoolride_id>/", PayForRideWithWalletView.as_view(), name="pay-ride"),
@@ -155,6 +158,7 @@ urlpatterns = [
     path('reports/payment-receipt/', PaymentReceiptView.as_view(), name='payment-receipt'),
     path('reports/driver-earnings/', DriverEarningsView.as_view(), name='driver-earnings'),
     path('reports/passenger-spending/', PassengerSpendingView.as_view(), name='passenger-spending'),
+    path('reports/monthly-summary/', MonthlySummaryView.as_view(), name='monthly-summary'),
     
     
 ]
@@ -33,6 +33,7 @@ from django.utils.timezone import now, timedelta
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from Taxi.firebase import send_push_notification # for firebase cloud messaging
+from Taxi.notifications import notify_many
 
 def send_notification(id, message, carpoolride_id=None):
     """Send a real-time WebSocket notification to a specific user."""
@@ -57,27 +58,16 @@ def send_notification(id, message, carpoolride_id=None):
     )
 
 def notify_user(user, message,  carpoolride_id=None):
-    """Send a notification via WebSockets and Firebase."""
-    """Send a notification to a user via WebSockets and Firebase.
+    """Queue a notification via WebSockets and Firebase."""
+    """Queue a notification to a user via WebSockets and Firebase.
     
     Args:
         user: The CustomUser instance to notify.
         message (str): The message content to send.
         ride_id (str, optional): The ID of the ride associated with the notification.
     """
-    print(f"this is the what the nofiy users gets {carpoolride_id}")
-    # send_notification(user.id, message) 
-    send_notification(user.id, message, carpoolride_id=carpoolride_id)  # WebSocket
-    # send_push_notification(user, message)  # Firebase
-    # Firebase push notification
-    if hasattr(user, 'fcm_token') and user.fcm_token:
-        send_push_notification(
-            token=user.fcm_token,
-            title="Ride Update",  # Fixed title for notifications
-            body=message         # Use message as the body
-        )
-    else:
-        print(f"No FCM token for user {user.id}")
+    # WebSocket + Firebase delivery happens in the dispatch_notifications task
+    notify_many([(user.id, message)], carpoolride_id=carpoolride_id)
     
     
     
@@ -110,15 +100,14 @@ from django.conf import settings
 from datetime import datetime, timedelta
 from django.utils import timezone
 from smtplib import SMTPException
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
+from Taxi.emails import queue_email, queue_emails, render_email
 import logging
 logger = logging.getLogger(__name__)
 
 
 def send_email(subject, message, to_email, html_message=None):
     """
-    Send an email with both plain text and HTML versions.
+    Queue an email with both plain text and HTML versions.
     
     Args:
         subject (str): Email subject
@@ -127,33 +116,17 @@ def send_email(subject, message, to_email, html_message=None):
         html_message (str, optional): HTML message body. If None, rendered from template.
     """
     try:
-        # Prepare context for templates
-        context = {
-            'subject': subject,
-            'user_name': to_email if isinstance(to_email, str) else to_email[0].split('@')[0],
-            'message': message,
-            'year': timezone.now().year,
-        }
-
-        # Render templates
-        text_content = render_to_string('emails/base_email.txt', context)
-        html_content = html_message or render_to_string('emails/base_email.html', context)
-
-        # Create email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[to_email] if isinstance(to_email, str) else to_email,
-        )
-        email.attach_alternative(html_content, "text/html")
-
-        # Send email
-        email.send()
-        logger.info(f"Email sent to {to_email} with subject: {subject}")
+        user_name = to_email if isinstance(to_email, str) else to_email[0].split('@')[0]
+        payload = render_email(subject, user_name, message, to_email, from_email=settings.DEFAULT_FROM_EMAIL)
+        if html_message:
+            payload['html'] = html_message
+
+        # Delivered by the send_email_batch task after commit
+        queue_emails([payload])
+        logger.info(f"Email to {to_email} queued with subject: {subject}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
+        logger.error(f"Failed to queue email to {to_email}: {str(e)}")
         return False
     
 #verification mail
@@ -183,30 +156,12 @@ def send_verification_email(user):
             f"This link will expire in 24 hours."
         )
 
-        # Render templates
-        context = {
-            'subject': subject,
-            'user_name': user.first_name,
-            'message': message,
-            'year': timezone.now().year,
-        }
-        text_content = render_to_string('emails/base_email.txt', context)
-        html_content = render_to_string('emails/base_email.html', context)
-
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            # from_email=settings.DEFAULT_FROM_EMAIL,
-            from_email=f"DukeRides <{settings.DEFAULT_FROM_EMAIL}>", 
-            to=[user.email],
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        logger.info(f"Verification email sent to {user.email}")
+        # Queue the email; it only goes out if the registration commits
+        queue_email(subject, user.first_name, message, user.email)
+        logger.info(f"Verification email queued for {user.email}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send verification email to {user.email}: {str(e)}")
+        logger.error(f"Failed to queue verification email to {user.email}: {str(e)}")
         return False
 
 def create_token(user, extra_payload):
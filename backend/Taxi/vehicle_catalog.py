@@ -0,0 +1,123 @@
+"""Cached vehicle catalog (VehicleMakeListView / VehicleModelListView).
+
+Makes and models change only through the admin, yet the driver registration
+and profile screens fetch them on every load. The serialized JSON of the make
+list and of each make's model list is therefore kept in the shared cache
+together with its content hash, which is served as the ETag so clients that
+already have the list get a 304 without a body.
+
+Any change to a VehicleMake or VehicleModel (see signals.py) invalidates the
+"vehicle_catalog" namespace after commit and rebuilds it; warm() also runs at
+process start (asgi.py) so the first request after a deploy is a hit.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+
+import redis
+from django.db import DatabaseError, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from . import cache
+from .models import VehicleMake, VehicleModel
+from .serializers import VehicleMakeSerializer, VehicleModelSerializer
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "vehicle_catalog"
+# entries are invalidated explicitly, the timeout only bounds a missed signal
+PAYLOAD_TIMEOUT = 24 * 3600
+EMPTY_MODELS = "none"
+
+
+def _payload(data):
+    body = JSONRenderer().render(data)
+    return {"body": body, "etag": hashlib.md5(body).hexdigest()}
+
+
+def _models_queryset():
+    return VehicleModel.objects.select_related("make").order_by("name")
+
+
+def _cached(*parts, compute):
+    try:
+        return cache.get_or_set(NAMESPACE, *parts, compute=compute, timeout=PAYLOAD_TIMEOUT)
+    except redis.RedisError as e:
+        logger.error(f"Vehicle catalog cache unavailable, querying the database: {str(e)}")
+        return compute()
+
+
+def makes_payload():
+    """{"body": JSON bytes, "etag": content hash} of every make."""
+    return _cached(
+        "makes",
+        compute=lambda: _payload(VehicleMakeSerializer(VehicleMake.objects.order_by("name"), many=True).data),
+    )
+
+
+def make_ids():
+    """Ids (as strings) of every make; only these get a cached model list."""
+    return _cached("make_ids", compute=lambda: {str(pk) for pk in VehicleMake.objects.values_list("make_id", flat=True)})
+
+
+def models_payload(make_id=None):
+    """
+    Payload of a make's models. No make_id or an unknown one gives the shared
+    empty list, so anonymous callers cannot add a cache entry per random UUID.
+    """
+    if make_id is None or str(make_id) not in make_ids():
+        return _cached("models", EMPTY_MODELS, compute=lambda: _payload([]))
+    return _cached(
+        "models", make_id,
+        compute=lambda: _payload(VehicleModelSerializer(_models_queryset().filter(make_id=make_id), many=True).data),
+    )
+
+
+def catalog_response(request, payload):
+    """The payload as a JSON response, or a 304 if the client's If-None-Match is current."""
+    etag = quote_etag(payload["etag"])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(payload["body"], content_type="application/json")
+    response["ETag"] = etag
+    # clients may reuse the list briefly, then revalidate with the ETag
+    response["Cache-Control"] = "public, max-age=300"
+    return response
+
+
+def warm():
+    """Precompute the make list and every make's model list (two queries)."""
+    try:
+        makes = list(VehicleMake.objects.order_by("name"))
+        models_by_make = defaultdict(list)
+        for model in _models_queryset():
+            models_by_make[model.make_id].append(model)
+
+        cache.set_value(NAMESPACE, "makes", value=_payload(VehicleMakeSerializer(makes, many=True).data), timeout=PAYLOAD_TIMEOUT)
+        cache.set_value(NAMESPACE, "make_ids", value={str(make.make_id) for make in makes}, timeout=PAYLOAD_TIMEOUT)
+        cache.set_value(NAMESPACE, "models", EMPTY_MODELS, value=_payload([]), timeout=PAYLOAD_TIMEOUT)
+        for make in makes:
+            data = VehicleModelSerializer(models_by_make[make.make_id], many=True).data
+            cache.set_value(NAMESPACE, "models", make.make_id, value=_payload(data), timeout=PAYLOAD_TIMEOUT)
+    except (DatabaseError, redis.RedisError) as e:
+        # e.g. at process start before migrations ran; requests then fill the cache themselves
+        logger.warning(f"Could not warm the vehicle catalog cache: {str(e)}")
+        return
+    logger.info(f"Warmed the vehicle catalog cache with {len(makes)} makes")
+
+
+def _rebuild():
+    try:
+        cache.invalidate(NAMESPACE)
+    except redis.RedisError as e:
+        logger.error(f"Could not invalidate the vehicle catalog cache: {str(e)}")
+        return
+    warm()
+
+
+def invalidate():
+    """After commit, drop the cached catalog and build it again."""
+    transaction.on_commit(_rebuild)
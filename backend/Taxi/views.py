@@ -50,6 +50,10 @@ class DriverRideRequestsView(ListAPIView):
 from Taxi.serializers import CarpoolRideCreateSerializer
 """first drivers can create rides"""
 from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from .tasks import match_new_ride, match_new_ride_request
+from .notifications import notify_many
+from .emails import queue_email, queue_emails, render_emails
 class CreateCarpoolRideView(CreateAPIView):
     serializer_class = CarpoolRideCreateSerializer
     permission_classes = [IsAuthenticated]  # Only logged-in users can create rides
@@ -69,10 +73,16 @@ class CreateCarpoolRideView(CreateAPIView):
             raise ValidationError("You already have an active ride in progress or pending. Please complete it before creating a new one.")
    
         try:
-            serializer.save(driver=self.request.user)
+            ride = serializer.save(driver=self.request.user)
         except ValidationError as e:
             logger.error(f"Serializer validation error: {e.detail}")  # Log validation errors
             raise
+
+        # suggest the new ride to waiting passengers once it is committed
+        ride_id = str(ride.carpoolride_id)
+        transaction.on_commit(lambda: match_new_ride.delay(ride_id))
+        ride_cache.invalidate_rides(ride.departure_time)
+        ride_cache.invalidate_user(user.pk)
     
     #for the request user (driver who created specific ride to edit their ride)
 from django.core.exceptions import PermissionDenied
@@ -90,15 +100,15 @@ class UpdateCarpoolRideView(UpdateAPIView):
        
         logger.info(f"Validated data before save: {serializer.validated_data}")
         print(f"Validated data before save: {serializer.validated_data}")
+        previous_departure = serializer.instance.departure_time
         updated_ride = serializer.save()
         print(f"Updated ride departure time: {updated_ride.departure_time}")
+        ride_cache.invalidate_rides(previous_departure, updated_ride.departure_time)
 
         # Notify passengers
-        accepted_requests = RideRequest.objects.filter(ride=updated_ride, status="accepted")
-        for req in accepted_requests:
-            message = f"The ride from {updated_ride.origin['label']} to {updated_ride.destination['label']} has been updated by the driver. New departure time: {updated_ride.departure_time}. Please review and cancel if it no longer suits you."
-            notify_user(req.passenger, message, carpoolride_id=str(updated_ride.carpoolride_id))
-            # notify_user(req.passenger, message)
+        passenger_ids = RideRequest.objects.filter(ride=updated_ride, status="accepted").values_list("passenger_id", flat=True)
+        message = f"The ride from {updated_ride.origin['label']} to {updated_ride.destination['label']} has been updated by the driver. New departure time: {updated_ride.departure_time}. Please review and cancel if it no longer suits you."
+        notify_many([(passenger_id, message) for passenger_id in passenger_ids], carpoolride_id=updated_ride.carpoolride_id)
 
         return updated_ride
     
@@ -119,24 +129,22 @@ class CarpoolRideViewSet(ModelViewSet):
             queryset = queryset.filter(is_women_only=True)
         return queryset
 from Taxi.serializers import RideHistorySerializer
-from rest_framework.pagination import PageNumberPagination
-class CustomPagination(PageNumberPagination):
-    page_size = 5  # Default number of items per page
-    page_size_query_param = 'limit'  # Allow client to specify limit
-    max_page_size = 10  # Maximum limit
+from .pagination import RideHistoryPagination, WalletTransactionPagination
 
 class RideHistoryView(ListAPIView):
     serializer_class = RideHistorySerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = CustomPagination
+    # keyset on (last_updated, carpoolride_id): no OFFSET or COUNT(*) per page
+    pagination_class = RideHistoryPagination
 
     def get_queryset(self):
         user = self.request.user
         user_requests = RideRequest.objects.filter(passenger=user).values_list('ride_id', flat=True)
-        return CarpoolRide.objects.filter(
+        # the IN subquery cannot duplicate rides, so no distinct() is needed
+        return RideHistorySerializer.setup_eager_loading(CarpoolRide.objects.filter(
             Q(driver=user) | Q(carpoolride_id__in=user_requests),
             status='completed'
-        ).distinct().order_by('-last_updated')
+        ).order_by('-last_updated', '-carpoolride_id'))
        
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -176,7 +184,8 @@ class DriverCancelRideView(APIView):
             return Response({"error": "Ride is already completed"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Refund all passengers with accepted requests
-        accepted_requests = RideRequest.objects.filter(ride=ride, status="accepted")
+        accepted_requests = RideRequest.objects.filter(ride=ride, status="accepted").select_related("passenger")
+        notifications = []
         for req in accepted_requests:
             user_wallet, _ = UserWallet.objects.get_or_create(user=req.passenger)
             refund_amount = ride.fare  # Full refund for driver cancellation
@@ -194,11 +203,13 @@ class DriverCancelRideView(APIView):
 
             # Notify passenger
             message = f"The ride from {ride.origin['label']} to {ride.destination['label']} on {ride.departure_time} has been cancelled by the driver. A full refund of {refund_amount} has been issued."
-            notify_user(req.passenger, message)
+            notifications.append((req.passenger_id, message))
 
         # Mark ride as cancelled
         ride.is_cancelled = True
         ride.save()
+        ride_cache.invalidate_rides(ride.departure_time)
+        notify_many(notifications, carpoolride_id=ride.carpoolride_id)
 
         return Response({
             "message": "Ride cancelled successfully. All passengers have been refunded and notified.",
@@ -599,6 +610,14 @@ class AcceptRideRequestView(UpdateAPIView):
 
             ride_request.ride.available_seats -= ride_request.seats_requested
             ride_request.ride.save()
+            ride_cache.invalidate_rides(ride_request.ride.departure_time)
+            # no longer pending, so the listing stops hiding the ride from this passenger
+            ride_cache.invalidate_user(ride_request.passenger_id)
+            if ride_request.ride.status == "in_progress":
+                try:
+                    proximity.cache_pickups(ride_request.ride.carpoolride_id)
+                except redis.RedisError as e:
+                    logger.error(f"Could not refresh pickups for ride {ride_request.ride.carpoolride_id}: {str(e)}")
             # Generate Booking Confirmation
             subject = "Booking Confirmation"
             message = (
@@ -614,30 +633,8 @@ class AcceptRideRequestView(UpdateAPIView):
                 f"<p><strong>Booking Time:</strong> {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"
             )
 
-            # Render templates
-            context = {
-                'subject': subject,
-                'user_name': ride_request.passenger.first_name,
-                'message': message,
-                'year': timezone.now().year,
-            }
-            text_content = render_to_string('emails/base_email.txt', context)
-            html_content = render_to_string('emails/base_email.html', context)
-
-            # Send email
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=f"DukeRides <{settings.DEFAULT_FROM_EMAIL}>", 
-                # from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[ride_request.passenger.email],
-            )
-            email.attach_alternative(html_content, "text/html")
-            try:
-                email.send()
-                logger.info(f"Booking confirmation email sent to {ride_request.passenger.email}")
-            except Exception as e:
-                logger.error(f"Failed to send booking confirmation email: {str(e)}")
+            # Queue the email; the send_email_batch task delivers it
+            queue_email(subject, ride_request.passenger.first_name, message, ride_request.passenger.email)
             # Send push notification
             try:
                 fcm_token = getattr(ride_request.passenger, "fcm_token", None)
@@ -700,6 +697,7 @@ class DeclineRideRequestView(generics.UpdateAPIView):
         # Mark the request as declined
         ride_request.status = "declined"
         ride_request.save()
+        ride_cache.invalidate_user(ride_request.passenger_id)
         logger.info(f"Ride request {ride_request.ridrequest_id} declined by driver {request.user.id}")
 
         # Notify the passenger
@@ -758,6 +756,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from .models import UserLocation, RideRequest, CarpoolRide
 from .utils import notify_user
+from . import live_location, proximity, ride_cache
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
 
 
 class UpdateDriverLocationView(APIView):
@@ -786,35 +789,41 @@ class UpdateDriverLocationView(APIView):
             print(f"No active ride found for user={user.id}, ride_id={ride_id}")
             return Response({"error": "You are not assigned to an active ride with this ID."}, status=403)
 
-        # Update or create location
+        # Keep the fix in the Redis hot store; UserLocation gets periodic checkpoints from it
         try:
-            location, created = UserLocation.objects.update_or_create(
-                user=user,
-                ride=ride,
-                defaults={
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "is_simulated": is_simulated  # Support for simulation
-                }
+            updated_at = live_location.record_fix(user.id, ride.carpoolride_id, latitude, longitude, is_simulated)
+        except redis.RedisError as e:
+            updated_at = timezone.now()
+            logger.error(f"Live location store unavailable, writing UserLocation directly: {str(e)}")
+            try:
+                UserLocation.objects.update_or_create(
+                    user=user,
+                    ride=ride,
+                    defaults={
+                        "latitude": latitude,
+                        "longitude": longitude,
+                        "is_simulated": is_simulated  # Support for simulation
+                    }
+                )
+            except Exception as e:
+                print(f"Error updating UserLocation: user={user.id}, ride_id={ride_id}, error={str(e)}")
+                return Response({"error": "Failed to update location."}, status=500)
+        except (TypeError, ValueError):
+            return Response({"error": "Latitude and longitude must be numbers."}, status=400)
+
+        # push to passengers subscribed over the ride location websocket
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                live_location.group_name(ride.carpoolride_id),
+                live_location.location_event(user.id, ride.carpoolride_id, latitude, longitude, is_simulated, updated_at),
             )
-            action = "created" if created else "updated"
-            print(f"UserLocation {action}: user={user.id}, ride_id={ride_id}, lat={latitude}, lng={longitude}, is_simulated={is_simulated}, updated_at={location.updated_at}")
         except Exception as e:
-            print(f"Error updating UserLocation: user={user.id}, ride_id={ride_id}, error={str(e)}")
-            return Response({"error": "Failed to update location."}, status=500)
+            logger.error(f"Failed to push driver location for ride {ride_id}: {str(e)}")
 
         # Notify passengers if driver is near (only for non-simulated locations)
         if not is_simulated:
-            for ride_request in RideRequest.objects.filter(ride=ride, status="accepted"):
-                pickup_coords = (ride_request.pickup_location["lat"], ride_request.pickup_location["lng"])
-                driver_coords = (float(latitude), float(longitude))
-                distance = geodesic(driver_coords, pickup_coords).km
-                print(f"Distance to passenger {ride_request.passenger.id}: {distance} km")
-                if distance < 0.5:
-                    message = f"Your ride is approaching! Get ready for pickup at {ride_request.pickup_location['label']}."
-                    notify_user(ride_request.passenger, message)
-                    print(f'ride request passenger being called is: {ride_request.passenger}')
-                    print(f"Sent notification to passenger {ride_request.passenger.id} for ride {ride_id}")
+            for passenger_id, label in proximity.check_and_notify(ride.carpoolride_id, latitude, longitude):
+                logger.info(f"Queued approach notification to passenger {passenger_id} for ride {ride_id}")
 
         return Response({
             "message": "Driver location updated successfully.",
@@ -844,9 +853,19 @@ class StartRideView(APIView):
             ride.status = "in_progress"
             ride.save()
 
-            for ride_request in ride.requests.filter(status="accepted"):
-                message = f"Your ride from {ride_request.pickup_location} has started!"
-                notify_user(ride_request.passenger, message)
+            # pickup points for the proximity checks on each driver ping
+            try:
+                proximity.cache_pickups(ride.carpoolride_id)
+            except redis.RedisError as e:
+                logger.error(f"Could not cache pickups for ride {ride.carpoolride_id}: {str(e)}")
+
+            notify_many(
+                [
+                    (passenger_id, f"Your ride from {pickup_location} has started!")
+                    for passenger_id, pickup_location in ride.requests.filter(status="accepted").values_list("passenger_id", "pickup_location")
+                ],
+                carpoolride_id=ride.carpoolride_id,
+            )
 
             return Response({"message": "Ride started."}, status=status.HTTP_200_OK)
         except CarpoolRide.DoesNotExist:
@@ -865,6 +884,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import RideRequest, CarpoolRide, UserLocation
 from .serializers import CarpoolRideSerializer
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
 import logging
 
 logger = logging.getLogger(__name__)
@@ -875,60 +895,58 @@ class UserDashboardView(APIView):
 
     def get(self, request):
         passenger = request.user
+        # latest driver location for the ride, resolved inside the rides query
+        latest_location = UserLocation.objects.filter(
+            user=OuterRef('driver'), ride=OuterRef('pk')
+        ).order_by('-updated_at')
         upcoming_rides = CarpoolRide.objects.filter(
-            requests__passenger=passenger,
-            requests__status="accepted",
+            Exists(RideRequest.objects.filter(ride=OuterRef('pk'), passenger=passenger, status="accepted")),
             is_completed=False,
             is_cancelled=False
-        ).distinct()
+        ).select_related(
+            'driver', 'vehicle__make', 'vehicle__model'
+        ).prefetch_related(
+            Prefetch('requests', queryset=RideRequest.objects.select_related('passenger'))
+        ).annotate(
+            driver_latitude=Subquery(latest_location.values('latitude')[:1]),
+            driver_longitude=Subquery(latest_location.values('longitude')[:1]),
+            driver_location_at=Subquery(latest_location.values('updated_at')[:1]),
+        ).order_by('departure_time')
 
         upcoming_rides_data = []
         for ride in upcoming_rides:
-            try:
-                # Fetch the latest driver location
-                location = UserLocation.objects.filter(
-                    user=ride.driver,
-                    ride=ride
-                ).order_by('-updated_at').first()
-                driver_location = None
-                if location:
-                    driver_location = {
-                        "user_id": str(ride.driver.id),
-                        "latitude": location.latitude,
-                        "longitude": location.longitude,
-                        "name": ride.driver.fullname,
-                        "updated_at": location.updated_at,
-                    }
+            driver_location = None
+            if ride.driver_location_at is not None:
+                driver_location = {
+                    "user_id": str(ride.driver.id),
+                    "latitude": ride.driver_latitude,
+                    "longitude": ride.driver_longitude,
+                    "name": ride.driver.fullname,
+                    "updated_at": ride.driver_location_at,
+                }
 
-                # Fetch the passenger's ride request
-                ride_request = RideRequest.objects.filter(
-                    ride=ride,
-                    passenger=passenger,
-                    status="accepted"
-                ).first()
-                passenger_request = None
-                if ride_request:
-                    passenger_request = {
-                        "passenger_id": str(ride_request.passenger.id),
-                        "passenger_name": ride_request.passenger.fullname,
-                        "pickup_location": {
-                            "lat": ride_request.pickup_location.get("lat"),
-                            "lng": ride_request.pickup_location.get("lng"),
-                            "label": ride_request.pickup_location.get("label"),
-                        },
-                    }
+            # The passenger's accepted request, taken from the prefetched requests
+            ride_request = next(
+                (r for r in ride.requests.all() if r.passenger_id == passenger.id and r.status == "accepted"),
+                None
+            )
+            passenger_request = None
+            if ride_request:
+                passenger_request = {
+                    "passenger_id": str(ride_request.passenger.id),
+                    "passenger_name": ride_request.passenger.fullname,
+                    "pickup_location": {
+                        "lat": ride_request.pickup_location.get("lat"),
+                        "lng": ride_request.pickup_location.get("lng"),
+                        "label": ride_request.pickup_location.get("label"),
+                    },
+                }
 
-                # Serialize the ride and include additional data
-                ride_data = CarpoolRideSerializer(ride).data
-                ride_data["driver_location"] = driver_location
-                ride_data["passenger_request"] = passenger_request
-                upcoming_rides_data.append(ride_data)
-            except Exception as e:
-                logger.error(f"Error fetching data for ride {ride.carpoolride_id}: {str(e)}")
-                ride_data = CarpoolRideSerializer(ride).data
-                ride_data["driver_location"] = None
-                ride_data["passenger_request"] = None
-                upcoming_rides_data.append(ride_data)
+            # Serialize the ride and include additional data
+            ride_data = CarpoolRideSerializer(ride).data
+            ride_data["driver_location"] = driver_location
+            ride_data["passenger_request"] = passenger_request
+            upcoming_rides_data.append(ride_data)
 
         return Response({
             "upcoming_rides": upcoming_rides_data
@@ -962,6 +980,19 @@ class PassengerDriverLocationView(APIView):
                     status=403
                 )
 
+            driver = ride_request.ride.driver
+            fix = live_location.get_fix(ride_id)
+            if fix and fix["user_id"] == str(driver.id):
+                return Response({
+                    "user_id": str(driver.id),
+                    "latitude": fix["latitude"],
+                    "longitude": fix["longitude"],
+                    "name": driver.fullname,
+                    "updated_at": fix["updated_at"],
+                    "is_simulated": fix["is_simulated"],
+                    "carpoolride_id": fix["ride_id"],
+                })
+
             # Fetch the latest driver location for this ride
             location = UserLocation.objects.filter(
                 user=ride_request.ride.driver,
@@ -1084,6 +1115,11 @@ class RequestToJoinRideView(CreateAPIView):
         )
         logger.info(f"Broadcasted ride request {ride_request.ridrequest_id} to group ride_{ride_id}")
 
+        # suggest other matching rides to the passenger without waiting for the periodic pass
+        ride_request_id = str(ride_request.ridrequest_id)
+        transaction.on_commit(lambda: match_new_ride_request.delay(ride_request_id))
+        ride_cache.invalidate_user(self.request.user.pk)
+
         
 from django.utils import timezone
 class PassengerRideRequestListView(generics.ListAPIView):
@@ -1225,61 +1261,70 @@ class PassengerCarpoolRideViewSet(ModelViewSet):
     http_method_names = ['get']
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        queryset = queryset.filter(
+        params = self.request.query_params
+        logger.debug(f"Request params: {params}")
+
+        # open rides of the (date, time slot, women-only) bucket minus this user's exclusions, both cached
+        bucket = ride_cache.bucket_for(params)
+        ride_ids = ride_cache.candidate_ids(*bucket) - ride_cache.excluded_ids(self.request.user)
+        queryset = super().get_queryset().filter(carpoolride_id__in=ride_ids).filter(
+            # re-checked per row in case a cached set is a little stale
             is_completed=False,
             is_cancelled=False,
             available_seats__gt=0,
             departure_time__gte=timezone.now()
-        ).exclude(
-            requests__passenger=self.request.user,
-            requests__status__in=["pending", "canceled"]
-            # requests__status__in=["pending", "canceled", "declined"]
         )
-        params = self.request.query_params
-        logger.debug(f"Request params: {params}")
 
         origin = params.get("origin", "").strip()
         if origin:
-            queryset = queryset.filter(origin__label__icontains=origin)
+            queryset = queryset.filter(origin_label__icontains=origin)
             logger.debug(f"Origin filter: {origin}")
 
         destination = params.get("destination", "").strip()
         if destination:
-            queryset = queryset.filter(destination__label__icontains=destination)
+            queryset = queryset.filter(destination_label__icontains=destination)
             logger.debug(f"Destination filter: {destination}")
 
-        is_women_only = params.get("is_women_only")
-        if is_women_only == "true":
-            queryset = queryset.filter(is_women_only=True)
-        elif is_women_only == "false":
-            queryset = queryset.filter(is_women_only=False)
+        return queryset
 
-        queryset = queryset.exclude(driver=self.request.user)
 
-        pickup_date = params.get("pickup_date")
-        if pickup_date:
-            try:
-                pickup_date_obj = datetime.strptime(pickup_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(departure_time__date=pickup_date_obj)
-                logger.debug(f"Pickup date filter: {pickup_date}")
-            except ValueError as e:
-                logger.warning(f"Invalid pickup_date format: {pickup_date}, error: {e}")
-                pass
-
-        time_slot = params.get("time_slot")
-        if time_slot and time_slot != "":
-            logger.debug(f"Time slot filter: {time_slot}")
-            if time_slot == "before_06":
-                queryset = queryset.filter(departure_time__time__lt=time(6, 0))
-            elif time_slot == "06_12":
-                queryset = queryset.filter(departure_time__time__gte=time(6, 0), departure_time__time__lte=time(12, 0))
-            elif time_slot == "12_18":
-                queryset = queryset.filter(departure_time__time__gte=time(12, 1), departure_time__time__lte=time(18, 0))
-            elif time_slot == "after_18":
-                queryset = queryset.filter(departure_time__time__gt=time(18, 0))
+from Taxi.serializers import NearbyRideSearchSerializer
+from .ride_search import search_rides
 
-        return queryset
+class NearbyRidesView(APIView):
+    """
+    Rides leaving within pickup_radius_km of (pickup_lat, pickup_lng) and, if
+    given, arriving within dropoff_radius_km of (dropoff_lat, dropoff_lng),
+    departing within window_hours of departure_time (default now), ranked by
+    match score.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = NearbyRideSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        search = params.validated_data
+        dropoff = (search["dropoff_lat"], search["dropoff_lng"]) if "dropoff_lat" in search else None
+
+        results = search_rides(
+            request.user,
+            (search["pickup_lat"], search["pickup_lng"]),
+            pickup_radius_km=search["pickup_radius_km"],
+            dropoff=dropoff,
+            dropoff_radius_km=search["dropoff_radius_km"],
+            departure_time=search.get("departure_time"),
+            window=timedelta(hours=search["window_hours"]),
+            limit=search["limit"],
+        )
+        rides = CarpoolRide.objects.select_related('driver', 'vehicle__make', 'vehicle__model').prefetch_related('requests').in_bulk(
+            [ride_id for ride_id, *_ in results]
+        )
+        data = []
+        for ride_id, score, pickup_km, dropoff_km in results:
+            ride = CarpoolRideSerializer(rides[ride_id]).data
+            ride.update({"score": score, "pickup_distance_km": pickup_km, "dropoff_distance_km": dropoff_km})
+            data.append(ride)
+        return Response({"results": data})
     
     
 
@@ -1297,6 +1342,14 @@ class DriverLocationView(APIView):
     def get(self, request, ride_id):
         try:
             ride = CarpoolRide.objects.get(carpoolride_id=ride_id, driver=request.user)
+            fix = live_location.get_fix(ride_id)
+            if fix and fix["user_id"] == str(request.user.id):
+                return Response({
+                    'user_id': request.user.id,
+                    'latitude': fix["latitude"],
+                    'longitude': fix["longitude"],
+                    'name': request.user.fullname,
+                })
             # Fetch latest driver location (adjust based on your UserLocation model)
             location = UserLocation.objects.filter(user=request.user).order_by('-updated_at').first()
             if not location:
@@ -1680,8 +1733,7 @@ class TransferFundsView(APIView):
                     reference=reference
                 )
 
-            # Send Email Notifications (outside transaction for performance)
-            # Send Email Notifications
+            # Queue Email Notifications (sent by a worker after commit)
             subject = "Wallet Transfer Confirmation"
             sender_message = (
                 f"You have successfully sent KES {amount} to {recipient_wallet.user.fullname}.<br>"
@@ -1694,42 +1746,10 @@ class TransferFundsView(APIView):
                 f"Date: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
 
-            context = {
-                'subject': subject,
-                'year': timezone.now().year,
-            }
-
-            # Sender email
-            context['user_name'] = request.user.first_name
-            context['message'] = sender_message
-            text_content = render_to_string('emails/base_email.txt', context)
-            html_content = render_to_string('emails/base_email.html', context)
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=f"DukeRides <{settings.DEFAULT_FROM_EMAIL}>", 
-                # from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[request.user.email],
-            )
-            email.attach_alternative(html_content, "text/html")
-            email.send()
-            logger.info(f"Transfer confirmation email sent to {request.user.email}")
-
-            # Recipient email
-            context['user_name'] = recipient_wallet.user.first_name
-            context['message'] = recipient_message
-            text_content = render_to_string('emails/base_email.txt', context)
-            html_content = render_to_string('emails/base_email.html', context)
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=f"DukeRides <{settings.DEFAULT_FROM_EMAIL}>", 
-                # from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[recipient_wallet.user.email],
-            )
-            email.attach_alternative(html_content, "text/html")
-            email.send()
-            logger.info(f"Transfer confirmation email sent to {recipient_wallet.user.email}")
+            queue_emails(render_emails(subject, [
+                (request.user.first_name, sender_message, request.user.email),
+                (recipient_wallet.user.first_name, recipient_message, recipient_wallet.user.email),
+            ]))
 
             return Response({"message": "Transfer successful", "reference": reference}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -1978,6 +1998,8 @@ class CancelRideView(APIView):
         #     ride.status = "cancelled"
         #     ride.is_cancelled = True
         ride.save()
+        ride_cache.invalidate_rides(ride.departure_time)
+        ride_cache.invalidate_user(user.pk)
         logger.debug(f"Ride {ride.carpoolride_id} updated: available_seats={ride.available_seats}, status={ride.status}")
 
         # Notify the driver via WebSocket
@@ -2035,26 +2057,39 @@ class CancelRideView(APIView):
 from Taxi.serializers import DriverRegistrationSerializer, VehicleMakeSerializer, VehicleModelSerializer
 from Taxi.models import VehicleMake, VehicleModel
 from uuid import UUID
+from . import vehicle_catalog
 class VehicleMakeListView(ListAPIView):
     permission_classes = [AllowAny]
     queryset = VehicleMake.objects.all()
     serializer_class = VehicleMakeSerializer
 
+    def list(self, request, *args, **kwargs):
+        # precomputed JSON from the shared cache, see Taxi/vehicle_catalog.py
+        return vehicle_catalog.catalog_response(request, vehicle_catalog.makes_payload())
+
 class VehicleModelListView(ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = VehicleModelSerializer
 
-    def get_queryset(self):
+    def get_make_id(self):
         make_id = self.request.query_params.get("make_id")
         if make_id:
             try:
                 # Validate make_id as a UUID
-                UUID(make_id)
-                return VehicleModel.objects.filter(make__make_id=make_id)
+                return UUID(make_id)
             except ValueError:
                 # Invalid UUID format
-                return VehicleModel.objects.none()
+                return None
+        return None
+
+    def get_queryset(self):
+        make_id = self.get_make_id()
+        if make_id:
+            return VehicleModel.objects.filter(make__make_id=make_id)
         return VehicleModel.objects.none()
+
+    def list(self, request, *args, **kwargs):
+        return vehicle_catalog.catalog_response(request, vehicle_catalog.models_payload(self.get_make_id()))
     
 from Taxi.serializers import VehicleSerializer
 class DriverVehicleView(APIView):
@@ -2531,6 +2566,20 @@ class UserWalletBalanceView(APIView):
     def get(self, request):
         serializer = UserWalletBalanceSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+from Taxi.serializers import WalletTransactionSerializer
+class WalletTransactionListView(ListAPIView):
+    """Transactions the user sent or received, newest first, paginated by cursor."""
+    serializer_class = WalletTransactionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = WalletTransactionPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return WalletTransaction.objects.filter(
+            Q(user=user) | Q(recipient=user)
+        ).select_related('user', 'recipient').order_by('-created_at', '-walletTransactionid')
     
     
 from Taxi.models import UserPreferences
@@ -2680,6 +2729,13 @@ class TokenRefreshView(SimpleJWTTokenRefreshView):
 # ridehistory report
 from django.http import HttpResponse
 from Taxi.serializers import WalletTransactionSerializer, ReportSerializer
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer, StaticHTMLRenderer
+from .exports import (
+    CSVRenderer, PDFRenderer, ride_history_rows, stream_csv, stream_html, pdf_response,
+)
+from .rollups import period_bounds, rollups_for, totals
+from .reports import REPORTS, serve_report, serve_reports
 
 
 class CustomPaginationForReport(PageNumberPagination):
@@ -2688,18 +2744,24 @@ class CustomPaginationForReport(PageNumberPagination):
     max_page_size = 100
 
 class DownloadRideHistoryView(APIView):
+    """Ride history export; ?format=html (default), csv or pdf, streamed so memory stays flat."""
     permission_classes = [IsAuthenticated]
+    renderer_classes = [StaticHTMLRenderer, CSVRenderer, PDFRenderer, JSONRenderer]
 
     # @cache_page(60 * 15)
     def get(self, request):
         user = request.user
         month = request.query_params.get('month')
         year = request.query_params.get('year')
+        # content negotiation already answered 404 for formats no renderer handles
+        export_format = request.query_params.get('format', 'html')
 
+        # IN subquery instead of a join, so no distinct() is needed
+        user_requests = RideRequest.objects.filter(passenger=user).values('ride_id')
         rides = CarpoolRide.objects.filter(
-            Q(driver=user) | Q(requests__passenger=user),
+            Q(driver=user) | Q(carpoolride_id__in=user_requests),
             is_cancelled=False
-        ).select_related('driver', 'vehicle').prefetch_related('requests__passenger').distinct().order_by('-last_updated')   #.order_by('departure_time')
+        ).order_by('-last_updated')   #.order_by('departure_time')
 
         filter_applied = False
         error_message = None
@@ -2707,7 +2769,8 @@ class DownloadRideHistoryView(APIView):
         if year:
             try:
                 year = int(year)
-                rides = rides.filter(departure_time__year=year)
+                start, end = period_bounds(year)
+                rides = rides.filter(departure_time__gte=start, departure_time__lt=end)
                 filter_applied = True
                 if month:
                     try:
@@ -2726,7 +2789,8 @@ class DownloadRideHistoryView(APIView):
                                 render_to_string('reports/ride_history.html', context),
                                 content_type='text/html'
                             )
-                        rides = rides.filter(departure_time__month=month)
+                        start, end = period_bounds(year, month)
+                        rides = rides.filter(departure_time__gte=start, departure_time__lt=end)
                     except ValueError:
                         context = {
                             'user': user,
@@ -2756,22 +2820,10 @@ class DownloadRideHistoryView(APIView):
                     content_type='text/html'
                 )
 
-        rides_data = [
-            {
-                'carpoolride_id': str(ride.carpoolride_id),
-                'origin_label': ride.origin.get('label', 'N/A'),
-                'destination_label': ride.destination.get('label', 'N/A'),
-                'departure_time': ride.departure_time,
-                'contribution_per_seat': ride.contribution_per_seat,
-                'status': ride.status,
-            }
-            for ride in rides
-        ]
-
         report_data = {
             "user_id": str(user.id),
-            "ride_count": len(rides_data),
-            "format": "html",
+            "ride_count": rides.count(),
+            "format": export_format,
             "generated_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
             "month": month or "all",
             "year": year or str(timezone.now().year),
@@ -2785,18 +2837,28 @@ class DownloadRideHistoryView(APIView):
         )
 
         try:
+            filename = f"ride_history_{user.id}"
+            rows = ride_history_rows(rides)
+            logger.info(f"Ride history {export_format} report generated for user {user.id}, month={month}, year={year}")
+            if export_format == 'csv':
+                return stream_csv(rows, filename)
+            if export_format == 'pdf':
+                period = f"{month or 'all months'} {year or ''}".strip() if filter_applied else "all rides"
+                subtitle = f"Generated on {timezone.localtime().strftime('%B %d, %Y %H:%M')} - {period}"
+                return pdf_response(f"Ride History Report for {user.fullname}", subtitle, rows, filename)
+
             context = {
                 'user': user,
-                'rides': rides_data,
                 'report_generated_at': timezone.now(),
                 'year': timezone.now().year,
                 'filter_month': month,
                 'filter_year': year,
-                'error_message': 'No rides found for the selected period.' if filter_applied and not rides_data else None,
             }
-            html_content = render_to_string('reports/ride_history.html', context)
-            logger.info(f"Ride history report generated for user {user.id}, month={month}, year={year}")
-            return HttpResponse(html_content, content_type='text/html')
+            if not report_data["ride_count"]:
+                context['rides'] = []
+                context['error_message'] = 'No rides found for the selected period.' if filter_applied else None
+                return HttpResponse(render_to_string('reports/ride_history.html', context), content_type='text/html')
+            return stream_html('reports/ride_history.html', 'reports/ride_history_row.html', context, rows)
         except Exception as e:
             logger.error(f"Error generating ride history report for user {user.id}: {str(e)}")
             context = {
@@ -2919,407 +2981,57 @@ class PaymentReceiptView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        month = request.query_params.get('month')
-        year = request.query_params.get('year')
-
-        transactions = WalletTransaction.objects.filter(
-            Q(user=user) | Q(recipient=user),
-            status="completed",
-            transaction_type__in=["escrow_hold", "transfer", "ride_payment", "deposit", "escrow_refund" ]
-        ).select_related('user', 'recipient').distinct().order_by('-created_at')
-        logger.info(f"these are the transactions found for this user's {user.id} paymentment receipt: {transactions} ")
-        filter_applied = False
-        error_message = None
-
-        if year:
-            try:
-                year = int(year)
-                transactions = transactions.filter(created_at__year=year)
-                filter_applied = True
-                if month:
-                    try:
-                        month = int(month)
-                        if not (1 <= month <= 12):
-                            context = {
-                                'user': user,
-                                'transactions': [],
-                                'report_generated_at': timezone.now(),
-                                'year': timezone.now().year,
-                                'filter_month': month,
-                                'filter_year': year,
-                                'error_message': 'Invalid month value. Please select a valid month.',
-                            }
-                            return HttpResponse(
-                                render_to_string('reports/payment_receipt.html', context),
-                                content_type='text/html'
-                            )
-                        transactions = transactions.filter(created_at__month=month)
-                    except ValueError:
-                        context = {
-                            'user': user,
-                            'transactions': [],
-                            'report_generated_at': timezone.now(),
-                            'year': timezone.now().year,
-                            'filter_month': month,
-                            'filter_year': year,
-                            'error_message': 'Invalid month format.',
-                        }
-                        return HttpResponse(
-                            render_to_string('reports/payment_receipt.html', context),
-                            content_type='text/html'
-                        )
-            except ValueError:
-                context = {
-                    'user': user,
-                    'transactions': [],
-                    'report_generated_at': timezone.now(),
-                    'year': timezone.now().year,
-                    'filter_month': month,
-                    'filter_year': year,
-                    'error_message': 'Invalid year format.',
-                }
-                return HttpResponse(
-                    render_to_string('reports/payment_receipt.html', context),
-                    content_type='text/html'
-                )
-        SPENDING_TYPE_LABELS = {
-            "escrow_hold": "Ride Payment",
-            "transfer": "Friend Transfer",
-            "escrow_refund": "Refund",
-            "deposit":"Deposit",
-            "ride_payment": "Ride Payment"
-            }
+        return serve_report(request, "payment_receipt")
 
-        transactions_data = [
-            {
-                'transaction_id': str(transaction.walletTransactionid),
-                'amount': transaction.amount,
-                'spending_type': SPENDING_TYPE_LABELS.get(transaction.transaction_type, "Other"),
-                'transaction_type': transaction.transaction_type or 'n/a',
-                'reference': transaction.reference or 'N/A',
-                'sender_name': transaction.sender_name or 'N/A',
-                'recipient_name': transaction.recipient_name or 'Credit',
-                'created_at': transaction.created_at,
-                'status': transaction.status,
-                'ride_id': getattr(transaction, 'ride_id', 'N/A'),  # Handle missing ride_id
-            }
-            for transaction in transactions
-        ]
-        logger.info(f"this is what transaction data is {transactions_data}")
-
-        report_data = {
-            "user_id": str(user.id),
-            "transaction_count": len(transactions_data),
-            "format": "html",
-            "generated_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "month": month or "all",
-            "year": year or str(timezone.now().year),
-        }
-        report = Report.objects.create(
-            user=user,
-            report_type="payment_receipt",
-            report_data=report_data,
-            created_at=timezone.now(),
-            file_url=None,
-        )
-
-        try:
-            context = {
-                'user': user,
-                'transactions': transactions_data,
-                'report_generated_at': timezone.now(),
-                'year': timezone.now().year,
-                'filter_month': month,
-                'filter_year': year,
-                'error_message': 'No payment receipts found for the selected period.' if filter_applied and not transactions_data else None,
-            }
-            html_content = render_to_string('reports/payment_receipt.html', context)
-            logger.info(f"Payment receipt report generated for user {user.id}, month={month}, year={year}")
-            return HttpResponse(html_content, content_type='text/html')
-        except Exception as e:
-            logger.error(f"Error generating payment receipt report for user {user.id}: {str(e)}")
-            context = {
-                'user': user,
-                'transactions': [],
-                'report_generated_at': timezone.now(),
-                'year': timezone.now().year,
-                'filter_month': month,
-                'filter_year': year,
-                'error_message': 'Failed to generate report. Please try again.',
-            }
-            html_content = render_to_string('reports/payment_receipt.html', context)
-            return HttpResponse(html_content, content_type='text/html')
 class PassengerSpendingView(APIView):
     permission_classes = [IsAuthenticated]
 
     # @cache_page(60 * 15)
     def get(self, request):
-        user = request.user
-        month = request.query_params.get('month')
-        year = request.query_params.get('year')
-        
-        transactions = WalletTransaction.objects.filter(
-            user=user,
-            status="completed",
-            transaction_type__in=["escrow_hold", "transfer", "ride_payment", "deposit", "escrow_refund" ]
-            
-        ).select_related('user', 'recipient').distinct().order_by("-created_at")
-        
-        if year:
-            try:
-                year = int(year)
-                transactions = transactions.filter(created_at__year=year)
-                filter_applied = True
-                if month:
-                    try:
-                        month = int(month)
-                        if not (1 <= month <= 12):
-                            context = {
-                                'user': user,
-                                'transactions': [],
-                                'report_generated_at': timezone.now(),
-                                'year': timezone.now().year,
-                                'filter_month': month,
-                                'filter_year': year,
-                                'error_message': 'Invalid month value. Please select a valid month.',
-                            }
-                            return HttpResponse(
-                                render_to_string('reports/payment_receipt.html', context),
-                                content_type='text/html'
-                            )
-                        transactions = transactions.filter(created_at__month=month)
-                    except ValueError:
-                        context = {
-                            'user': user,
-                            'transactions': [],
-                            'report_generated_at': timezone.now(),
-                            'year': timezone.now().year,
-                            'filter_month': month,
-                            'filter_year': year,
-                            'error_message': 'Invalid month format.',
-                        }
-                        return HttpResponse(
-                            render_to_string('reports/payment_receipt.html', context),
-                            content_type='text/html'
-                        )
-            except ValueError:
-                context = {
-                    'user': user,
-                    'transactions': [],
-                    'report_generated_at': timezone.now(),
-                    'year': timezone.now().year,
-                    'filter_month': month,
-                    'filter_year': year,
-                    'error_message': 'Invalid year format.',
-                }
-                return HttpResponse(
-                    render_to_string('reports/payment_receipt.html', context),
-                    content_type='text/html'
-                )
-        SPENDING_TYPE_LABELS = {
-            "escrow_hold": "Ride Payment",
-            "transfer": "Friend Transfer",
-            "escrow_refund": "Refund",
-            "deposit":"Deposit",
-            "ride_payment": "Ride Payment"
-            }
-
-        spending_data = [
-            {
-                'transaction_id': str(transaction.walletTransactionid),
-                'spending_type': SPENDING_TYPE_LABELS.get(transaction.transaction_type, "Other"),
-                'amount': transaction.amount,
-                'trans_type':transaction.transaction_type,
-                'reference': transaction.reference,
-                'recipient_name': transaction.recipient_name or 'Credit',
-                'created_at': transaction.created_at,   
-            }
-            for transaction in transactions
-        ]
+        return serve_report(request, "passenger_spending")
 
-        report_data = {
-            "user_id": str(user.id),
-            "transaction_count": len(spending_data),
-            "format": "html",
-            "generated_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        report = Report.objects.create(
-            user=user,
-            report_type="passenger_spending",
-            report_data=report_data,
-            created_at=timezone.now(),
-            file_url=None,
-        )
-
-        try:
-            context = {
-                'user': user,
-                'spending': spending_data,
-                'report_generated_at': timezone.now(),
-                'year': timezone.now().year,
-            }
-            html_content = render_to_string('reports/passenger_spending.html', context)
-            logger.info(f"Passenger spending report generated for user {user.id}")
-            return HttpResponse(html_content, content_type='text/html')
-        except Exception as e:
-            logger.error(f"Error generating passenger spending report for user {user.id}: {str(e)}")
-            return Response({"error": "Failed to generate report"}, status=500)
 class DriverEarningsView(APIView):
     permission_classes = [IsAuthenticated]
 
     # @cache_page(60 * 15)
     def get(self, request):
-        user = request.user
-        if not user.is_driver:
-            return Response({"error": "Only drivers can access earnings report"}, status=403)
-        
-        month = request.query_params.get('month')
-        year = request.query_params.get('year')
-        
-        rides = CarpoolRide.objects.filter(
-            driver=user,
-            status="completed",
-            is_cancelled=False
-        ).select_related('driver').prefetch_related('requests__passenger')
-        
-        if year:
-            try:
-                year = int(year)
-                # transactions = transactions.filter(created_at__year=year)
-                rides = rides.filter(departure_time__year=year)
-                filter_applied = True
-                if month:
-                    try:
-                        month = int(month)
-                        if not (1 <= month <= 12):
-                            context = {
-                                'user': user,
-                                'rides': [],
-                                'report_generated_at': timezone.now(),
-                                'year': timezone.now().year,
-                                'filter_month': month,
-                                'filter_year': year,
-                                'error_message': 'Invalid month value. Please select a valid month.',
-                            }
-                            return HttpResponse(
-                                render_to_string('reports/payment_receipt.html', context),
-                                content_type='text/html'
-                            )
-                        # transactions = transactions.filter(created_at__month=month)
-                        rides = rides.filter(departure_time__month=month)
-                    except ValueError:
-                        context = {
-                            'user': user,
-                            'rides': [],
-                            'report_generated_at': timezone.now(),
-                            'year': timezone.now().year,
-                            'filter_month': month,
-                            'filter_year': year,
-                            'error_message': 'Invalid month format.',
-                        }
-                        return HttpResponse(
-                            render_to_string('reports/payment_receipt.html', context),
-                            content_type='text/html'
-                        )
-            except ValueError:
-                context = {
-                    'user': user,
-                    'rides': [],
-                    'report_generated_at': timezone.now(),
-                    'year': timezone.now().year,
-                    'filter_month': month,
-                    'filter_year': year,
-                    'error_message': 'Invalid year format.',
-                }
-                return HttpResponse(
-                    render_to_string('reports/payment_receipt.html', context),
-                    content_type='text/html'
-                )
-
-        earnings_data = []
+        return serve_report(request, "driver_earnings")
 
-        for ride in rides:
-            accepted_requests = ride.requests.filter(status="accepted", payment_status="paid").select_related("passenger")
-            passengers = [
-                {
-                    "name": req.passenger.fullname,
-                    "phone": req.passenger.phone_number,
-                    "seats_booked": req.seats_requested,
-                    "amount_paid": float(ride.contribution_per_seat) * req.seats_requested,
-                }
-                for req in accepted_requests
-            ]
+from Taxi.serializers import MonthlyUserRollupSerializer
+class MonthlySummaryView(APIView):
+    """Monthly earnings/spending totals from the rollup table; ?from=YYYY-MM&to=YYYY-MM, both optional."""
+    permission_classes = [IsAuthenticated]
 
-            earnings_data.append({
-                "carpoolride_id": str(ride.carpoolride_id),
-                "origin": ride.origin.get("label", "Unknown"),
-                "destination": ride.destination.get("label", "Unknown"),
-                "total_amount_paid": ride.total_amount_paid,
-                "departure_time": ride.departure_time,
-                "passenger_count": accepted_requests.count(),
-                "passenger_breakdown": passengers,
-            })
-        report_data = {
-            "user_id": str(user.id),
-            "ride_count": len(earnings_data),
-            "format": "html",
-            "generated_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        report = Report.objects.create(
-            user=user,
-            report_type="driver_earnings",
-            report_data=report_data,
-            created_at=timezone.now(),
-            file_url=None,
-        )
+    def get(self, request):
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    bounds[param] = datetime.strptime(value, "%Y-%m").date()
+                except ValueError:
+                    return Response({"error": f"Invalid '{param}' month, expected YYYY-MM"}, status=400)
 
-        try:
-            context = {
-                'user': user,
-                'earnings': earnings_data,
-                'report_generated_at': timezone.now(),
-                'year': timezone.now().year,
-            }
-            html_content = render_to_string('reports/driver_earnings.html', context)
-            logger.info(f"Driver earnings report generated for user {user.id}")
-            return HttpResponse(html_content, content_type='text/html')
-        except Exception as e:
-            logger.error(f"Error generating driver earnings report for user {user.id}: {str(e)}")
-            return Response({"error": "Failed to generate report"}, status=500)
+        rollups = rollups_for(request.user, bounds.get('from'), bounds.get('to'))
+        return Response({
+            "months": MonthlyUserRollupSerializer(rollups, many=True).data,
+            "totals": totals(rollups),
+        })
 
 class UserReportsView(APIView):
+    """
+    Any registered report type for request.user; ?report_type=a,b,... returns
+    several types for the same period at once as {"reports": {type: html}}.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        report_type = request.query_params.get('report_type')
-        report_views = {
-            'ride_history': RideHistoryView.as_view(),
-            'payment_receipt': PaymentReceiptView.as_view(),
-            'driver_earnings': DriverEarningsView.as_view(),
-            'passenger_spending': PassengerSpendingView.as_view(),
-        }
+        report_types = list(dict.fromkeys(filter(None, request.query_params.get('report_type', '').split(','))))
 
-        if report_type not in report_views:
-            logger.warning(f"Invalid report_type requested: {report_type} by user {request.user.id}")
+        if not report_types or any(report_type not in REPORTS for report_type in report_types):
+            logger.warning(f"Invalid report_type requested: {request.query_params.get('report_type')} by user {request.user.id}")
             return Response({"error": "Invalid report type"}, status=400)
 
-        try:
-            # Store report access in Report model
-            Report.objects.create(
-                user=request.user,
-                report_type=report_type,
-                report_data={"report_accessed": report_type, "generated_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S")},
-                created_at=timezone.now(),
-                file_url=None,
-            )
-
-            # Call the appropriate view
-            view = report_views[report_type]
-            response = view(request._request)
-            logger.info(f"Report {report_type} accessed by user {request.user.id}")
-            return response
-
-        except Exception as e:
-            logger.error(f"Error accessing report {report_type} for user {request.user.id}: {str(e)}")
-            return Response({"error": "Failed to generate report"}, status=500)
+        if len(report_types) > 1:
+            return serve_reports(request, report_types)
+        return serve_report(request, report_types[0])
@@ -11,6 +11,10 @@ django_asgi_app = get_asgi_application()
 
 # Delay import of websocket_urlpatterns until after Django is ready
 from Taxi.routing import websocket_urlpatterns
+from Taxi.vehicle_catalog import warm as warm_vehicle_catalog
+
+# Precompute the vehicle make/model lists so the first requests are cache hits
+warm_vehicle_catalog()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
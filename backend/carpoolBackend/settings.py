@@ -14,6 +14,7 @@ from pathlib import Path
 from decouple import config
 from datetime import timedelta
 import os
+from urllib.parse import urlsplit, urlunsplit
 from celery.schedules import crontab
 
 
@@ -119,11 +120,35 @@ CELERY_TIMEZONE = 'UTC'
 CELERY_BEAT_SCHEDULE_FILENAME = '/celerybeat-data/celerybeat-schedule.db'
 # CELERY_BEAT_SCHEDULE_FILENAME = '/app/celerybeat-schedule.db'
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+
+# Live driver locations (Taxi/live_location.py) share the same Redis
+REDIS_URL = config('REDIS_URL')
+LIVE_LOCATION_TTL_SECONDS = 6 * 60 * 60  # abandoned rides drop out of Redis after this
+LIVE_LOCATION_FLUSH_SECONDS = 30  # how often the last fixes are checkpointed to UserLocation
+LIVE_LOCATION_STREAM_INTERVAL_SECONDS = 1  # websocket location frames are coalesced to at most one per interval
+
+# Shared cache for every Daphne and Celery process (helpers in Taxi/cache.py). Same Redis server,
+# but its own DB index, so a cache flush never touches the broker, channel layer or live locations.
+REDIS_CACHE_DB = config('REDIS_CACHE_DB', default=1, cast=int)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config('REDIS_CACHE_URL', default=urlunsplit(urlsplit(REDIS_URL)._replace(path=f"/{REDIS_CACHE_DB}"))),
+        "KEY_PREFIX": "carpool",
+        "TIMEOUT": 300,
+    }
+}
+
 CELERY_BEAT_SCHEDULE = {
-    "match-passengers-every-5-minutes": {
-        "task": "Taxi.tasks.match_passengers_to_rides",
+    # new rides/requests are matched on creation; this only catches what those tasks missed
+    "reconcile-ride-matches-every-5-minutes": {
+        "task": "Taxi.tasks.reconcile_ride_matches",
         "schedule": crontab(minute="*/5"),  # Run every 5 minutes
     },
+    "flush-live-locations": {
+        "task": "Taxi.tasks.flush_live_locations",
+        "schedule": LIVE_LOCATION_FLUSH_SECONDS,
+    },
     # "check-license-expiry-every-day": {
     #     "task": "Taxi.tasks.check_license_expiry",
     #     "schedule": crontab(hour=0, minute=0),  # Run daily at midnight
@@ -179,6 +204,8 @@ CORS_ALLOW_METHODS = [
 
 # Allow credentials if needed
 CORS_ALLOW_CREDENTIALS = True
+# the reports screen polls a report still being built after the Retry-After its 202 carries
+CORS_EXPOSE_HEADERS = ['Retry-After']
 
 # Channels setup
 ASGI_APPLICATION = "carpoolBackend.asgi.application"
@@ -379,4 +406,6 @@ SIMPLE_JWT = {
 
 # FCM_SERVER_KEY=config("fcm_server_key")
 FIREBASE_CREDENTIALS = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', os.path.join(BASE_DIR, 'serviceAccountKey.json'))
+# base URL of a fake FCM server to send pushes to instead of Google (tests, staging); unset in production
+FCM_ENDPOINT = os.getenv('FCM_ENDPOINT')
 # FIREBASE_CREDENTIALS=os.path.join(BASE_DIR, 'serviceAccountKey.json')
\ No newline at end of file
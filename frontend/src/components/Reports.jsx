@@ -4,6 +4,10 @@ import { reportService } from "../services/api";
 import { jsPDF } from "jspdf";
 import "../styles/reports.css";
 
+// a past month's report is built in the background: the API answers 202 until it is ready
+const REPORT_POLL_ATTEMPTS = 30;
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 function Reports() {
   const navigate = useNavigate();
   const location = useLocation();
@@ -40,6 +44,8 @@ function Reports() {
   ];
 
   useEffect(() => {
+    let cancelled = false;
+
     const fetchReport = async () => {
       setLoading(true);
       setError(null);
@@ -55,32 +61,39 @@ function Reports() {
           throw new Error("Invalid year selected.");
         }
 
-        switch (reportType) {
-          case "ride_history":
-            response = await reportService.getRideHistory(params);
-            break;
-          case "payment_receipt":
-            response = await reportService.getPaymentReceipts(params);
-            break;
-          case "driver_earnings":
-            response = await reportService.getDriverEarnings(params);
-            break;
-          case "passenger_spending":
-            response = await reportService.getPassengerSpending(params);
-            break;
-          default:
-            throw new Error("Invalid report type");
+        const requests = {
+          ride_history: reportService.getRideHistory,
+          payment_receipt: reportService.getPaymentReceipts,
+          driver_earnings: reportService.getDriverEarnings,
+          passenger_spending: reportService.getPassengerSpending,
+        };
+        const request = requests[reportType];
+        if (!request) {
+          throw new Error("Invalid report type");
         }
-        setReportHtml(response.data);
+
+        response = await request(params);
+        for (let attempt = 1; response.status === 202; attempt++) {
+          if (attempt > REPORT_POLL_ATTEMPTS) {
+            throw new Error("The report is taking longer than usual. Please try again in a few minutes.");
+          }
+          await sleep((parseInt(response.headers["retry-after"]) || 2) * 1000);
+          if (cancelled) return;
+          response = await request(params);
+        }
+        if (!cancelled) setReportHtml(response.data);
       } catch (err) {
         console.error("Error fetching report:", err);
-        setError(err.message || "Failed to load report. Please check your filters or try again.");
+        if (!cancelled) setError(err.message || "Failed to load report. Please check your filters or try again.");
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
     fetchReport();
+    return () => {
+      cancelled = true;
+    };
   }, [reportType, filterMonth, filterYear]);
 
   const handleReportTypeChange = (e) => {
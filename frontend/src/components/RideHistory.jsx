@@ -9,7 +9,9 @@ const RideHistory = () => {
   const [rides, setRides] = useState([]);
   const [loading, setLoading] = useState(true);
   const [currentPage, setCurrentPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
+  // the history is cursor-paginated: cursors[i] fetches page i + 1 (the first page needs none)
+  const [cursors, setCursors] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [limit] = useState(2);
   const [chatOpen, setChatOpen] = useState(false);
   const [selectedRideId, setSelectedRideId] = useState(null);
@@ -22,13 +24,14 @@ const RideHistory = () => {
   useEffect(() => {
     const fetchRideHistory = async () => {
       try {
-        const response = await rideService.getRideHistory({ page: currentPage, limit });
+        const response = await rideService.getRideHistory({ cursor: cursors[currentPage - 1], limit });
         console.log("API Response:", response);
         setRides(response.results || []);
-        setTotalPages(Math.ceil(response.count / limit));
+        setNextCursor(response.next ? new URL(response.next).searchParams.get('cursor') : null);
       } catch (error) {
         console.error('Error fetching ride history:', error);
         setRides([]);
+        setNextCursor(null);
       } finally {
         setLoading(false);
       }
@@ -46,7 +49,7 @@ const RideHistory = () => {
 
     fetchRideHistory();
     fetchUnreadMessages();
-  }, [currentPage, limit]);
+  }, [currentPage, cursors, limit]);
 
   useEffect(() => {
     if (!chatOpen) {
@@ -80,7 +83,8 @@ const RideHistory = () => {
   }, [chatOpen, selectedRecipientId]);
 
   const handleNextPage = () => {
-    if (currentPage < totalPages) {
+    if (nextCursor) {
+      setCursors((prev) => [...prev.slice(0, currentPage), nextCursor]);
       setCurrentPage((prev) => prev + 1);
     }
   };
@@ -229,9 +233,9 @@ const RideHistory = () => {
             Previous
           </button>
           <span>
-            Page {currentPage} of {totalPages}
+            Page {currentPage}
           </span>
-          <button onClick={handleNextPage} disabled={currentPage === totalPages} className="pagination-button">
+          <button onClick={handleNextPage} disabled={!nextCursor} className="pagination-button">
             Next
           </button>
         </div>
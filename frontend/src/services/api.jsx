@@ -166,11 +166,11 @@ export const passengerService = {
 
 // ride services
 export const rideService = {
-  getRideHistory: async ({ page = 1, limit = 5 } = {}) => {
+  getRideHistory: async ({ cursor = null, limit = 5 } = {}) => {
     const response = await api.get('/rides/history/', {
-      params: { page, limit },
+      params: cursor ? { cursor, limit } : { limit },
     });
-    return response.data; // Expecting { results: [...], total: number, total_pages: number }
+    return response.data; // Expecting { results: [...], next: url | null, first: url }
   },
   // chat
   getChatHistory: async (carpoolride_id) => {